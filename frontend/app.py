@@ -404,8 +404,19 @@ def main():
                 st.info('Q20 no disponible')
         # ... and so on for Q12-Q20
     elif page == "🛠️ Hilos de Trabajo":
-        st.title("Bob el constructor está trabajando 👷")
-        st.write("Pronto habrá novedades aquí.")
+        st.title("Hilos de Trabajo")
+        fn = _load_display_func([
+            'pipelines.social_media.view_components.ops.run_metrics_view',
+            'frontend.pipelines.social_media.view_components.ops.run_metrics_view',
+            'view_components.ops.run_metrics_view'
+        ], 'display_run_metrics')
+        if fn:
+            try:
+                fn()
+            except Exception as e:
+                st.info(f"Las métricas de corridas fallaron al renderizar: {e}")
+        else:
+            st.info('Métricas de corridas no disponibles')
 
 if __name__ == "__main__":
     main()
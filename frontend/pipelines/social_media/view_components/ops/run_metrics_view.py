@@ -0,0 +1,134 @@
+import streamlit as st # type: ignore
+import pandas as pd
+import json
+import os
+from .._outputs import get_outputs_dir
+import plotly.express as px # type: ignore
+
+# El orquestador archiva un manifiesto pequeño por corrida en outputs/runs/<run_id>.json.
+# Esta página sólo lee esos manifiestos: nunca abre los q*.json (pueden pesar cientos de MB).
+RUNS_DIRNAME = 'runs'
+
+
+@st.cache_data(show_spinner=False)
+def _load_manifest(path, mtime):
+    # mtime forma parte de la clave de caché: un manifiesto reescrito se vuelve a leer
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_run_manifests(last_n):
+    runs_dir = os.path.join(get_outputs_dir(), RUNS_DIRNAME)
+    if not os.path.isdir(runs_dir):
+        return []
+    names = sorted(f for f in os.listdir(runs_dir) if f.endswith('.json'))[-last_n:]
+    manifests = []
+    for name in names:
+        path = os.path.join(runs_dir, name)
+        try:
+            manifests.append(_load_manifest(path, os.path.getmtime(path)))
+        except Exception:
+            continue
+    return manifests
+
+
+def build_run_frames(manifests):
+    """Aplana los manifiestos en dos tablas: una fila por corrida y una fila por (corrida, módulo)."""
+    run_rows, module_rows = [], []
+    for m in manifests:
+        run_id = m.get('run_id')
+        modules = m.get('modules', {}) or {}
+        cache = m.get('llm_cache', {}) or {}
+        lookups = (cache.get('hits', 0) or 0) + (cache.get('misses', 0) or 0)
+        run_rows.append({
+            'run_id': run_id,
+            'inicio': m.get('started_at'),
+            'modulo': m.get('module_to_run'),
+            'duracion_s': m.get('wall_seconds'),
+            'modulos': len(modules),
+            'errores': sum(1 for v in modules.values() if v.get('status') == 'error'),
+            'llamadas_llm': sum(v.get('llm_calls', 0) or 0 for v in modules.values()),
+            'prompt_tokens': sum(v.get('prompt_tokens', 0) or 0 for v in modules.values()),
+            'completion_tokens': sum(v.get('completion_tokens', 0) or 0 for v in modules.values()),
+            'cache_hit_rate': (cache.get('hits', 0) or 0) / lookups if lookups else None,
+        })
+        for name, v in modules.items():
+            calls = v.get('llm_calls', 0) or 0
+            module_rows.append({
+                'run_id': run_id,
+                'modulo': name,
+                'estado': v.get('status'),
+                'wall_seconds': v.get('wall_seconds'),
+                'cpu_seconds': v.get('cpu_seconds'),
+                'llm_wait_seconds': v.get('llm_wait_seconds'),
+                'llm_calls': calls,
+                'llm_errors': v.get('llm_errors', 0) or 0,
+                'prompt_tokens': v.get('prompt_tokens', 0) or 0,
+                'completion_tokens': v.get('completion_tokens', 0) or 0,
+                'cache_hit_rate': (v.get('llm_cache_hits', 0) or 0) / calls if calls else None,
+                'alloc_peak_mb': v.get('alloc_peak_mb'),
+                'output_mb': (v.get('output_bytes') or 0) / (1024 * 1024),
+                'error': v.get('error'),
+            })
+    return pd.DataFrame(run_rows), pd.DataFrame(module_rows)
+
+
+def display_run_metrics():
+    st.write("""
+        Métricas de las últimas corridas del orquestador: duración por módulo, tokens consumidos,
+        tasa de aciertos de la caché del LLM y errores. Los datos salen de los manifiestos que
+        el orquestador guarda en `outputs/runs/` al terminar cada corrida.
+    """)
+
+    last_n = st.slider('Corridas a mostrar', min_value=1, max_value=90, value=20)
+    manifests = load_run_manifests(last_n)
+    if not manifests:
+        st.info("Todavía no hay corridas registradas. Ejecuta el orquestador para generar 'outputs/runs/*.json'.")
+        return
+
+    runs_df, modules_df = build_run_frames(manifests)
+    latest = runs_df.iloc[-1]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric('Última corrida', f"{latest['duracion_s'] or 0:.0f} s", help=latest['run_id'])
+    col2.metric('Módulos con error', int(latest['errores']))
+    col3.metric('Tokens (prompt + salida)', f"{int(latest['prompt_tokens'] + latest['completion_tokens']):,}")
+    rate = latest['cache_hit_rate']
+    col4.metric('Aciertos de caché LLM', f"{rate:.0%}" if pd.notna(rate) else 'n/d')
+
+    if modules_df.empty:
+        st.info('Las corridas registradas no tienen métricas por módulo.')
+        return
+
+    st.subheader('Duración por módulo')
+    fig = px.bar(modules_df, x='run_id', y='wall_seconds', color='modulo',
+                 labels={'run_id': 'Corrida', 'wall_seconds': 'Segundos', 'modulo': 'Módulo'})
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption('Los módulos corren en paralelo: la suma de las barras puede superar la duración real de la corrida.')
+
+    st.subheader('Tokens consumidos')
+    tokens_df = runs_df.melt(id_vars='run_id', value_vars=['prompt_tokens', 'completion_tokens'],
+                             var_name='tipo', value_name='tokens')
+    fig = px.bar(tokens_df, x='run_id', y='tokens', color='tipo', labels={'run_id': 'Corrida'})
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader('Tasa de aciertos de la caché del LLM')
+    cache_df = modules_df.dropna(subset=['cache_hit_rate'])
+    if cache_df.empty:
+        st.info('No hay llamadas al LLM registradas en estas corridas.')
+    else:
+        fig = px.line(cache_df, x='run_id', y='cache_hit_rate', color='modulo', markers=True,
+                      labels={'run_id': 'Corrida', 'cache_hit_rate': 'Aciertos / llamadas', 'modulo': 'Módulo'})
+        fig.update_yaxes(tickformat='.0%', range=[0, 1])
+        st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader('Errores')
+    errors_df = modules_df.assign(fallo=(modules_df['estado'] == 'error').astype(int))
+    errors_df = errors_df.groupby('run_id', as_index=False)[['fallo', 'llm_errors']].sum()
+    fig = px.bar(errors_df, x='run_id', y=['fallo', 'llm_errors'], barmode='group',
+                 labels={'run_id': 'Corrida', 'value': 'Cantidad', 'variable': 'Tipo'})
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.subheader('Detalle de la última corrida')
+    detail = modules_df[modules_df['run_id'] == latest['run_id']].drop(columns=['run_id'])
+    st.dataframe(detail.sort_values('wall_seconds', ascending=False), use_container_width=True, hide_index=True)
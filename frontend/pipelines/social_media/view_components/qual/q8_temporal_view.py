@@ -134,4 +134,48 @@ def display_q8_temporal():
                 st.write(f"**Interacciones:** {inter_display}")
                 st.write(f"**Descripción:** {momento.get('descripcion', '')}")
                 if 'tendencia' in momento:
-                    st.write(f"**Tendencia:** {momento['tendencia']}")
\ No newline at end of file
+                    st.write(f"**Tendencia:** {momento['tendencia']}")
+    # 5. Heatmap Día x Hora
+    heatmap = data.get("heatmap_dia_hora", {})
+    if heatmap.get("interacciones_promedio"):
+        st.subheader("Interacciones Promedio por Día y Hora")
+        fig_heatmap = go.Figure(data=go.Heatmap(
+            z=heatmap["interacciones_promedio"],
+            x=heatmap.get("horas", list(range(24))),
+            y=heatmap.get("dias", []),
+            customdata=heatmap.get("posts"),
+            hovertemplate="%{y} %{x}h<br>Interacciones promedio: %{z:.0f}<br>Posts: %{customdata}<extra></extra>",
+            colorscale="Blues"
+        ))
+        fig_heatmap.update_layout(xaxis_title=f"Hora ({heatmap.get('zona_horaria', 'UTC')})", yaxis_title="Día")
+        st.plotly_chart(fig_heatmap, use_container_width=True)
+
+    ventanas = data.get("ventanas_pico", [])
+    if ventanas:
+        st.subheader("Ventanas Pico")
+        st.table(pd.DataFrame(ventanas))
+        st.caption("Franjas de horas consecutivas con más interacciones por post; lift_vs_promedio compara con el promedio general.")
+
+    # 6. Tendencia y Comparación de Períodos
+    tendencia_info = data.get("tendencia", {})
+    if tendencia_info.get("cambio_semanal_relativo_pct") is not None:
+        st.metric("Cambio semanal de interacciones (tendencia lineal)", f"{tendencia_info['cambio_semanal_relativo_pct']:+.2f}%")
+
+    comparaciones = data.get("comparacion_periodos", [])
+    if comparaciones:
+        st.subheader("Comparación de Períodos")
+        st.table(pd.DataFrame([
+            {"periodo": f"últimos {c['periodo_dias']} días", **{f"{k} (%)": v for k, v in c.get("cambio_pct", {}).items()}}
+            for c in comparaciones
+        ]))
+
+    # 7. Narrativa
+    narrativa = data.get("narrativa") or {}
+    if narrativa:
+        st.subheader("Lectura del Análisis")
+        if narrativa.get("resumen"):
+            st.write(narrativa["resumen"])
+        for hallazgo in narrativa.get("hallazgos", []):
+            st.markdown(f"- {hallazgo}")
+        for recomendacion in narrativa.get("recomendaciones", []):
+            st.markdown(f"- **Recomendación:** {recomendacion}")
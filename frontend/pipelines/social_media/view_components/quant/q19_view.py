@@ -35,6 +35,18 @@ def display_q19_correlacion():
         else:
             st.write('Matriz no disponible')
 
+        spearman = data.get('correlation_matrix_spearman', {})
+        if spearman:
+            st.subheader('Matriz de correlación (Spearman)')
+            st.table(pd.DataFrame(spearman))
+            st.caption('Correlación entre los rangos de cada métrica: menos sensible a posts virales que Pearson.')
+
+        lagged = data.get('lagged_correlation', [])
+        if lagged:
+            st.subheader('Correlación con desfase entre series diarias')
+            st.table(pd.DataFrame(lagged))
+            st.caption('lag_dias > 0: la primera métrica se adelanta a la segunda esa cantidad de días.')
+
         st.subheader('Pares con mayor correlación')
         if top_pairs:
             st.table(pd.DataFrame(top_pairs))
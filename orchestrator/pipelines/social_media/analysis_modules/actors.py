@@ -0,0 +1,74 @@
+"""
+Métricas por actor (ownerUsername) y datos de los competidores declarados en client_ficha.
+
+Q11, Q16 y Q20 arman su lista `actors` a partir de la misma agregación vectorizada
+(un único groupby sobre las features de la corrida) en lugar de recorrer los posts fila a fila.
+"""
+from typing import Any, Dict, List, Mapping, Optional
+import json
+
+import pandas as pd
+
+OWNER_COLUMN = "ownerUsername"
+
+
+def aggregate_by_actor(posts: pd.DataFrame, er_column: Optional[str] = None) -> pd.DataFrame:
+    """
+    Agrega `posts` por ownerUsername, con los actores en orden de primera aparición. Columnas:
+
+    - posts: número de publicaciones
+    - er_mean / er_count: media y cantidad de valores no nulos de `er_column` (si se indica)
+    - total_views: suma de viewsCount (nulos como 0)
+    - avg_likes: media de likesCount (nulos omitidos)
+
+    Los posts sin ownerUsername (nulo o vacío) no se asignan a ningún actor.
+    """
+    columns = ["posts"] + (["er_mean", "er_count"] if er_column else []) + ["total_views", "avg_likes"]
+    if OWNER_COLUMN not in posts.columns:
+        return pd.DataFrame(columns=columns)
+    owners = posts[OWNER_COLUMN].astype(object)
+    df = posts.loc[owners.notna() & (owners != ""), [c for c in posts.columns if c != OWNER_COLUMN]]
+    df = df.assign(_actor=owners)
+
+    spec = {"posts": ("_actor", "size")}
+    if er_column:
+        spec["er_mean"] = (er_column, "mean")
+        spec["er_count"] = (er_column, "count")
+    if "viewsCount" in df.columns:
+        spec["total_views"] = ("viewsCount", "sum")
+    if "likesCount" in df.columns:
+        spec["avg_likes"] = ("likesCount", "mean")
+    table = df.groupby("_actor", sort=False).agg(**spec)
+    table.index.name = OWNER_COLUMN
+    return table.reindex(columns=columns)
+
+
+def competitor_landscape(client_ficha: Mapping[str, Any]) -> List[Dict[str, Any]]:
+    """Entradas de competitor_landscape de client_ficha (puede venir como lista o como texto JSON)."""
+    raw = (client_ficha or {}).get("competitor_landscape")
+    try:
+        if isinstance(raw, str):
+            raw = json.loads(raw)
+    except Exception:
+        return []
+    if not isinstance(raw, list):
+        return []
+    return [entry for entry in raw if isinstance(entry, Mapping)]
+
+
+def competitor_handle_map(client_ficha: Mapping[str, Any]) -> Dict[str, Mapping[str, Any]]:
+    """
+    Handle de Instagram -> entrada de competitor_landscape. El campo instagram puede ser
+    una URL (https://www.instagram.com/handle/); si falta se usa instagram_username o name.
+    """
+    handle_map = {}
+    for entry in competitor_landscape(client_ficha):
+        insta = entry.get("instagram") or ""
+        handle = insta.rstrip('/').split('/')[-1] if insta else entry.get('instagram_username') or entry.get('name')
+        handle_map[handle] = entry
+    return handle_map
+
+
+def landscape_followers(entry: Mapping[str, Any]) -> Any:
+    """Seguidores declarados de un competidor, si la entrada los trae."""
+    return entry.get('instagram_followers') or entry.get('seguidores_instagram')
@@ -0,0 +1,333 @@
+"""
+Detector robusto de anomalías por serie temporal (Q18).
+
+Cada serie es una métrica (views, likes, comments, er) de los posts de una red y un tipo de
+contenido, en orden cronológico. Cada post se compara con los `window` posts anteriores de su
+serie: baseline = mediana y escala = MAD * 1.4826 (equivalente a la desviación estándar con
+datos normales), sobre log1p(valor) para que los posts virales no dominen la escala (el ER,
+en puntos básicos). El score
+es el z robusto (valor - mediana) / escala y el post es anómalo si |z| >= threshold.
+
+Con `seasonal` cada post se compara además sólo con los posts anteriores del mismo día de la
+semana; si esa serie tiene historia suficiente (min_history) se usa en lugar de la general.
+
+Todas las series de una corrida (segmento x métrica, general y por día) se evalúan juntas en
+`robust_scores_many`, con operaciones sobre matrices de ventanas en lugar de un cálculo por serie.
+
+El detector es incremental: guarda en outputs/_state/q18_anomalies.json la cola de cada serie
+(los últimos `window` valores) y hasta qué timestamp se evaluó cada segmento, así una corrida
+nueva sólo evalúa los posts posteriores contra ese estado sin recorrer la historia.
+"""
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .incremental import STATE_DIRNAME
+
+STATE_FILENAME = 'q18_anomalies.json'
+STATE_VERSION = 1
+
+# métrica reportada -> columna de las features de posts
+METRICS = {
+    "views": "viewsCount",
+    "likes": "likesCount",
+    "comments": "commentsCount",
+    "er": "er",
+}
+COUNT_METRICS = ("views", "likes", "comments")
+# El ER se evalúa en puntos básicos: log1p sobre tasas < 1 sería casi lineal y los posts
+# virales dominarían la escala
+METRIC_SCALE = {"er": 10000.0}
+SEGMENT_COLUMNS = ("social_network", "content_type")
+
+DEFAULT_WINDOW = 28
+DEFAULT_MIN_HISTORY = 8
+# Umbral habitual para el z robusto (Iglewicz & Hoaglin)
+DEFAULT_THRESHOLD = 3.5
+MAD_SCALE = 1.4826
+# Si MAD = 0 (más de la mitad de la ventana igual a la mediana) se usa la desviación absoluta media
+MEAN_AD_SCALE = 1.2533
+# Posts evaluados por bloque: acota la memoria de las ventanas (bloque x window floats)
+SCORE_CHUNK = 65536
+
+
+def _sorted_median(ordered: np.ndarray, count: np.ndarray) -> np.ndarray:
+    """Mediana por fila de `ordered` (filas ordenadas, NaN al final) con `count` valores válidos."""
+    lo = np.maximum((count - 1) // 2, 0)[:, None]
+    hi = np.maximum(count // 2, 0)[:, None]
+    median = (np.take_along_axis(ordered, lo, axis=1) + np.take_along_axis(ordered, hi, axis=1))[:, 0] / 2
+    return np.where(count > 0, median, np.nan)
+
+
+def _window_stats(block: np.ndarray, count: np.ndarray, values: np.ndarray,
+                  min_history: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mediana y z robusto de `values` frente a su ventana (fila de `block`, `count` valores
+    válidos). `block` se modifica: se ordena y se reemplaza por las desviaciones absolutas.
+    """
+    block.sort(axis=1)
+    med = _sorted_median(block, count)
+    # desviaciones absolutas respecto de la mediana, en el mismo arreglo
+    np.subtract(block, med[:, None], out=block)
+    np.abs(block, out=block)
+    block.sort(axis=1)
+    scale = _sorted_median(block, count) * MAD_SCALE
+    # MAD = 0: desviación absoluta media (sólo en esas filas)
+    flat = np.flatnonzero(~(scale > 0) & (count > 0))
+    if len(flat):
+        scale[flat] = np.nansum(block[flat], axis=1) / count[flat] * MEAN_AD_SCALE
+    valid = (count >= min_history) & (scale > 0)
+    z = np.full(len(block), np.nan)
+    np.divide(values - med, scale, out=z, where=valid)
+    return med, z
+
+
+def robust_scores_many(series: Sequence[Tuple[np.ndarray, np.ndarray]], window: int,
+                       min_history: int) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Evalúa varias series a la vez. Cada serie es (history, values): `values` (en orden) se
+    compara con una ventana deslizante de los `window` valores previos, empezando por `history`
+    (la cola ya evaluada de la serie). Devuelve por serie, para cada valor, la mediana de su
+    ventana, el z robusto (NaN si hay menos de `min_history` previos o la escala es 0) y
+    cuántos valores previos tenía la ventana.
+
+    Las series se concatenan separadas por `window` NaN (ninguna ventana cruza de una serie a
+    otra) y las medianas salen de ordenar cada ventana, por bloques de SCORE_CHUNK filas.
+    """
+    parts, positions, previous, offset = [], [], [], 0
+    for history, values in series:
+        history = np.asarray(history, dtype=float)[-window:]
+        values = np.asarray(values, dtype=float)
+        parts.append(np.concatenate([np.full(window, np.nan), history, values]))
+        first = offset + window + len(history)
+        positions.append(np.arange(first, first + len(values)))
+        # valores previos en la ventana de cada valor nuevo (las series no tienen NaN)
+        previous.append(np.minimum(np.arange(len(history), len(history) + len(values)), window))
+        offset += len(parts[-1])
+    if not parts:
+        return []
+    full = np.concatenate(parts)
+    rows = np.concatenate(positions)
+    counts = np.concatenate(previous)
+    # la ventana de los `window` valores anteriores a la posición p empieza en p - window
+    windows = sliding_window_view(full, window)
+    medians = np.full(len(rows), np.nan)
+    scores = np.full(len(rows), np.nan)
+    for start in range(0, len(rows), SCORE_CHUNK):
+        chunk = rows[start:start + SCORE_CHUNK]
+        # indexar con un array copia las ventanas: _window_stats puede modificarlas
+        med, z = _window_stats(windows[chunk - window], counts[start:start + SCORE_CHUNK], full[chunk], min_history)
+        medians[start:start + SCORE_CHUNK] = med
+        scores[start:start + SCORE_CHUNK] = z
+
+    results, first = [], 0
+    for pos in positions:
+        last = first + len(pos)
+        results.append((medians[first:last], scores[first:last], counts[first:last]))
+        first = last
+    return results
+
+
+def robust_scores(history: np.ndarray, values: np.ndarray, window: int,
+                  min_history: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """`robust_scores_many` para una sola serie."""
+    return robust_scores_many([(history, values)], window, min_history)[0]
+
+
+def _naive_utc(stamps: pd.Series) -> pd.Series:
+    stamps = pd.to_datetime(stamps, errors="coerce")
+    if getattr(stamps.dt, "tz", None) is not None:
+        stamps = stamps.dt.tz_convert(None)
+    return stamps
+
+
+def _labels(df: pd.DataFrame, column: str) -> np.ndarray:
+    """Columna como array de textos ("" para nulos o si la columna no existe)."""
+    if column not in df.columns:
+        return np.full(len(df), "", dtype=object)
+    values = df[column].astype(object)
+    return values.where(values.notna(), "").astype(str).to_numpy(dtype=object)
+
+
+class AnomalyDetector:
+    """
+    Evalúa posts (DataFrame con post_id y/o post_url, _ts, social_network, content_type y las columnas de
+    METRICS) y mantiene el estado incremental. `incremental=False` ignora el estado anterior
+    y evalúa toda la historia (el estado se vuelve a escribir igual).
+    """
+
+    def __init__(self, outputs_dir: str, window: int = DEFAULT_WINDOW, min_history: int = DEFAULT_MIN_HISTORY,
+                 threshold: float = DEFAULT_THRESHOLD, seasonal: bool = True, incremental: bool = True):
+        self.path = os.path.join(outputs_dir, STATE_DIRNAME, STATE_FILENAME)
+        self.window = max(1, int(window))
+        self.min_history = max(1, min(int(min_history), self.window))
+        self.threshold = float(threshold)
+        self.seasonal = bool(seasonal)
+        self.params = {"window": self.window, "min_history": self.min_history, "threshold": self.threshold,
+                       "seasonal": self.seasonal}
+        self._state = self._load_state() if incremental else None
+        self.resumed = self._state is not None
+        if self._state is None:
+            self._state = {"segments": {}, "series": {}, "anomalies": []}
+
+    def _load_state(self) -> Optional[Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Estado de anomalías ilegible en {self.path}, se evalúa toda la historia: {e}")
+            return None
+        # Con otros parámetros las colas y anomalías guardadas no son comparables
+        if state.get("version") != STATE_VERSION or state.get("params") != self.params:
+            return None
+        return state
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        state = dict(self._state, version=STATE_VERSION, params=self.params)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, self.path)
+
+    def _new_posts(self, segment_key: str, ts: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        """
+        Máscara de los posts del segmento (ts y claves en orden cronológico) posteriores a lo ya
+        evaluado; los del último timestamp evaluado se distinguen por su clave.
+        """
+        previous = self._state["segments"].get(segment_key)
+        if not previous:
+            return np.ones(len(ts), dtype=bool)
+        last_ts = pd.Timestamp(previous["last_ts"]).to_datetime64()
+        seen_at_last = set(previous.get("last_ids") or [])
+        is_new = ts > last_ts
+        for i in np.flatnonzero(ts == last_ts):
+            is_new[i] = keys[i] not in seen_at_last
+        return is_new
+
+    def _score_all(self, jobs: Sequence[Tuple[str, np.ndarray]]) -> List[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Evalúa todas las series (clave, valores nuevos) en una pasada y actualiza sus colas."""
+        tails = [np.asarray(self._state["series"].get(key, []), dtype=float) for key, _ in jobs]
+        results = robust_scores_many([(tail, values) for tail, (_, values) in zip(tails, jobs)],
+                                     self.window, self.min_history)
+        for tail, (key, values) in zip(tails, jobs):
+            self._state["series"][key] = np.concatenate([tail, values])[-self.window:].tolist()
+        return results
+
+    def score(self, posts: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Evalúa los posts nuevos, agrega sus anomalías a las anteriores (de posts que siguen en
+        el dataset) y devuelve {"anomalies": [...], "scored": n, "sin_timestamp": n}.
+        """
+        stamps = _naive_utc(posts["_ts"])
+        has_ts = stamps.notna().to_numpy()
+        missing_ts = int((~has_ts).sum())
+        ts = stamps.to_numpy(dtype="datetime64[ns]")[has_ts]
+        weekday = stamps.dt.weekday.to_numpy()[has_ts].astype(np.int64)
+        network, content_type, post_id, post_url = (_labels(posts, col)[has_ts] for col in
+                                                    SEGMENT_COLUMNS + ("post_id", "post_url"))
+        # Clave del post para el estado incremental: post_id, o post_url si no hay id
+        keys = np.where(post_id != "", post_id, post_url)
+        metric_values = {
+            metric: (pd.to_numeric(posts[column], errors="coerce").to_numpy(dtype=float) if column in posts.columns
+                     else np.full(len(posts), np.nan))[has_ts]
+            for metric, column in METRICS.items()
+        }
+
+        # Primero se arman todas las series (segmento x métrica, y por día de la semana) y se
+        # evalúan juntas; después se asignan los scores a cada post
+        series = []
+        jobs: List[Tuple[str, np.ndarray]] = []
+        scored = 0
+        segments = pd.DataFrame(dict(zip(SEGMENT_COLUMNS, (network, content_type))))
+        for (seg_network, seg_content_type), idx in sorted(segments.groupby(list(SEGMENT_COLUMNS)).indices.items()):
+            segment_key = f"{seg_network}|{seg_content_type}"
+            # orden cronológico; a igual timestamp, el orden de llegada
+            idx = idx[np.lexsort((idx, ts[idx]))]
+            idx = idx[self._new_posts(segment_key, ts[idx], keys[idx])]
+            if len(idx) == 0:
+                continue
+            scored += len(idx)
+            for metric in METRICS:
+                raw = metric_values[metric][idx]
+                present = ~np.isnan(raw)
+                rows, raw = idx[present], raw[present]
+                if len(raw) == 0:
+                    continue
+                unit = METRIC_SCALE.get(metric, 1.0)
+                values = np.log1p(np.clip(raw, 0, None) * unit)
+                entry = {"network": seg_network, "content_type": seg_content_type, "metric": metric, "rows": rows,
+                         "raw": raw, "unit": unit, "job": len(jobs), "weekdays": []}
+                jobs.append((f"{segment_key}|{metric}", values))
+                if self.seasonal:
+                    weekdays = weekday[rows]
+                    for day in np.unique(weekdays):
+                        positions = np.flatnonzero(weekdays == day)
+                        entry["weekdays"].append((positions, len(jobs)))
+                        jobs.append((f"{segment_key}|{metric}|wd{day}", values[positions]))
+                series.append(entry)
+            last_ts = ts[idx].max()
+            self._state["segments"][segment_key] = {
+                "last_ts": pd.Timestamp(last_ts).isoformat(),
+                "last_ids": keys[idx[ts[idx] == last_ts]].tolist(),
+            }
+
+        results = self._score_all(jobs)
+        found: List[Dict[str, Any]] = []
+        for entry in series:
+            medians, scores, _ = (a.copy() for a in results[entry["job"]])
+            seasonal = np.zeros(len(medians), dtype=bool)
+            for idx, job in entry["weekdays"]:
+                w_med, w_scores, w_counts = results[job]
+                use = w_counts >= self.min_history
+                medians[idx[use]] = w_med[use]
+                scores[idx[use]] = w_scores[use]
+                seasonal[idx[use]] = True
+
+            rows, raw, unit, metric = entry["rows"], entry["raw"], entry["unit"], entry["metric"]
+            flagged = np.flatnonzero(np.abs(np.nan_to_num(scores)) >= self.threshold)
+            for i in flagged:
+                row = rows[i]
+                found.append({
+                    "post_id": post_id[row] or None,
+                    "post_url": post_url[row] or None,
+                    "timestamp": pd.Timestamp(ts[row]).isoformat(),
+                    "social_network": entry["network"] or None,
+                    "content_type": entry["content_type"] or None,
+                    "metric": metric,
+                    "value": int(raw[i]) if metric in COUNT_METRICS else float(raw[i]),
+                    "baseline": float(np.expm1(medians[i]) / unit),
+                    "z_score": float(scores[i]),
+                    "reason": "high" if scores[i] > 0 else "low",
+                    "seasonal": bool(seasonal[i]),
+                })
+
+        # anomalías previas de posts que siguen en el dataset + las nuevas, en orden cronológico
+        current_keys = set(keys)
+        anomalies = [a for a in self._state["anomalies"]
+                     if (a.get("post_id") or a.get("post_url") or "") in current_keys] + found
+        metric_order = {metric: i for i, metric in enumerate(METRICS)}
+        anomalies.sort(key=lambda a: (a["timestamp"], a.get("social_network") or "", a.get("content_type") or "",
+                                      metric_order.get(a["metric"], len(metric_order))))
+        self._state["anomalies"] = anomalies
+        return {"anomalies": anomalies, "scored": scored, "sin_timestamp": missing_ts, "posts": len(ts)}
+
+
+def detector_from_config(outputs_dir: str, config: Mapping[str, Any], incremental: bool) -> AnomalyDetector:
+    """Detector con los parámetros de config["anomaly_detection"] (los que falten usan los valores por defecto)."""
+    options = config.get("anomaly_detection") or {}
+    return AnomalyDetector(
+        outputs_dir,
+        window=options.get("window", DEFAULT_WINDOW),
+        min_history=options.get("min_history", DEFAULT_MIN_HISTORY),
+        threshold=options.get("threshold", DEFAULT_THRESHOLD),
+        seasonal=options.get("seasonal", True),
+        incremental=incremental,
+    )
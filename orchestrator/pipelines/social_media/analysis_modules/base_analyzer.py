@@ -1,13 +1,35 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, List
+from typing import Dict, Any, Awaitable, Callable, Iterable, Iterator, List, Mapping, Optional
+import asyncio
+import contextvars
 import json
+import logging
 import os
+import re
+
+from .dataset import IngestedDataset
+from .incremental import IncrementalState, fingerprint
+from .tokens import DEFAULT_MAX_PROMPT_TOKENS, map_reduce as map_reduce_chunks
+
+# Llamadas simultáneas al LLM por analizador (config: llm_concurrency)
+DEFAULT_LLM_CONCURRENCY = 8
+
+# Archivos de salida de los módulos (q1_emociones.json, q11_engagement.json...). Deja fuera
+# ingested_data.json, run_manifest.json, los *_error.json y los *_test_output.json de scripts.
+MODULE_OUTPUT_PATTERN = re.compile(r'^(q\d+)_[a-z0-9_]+\.json$')
+NON_OUTPUT_SUFFIXES = ('_error.json', 'test_output.json')
+
+# True dentro de un worker de fan_out, que ya ocupa una de las llamadas simultáneas del analizador
+_IN_FAN_OUT = contextvars.ContextVar("in_fan_out", default=False)
 
 class BaseAnalyzer(ABC):
     """
     Clase base abstracta para todos los módulos de análisis (Q1-Q20).
     Define una interfaz común y proporciona utilidades compartidas.
     """
+    # Versión del prompt del módulo; subirla invalida los resultados de fan_out_incremental
+    PROMPT_VERSION = 1
+
     def __init__(self, openai_client: Any, config: Dict[str, Any]):
         """
         Inicializa el analizador con un cliente de OpenAI y la configuración.
@@ -19,22 +41,196 @@ class BaseAnalyzer(ABC):
     # System is designed to analyze a single client only (no competitor aggregates).
     # All analyzers should operate on client data by default.
         self.outputs_dir = self.config.get("outputs_dir", os.path.join(os.path.dirname(__file__), '..', '..', 'outputs'))
+        # Snapshot compartido de la corrida (lo inyecta el orquestador); si no existe
+        # (scripts que instancian el analizador directamente) se carga bajo demanda.
+        self._dataset: Optional[IngestedDataset] = self.config.get("dataset")
+        # Entradas enviadas por map_reduce y fragmentos que necesitaron (se registran al final del módulo)
+        self.chunk_stats = {"inputs": 0, "chunked_inputs": 0, "chunks": 0}
 
-    def load_ingested_data(self) -> Dict[str, Any]:
+    @property
+    def dataset(self) -> IngestedDataset:
+        """Snapshot inmutable de los datos ingeridos (cargado una sola vez)."""
+        if self._dataset is None:
+            self._dataset = IngestedDataset.load(self.outputs_dir)
+        return self._dataset
+
+    def load_ingested_data(self) -> Mapping[str, Any]:
         """
-        Carga y devuelve el diccionario de datos completo desde el archivo ingested_data.json.
+        Devuelve los datos ingeridos (client_ficha, posts, comments) como vista de sólo lectura.
         Esta es una utilidad compartida para todos los analizadores.
         """
-        json_path = os.path.join(self.outputs_dir, 'ingested_data.json')
+        return self.dataset.as_dict()
+
+    def iter_posts(self) -> Iterator[Mapping[str, Any]]:
+        """
+        Recorre las publicaciones ingeridas de a una. Con la ingesta NDJSON se leen en streaming
+        desde disco, así la memoria no crece con el tamaño de la cuenta.
+        """
+        return self.dataset.iter_posts()
+
+    def iter_comments(self) -> Iterator[Mapping[str, Any]]:
+        """Recorre los comentarios ingeridos de a uno (en streaming con la ingesta NDJSON)."""
+        return self.dataset.iter_comments()
+
+    def load_module_outputs(self, exclude: Iterable[str] = ()) -> Dict[str, Any]:
+        """
+        Outputs de los demás módulos presentes en outputs_dir, indexados por módulo ("Q1", "Q11"...).
+        Cada módulo se lee del archivo que escribe el orquestador (config["module_output_files"],
+        p. ej. Q3 -> q3_topicos.json), así un archivo viejo con otro nombre (q3_temas.json) no
+        reemplaza al de la corrida. Sin ese mapa (scripts que instancian el analizador solo) se
+        usa, por módulo, el archivo qN_*.json modificado más recientemente. Los archivos
+        ilegibles o ausentes se omiten.
+        """
+        excluded = {name.upper() for name in exclude}
+        output_files: Mapping[str, str] = self.config.get("module_output_files") or {}
+        if not output_files:
+            output_files = self._latest_module_files()
+        outputs: Dict[str, Any] = {}
+        for module_id, fname in output_files.items():
+            if module_id.upper() in excluded:
+                continue
+            try:
+                with open(os.path.join(self.outputs_dir, fname), 'r', encoding='utf-8') as f:
+                    outputs[module_id.upper()] = json.load(f)
+            except Exception:
+                continue
+        return outputs
+
+    def _latest_module_files(self) -> Dict[str, str]:
+        """Módulo -> archivo qN_*.json más reciente en outputs_dir."""
+        latest: Dict[str, Any] = {}
+        try:
+            files = sorted(os.listdir(self.outputs_dir))
+        except Exception:
+            files = []
+        for fname in files:
+            match = MODULE_OUTPUT_PATTERN.match(fname.lower())
+            if not match or fname.lower().endswith(NON_OUTPUT_SUFFIXES):
+                continue
+            try:
+                mtime = os.path.getmtime(os.path.join(self.outputs_dir, fname))
+            except OSError:
+                continue
+            module_id = match.group(1).upper()
+            if module_id not in latest or mtime > latest[module_id][0]:
+                latest[module_id] = (mtime, fname)
+        return {module_id: fname for module_id, (_, fname) in latest.items()}
+
+    @property
+    def llm_concurrency(self) -> int:
+        """Máximo de llamadas simultáneas al LLM para este analizador."""
+        try:
+            return max(1, int(self.config.get("llm_concurrency", DEFAULT_LLM_CONCURRENCY)))
+        except (TypeError, ValueError):
+            return DEFAULT_LLM_CONCURRENCY
+
+    @property
+    def max_prompt_tokens(self) -> int:
+        """Presupuesto de tokens para el texto variable de un prompt (config: max_prompt_tokens)."""
+        try:
+            return max(1, int(self.config.get("max_prompt_tokens", DEFAULT_MAX_PROMPT_TOKENS)))
+        except (TypeError, ValueError):
+            return DEFAULT_MAX_PROMPT_TOKENS
+
+    async def map_reduce(self, pieces: Iterable[str], map_fn: Callable[[str], Awaitable[Any]],
+                         combine: Callable[[List[Any]], Any], separator: str = " ") -> Any:
+        """
+        Envía `separator.join(pieces)` a `map_fn`; si excede `max_prompt_tokens` lo divide en
+        fragmentos (sin partir piezas), los procesa en paralelo y combina los parciales con
+        `combine([(resultado, número_de_piezas), ...])`, propio de cada módulo.
+        Dentro de un worker de `fan_out` los fragmentos se procesan de a uno, con el cupo que el
+        worker ya tiene, así el total en curso no pasa de `llm_concurrency`.
+        """
+        concurrency = 1 if _IN_FAN_OUT.get() else self.llm_concurrency
+        result, chunks = await map_reduce_chunks(list(pieces), map_fn, combine, self.max_prompt_tokens,
+                                                 separator, concurrency)
+        self.chunk_stats["inputs"] += 1
+        self.chunk_stats["chunks"] += chunks
+        if chunks > 1:
+            self.chunk_stats["chunked_inputs"] += 1
+            logging.info(f"{type(self).__name__}: entrada dividida en {chunks} fragmentos por límite de tokens.")
+        return result
+
+    async def fan_out(self, items: Iterable[Any], worker: Callable[[Any], Awaitable[Any]]) -> List[Any]:
+        """
+        Ejecuta `worker(item)` para cada item con a lo sumo `llm_concurrency` llamadas en curso.
+        Los resultados se devuelven en el mismo orden que `items`, así el output es determinista.
+        Los errores quedan aislados por item: si un worker lanza una excepción, se registra
+        y su resultado es None, sin afectar al resto.
+        """
+        semaphore = asyncio.Semaphore(self.llm_concurrency)
 
-        if not os.path.exists(json_path):
-            raise FileNotFoundError(f"El archivo de datos ingeridos no se encontró en: {json_path}")
+        async def _run(item):
+            async with semaphore:
+                # Cada _run es su propia tarea (gather), así la marca no sale de este worker
+                _IN_FAN_OUT.set(True)
+                try:
+                    return await worker(item)
+                except Exception as e:
+                    logging.error(f"{type(self).__name__}: error no controlado en fan-out: {e}")
+                    return None
 
-        # use 'utf-8-sig' to gracefully handle files that may contain a BOM
-        with open(json_path, 'r', encoding='utf-8-sig') as f:
-            ingested_data = json.load(f)
-        
-        return ingested_data
+        return list(await asyncio.gather(*(_run(item) for item in items)))
+
+    @property
+    def annotation_store(self) -> Optional[Any]:
+        """
+        Anotaciones fusionadas por publicación compartidas por Q1/Q2/Q3/Q7
+        (config: fused_comment_annotations). None: cada módulo usa su propio prompt.
+        """
+        return self.config.get("annotation_store")
+
+    @property
+    def incremental_enabled(self) -> bool:
+        """Reutilizar resultados por publicación de la corrida anterior (config: incremental_analysis)."""
+        return bool(self.config.get("incremental_analysis", False))
+
+    async def fan_out_incremental(self, stem: str, items: Iterable[Any], key: Callable[[Any], str],
+                                  content: Callable[[Any], Any], worker: Callable[[Any], Awaitable[Any]],
+                                  is_complete: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        """
+        Igual que `fan_out`, pero sólo llama a `worker` para los items cuyo contenido cambió
+        desde la corrida anterior. `key(item)` es el post_url y `content(item)` lo que se envía
+        al LLM; para el resto se devuelve el resultado guardado en outputs/_state/<stem>.
+        Sólo se guardan resultados completos (`is_complete`), así los posts que fallaron se
+        reintentan en la siguiente corrida. Los resultados deben ser serializables a JSON.
+        """
+        if not self.incremental_enabled:
+            return await self.fan_out(items, worker)
+
+        items = list(items)
+        state = IncrementalState(self.outputs_dir, stem)
+        results: List[Any] = [None] * len(items)
+        # Un cambio de modelo, de versión del prompt o del modo fusionado invalida lo guardado.
+        # Los resultados obtenidos contra otro endpoint (openai_base_url) no se reutilizan con OpenAI
+        store = self.annotation_store
+        fused = store.PROMPT_VERSION if store is not None else None
+        endpoint = [self.config["openai_base_url"]] if self.config.get("openai_base_url") else []
+        fingerprints = [fingerprint(type(self).__name__, content(item), self.config.get("openai_model"),
+                                    self.PROMPT_VERSION, fused, *endpoint) for item in items]
+        pending = []
+        for idx, item in enumerate(items):
+            previous = state.lookup(key(item), fingerprints[idx])
+            if previous is not None:
+                results[idx] = previous
+            else:
+                pending.append(idx)
+
+        fresh = await self.fan_out([items[idx] for idx in pending], worker)
+        for idx, result in zip(pending, fresh):
+            results[idx] = result
+            if result is not None and (is_complete is None or is_complete(result)):
+                state.record(key(items[idx]), fingerprints[idx], result)
+
+        if self.config.get("dry_run"):
+            # Recolección del modo batch: los resultados son provisionales y no se persisten
+            return results
+        try:
+            state.save()
+        except OSError as e:
+            logging.warning(f"{type(self).__name__}: no se pudo guardar el estado incremental: {e}")
+        logging.info(f"{type(self).__name__}: {state.reused} publicaciones reutilizadas, {state.recomputed} analizadas.")
+        return results
 
     def get_client_usernames(self, ingested_data: Dict[str, Any]) -> List[str]:
         """
@@ -0,0 +1,156 @@
+"""
+Copia columnar (Parquet) de los posts y comentarios ingeridos.
+
+La ingesta NDJSON puede escribir además ingested_posts.parquet / ingested_comments.parquet
+con tipos reales: conteos como enteros, timestamps como datetime y social_network,
+content_type y ownerUsername codificados como diccionario (llegan a pandas como Categorical).
+Los analizadores leen sólo las columnas que necesitan, con el archivo mapeado en memoria.
+
+pyarrow es opcional: sin él no se escribe la copia columnar y `IngestedDataset` sigue
+construyendo los DataFrames a partir de los registros.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+import logging
+import math
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+POSTS_COLUMNAR_FILENAME = 'ingested_posts.parquet'
+COMMENTS_COLUMNAR_FILENAME = 'ingested_comments.parquet'
+# Filas por row group: acota la memoria del escritor, que nunca tiene más de un bloque en Python
+BATCH_ROWS = 50000
+
+COUNT_COLUMNS = ('likesCount', 'commentsCount', 'viewsCount', 'sharesCount')
+TIMESTAMP_COLUMNS = ('timestamp',)
+DICTIONARY_COLUMNS = ('social_network', 'content_type', 'ownerUsername')
+
+
+def available() -> bool:
+    """True si pyarrow está instalado."""
+    return pq is not None
+
+
+def _is_missing(value: Any) -> bool:
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+def _as_strings(values: List[Any]) -> 'pa.Array':
+    return pa.array([None if _is_missing(v) else str(v) for v in values], type=pa.string())
+
+
+def _column(name: str, values: List[Any], arrow_type: Optional['pa.DataType']) -> 'pa.Array':
+    """Convierte los valores de una columna de un bloque al tipo columnar que le corresponde."""
+    if name in COUNT_COLUMNS:
+        # Misma coerción que hacen los módulos (pd.to_numeric(errors="coerce")), pero como enteros
+        numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+        return pa.array(numbers, from_pandas=True).cast(pa.int64(), safe=False)
+    if name in TIMESTAMP_COLUMNS:
+        # Los offsets explícitos se convierten a UTC; los timestamps sin zona se conservan tal cual
+        stamps = pd.to_datetime(pd.Series(values, dtype=object), errors='coerce', utc=True).dt.tz_convert(None)
+        return pa.array(stamps, from_pandas=True).cast(pa.timestamp('us'))
+    if name in DICTIONARY_COLUMNS:
+        return _as_strings(values).dictionary_encode()
+    try:
+        array = pa.array(values, type=arrow_type, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        if arrow_type is not None and arrow_type != pa.string():
+            raise
+        return _as_strings(values)
+    # Un primer bloque sin valores no fija el tipo: se guarda como texto
+    return _as_strings(values) if pa.types.is_null(array.type) else array
+
+
+class ColumnarWriter:
+    """
+    Escribe registros (dicts) en un Parquet por bloques de BATCH_ROWS filas. El esquema sale
+    del primer bloque; si un bloque posterior no encaja, la copia columnar se descarta (los
+    registros NDJSON siguen siendo la fuente de verdad) y `failed` queda en True.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self.failed = False
+        self._tmp_path = path + '.tmp'
+        self._buffer: List[Dict[str, Any]] = []
+        self._schema: Optional['pa.Schema'] = None
+        self._writer: Optional['pq.ParquetWriter'] = None
+
+    def append(self, record: Dict[str, Any]):
+        if self.failed:
+            return
+        self._buffer.append(record)
+        if len(self._buffer) >= BATCH_ROWS:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        try:
+            if self._schema is None:
+                names: Dict[str, None] = {}
+                for record in self._buffer:
+                    names.update(dict.fromkeys(record))
+                arrays = [_column(name, [r.get(name) for r in self._buffer], None) for name in names]
+                table = pa.Table.from_arrays(arrays, names=list(names))
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self._tmp_path, self._schema)
+            else:
+                arrays = [_column(field.name, [r.get(field.name) for r in self._buffer], field.type)
+                          for field in self._schema]
+                table = pa.Table.from_arrays(arrays, schema=self._schema)
+            self._writer.write_table(table)
+            self.rows += len(self._buffer)
+        except Exception as e:
+            logging.warning(f"No se pudo escribir la copia columnar {os.path.basename(self.path)}: {e}")
+            self.abort()
+        finally:
+            self._buffer = []
+
+    def close(self) -> bool:
+        """Termina el archivo; devuelve True si la copia columnar quedó escrita."""
+        self._flush()
+        if self.failed:
+            return False
+        if self._writer is None:
+            pq.write_table(pa.table({}), self._tmp_path)
+        else:
+            self._writer.close()
+        os.replace(self._tmp_path, self.path)
+        return True
+
+    def abort(self):
+        self.failed = True
+        if self._writer is not None:
+            try:
+                self._writer.close()
+            except Exception:
+                pass
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+
+def read_frame(path: str, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """
+    Lee un Parquet de la ingesta como DataFrame, sólo con `columns` (las que no existan se
+    omiten). El archivo se mapea en memoria y las columnas numéricas sin nulos pasan a pandas
+    sin copia. Las categorías se ordenan alfabéticamente, así groupby devuelve los grupos en
+    el mismo orden que con columnas de texto.
+    """
+    if columns is not None:
+        present = set(pq.read_schema(path, memory_map=True).names)
+        columns = [c for c in columns if c in present]
+    table = pq.read_table(path, columns=columns, memory_map=True)
+    df = table.to_pandas(split_blocks=True, self_destruct=True)
+    for name in df.columns:
+        if isinstance(df[name].dtype, pd.CategoricalDtype):
+            df[name] = df[name].cat.reorder_categories(sorted(df[name].cat.categories))
+    return df
@@ -0,0 +1,182 @@
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+import asyncio
+import functools
+import json
+import math
+
+from .q1_emociones import combine_emotions
+from .q2_personalidad import combine_traits
+from .q3_topicos import combine_topics
+from .tokens import DEFAULT_MAX_PROMPT_TOKENS, map_reduce, weighted_mean, weighted_mean_dicts
+
+DEFAULT_MODEL = "gpt-4o"
+
+FUSED_SYSTEM_PROMPT = (
+    "Eres un analista experto en audiencias de redes sociales: emociones, personalidad de marca (Aaker), "
+    "modelado de tópicos y sentimiento/subjetividad. Respondes siempre con un único objeto JSON."
+)
+
+
+def _comment_lines(comments) -> List[str]:
+    lines = []
+    for comment in comments:
+        text = comment.get('comment_text')
+        if text is None or (isinstance(text, float) and math.isnan(text)):
+            continue
+        username = comment.get('ownerUsername') or 'anonymous'
+        lines.append(f"Comentario {len(lines) + 1} (@{username}): {text}")
+    return lines
+
+
+def brand_context(client_ficha: Mapping[str, Any]) -> Dict[str, str]:
+    """Narrativa, arquetipo y tono de voz de la marca según client_ficha (claves en español o inglés)."""
+    ficha = client_ficha or {}
+    return {
+        "narrativa": ficha.get("narrativa") or ficha.get("primary_business_goal") or "No disponible",
+        "arquetipo": ficha.get("arquetipo_marca") or ficha.get("brand_archetype") or "No disponible",
+        "tono_voz": ficha.get("tono_voz") or ficha.get("tone_of_voice") or "No disponible",
+    }
+
+
+def combine_annotations(partials: List[Tuple[Dict[str, Any], int]]) -> Dict[str, Any]:
+    """Combina anotaciones de varios fragmentos con los combinadores de cada módulo."""
+    sentiments = [(result.get("sentimiento") or {}, n) for result, n in partials]
+    mixed_example = max(
+        sentiments,
+        key=lambda item: float((item[0].get("distribucion") or {}).get("mixto", 0) or 0),
+    )[0].get("ejemplo_mixto")
+    combined = {}
+    combined.update(combine_emotions(partials))
+    combined.update(combine_traits(partials))
+    combined.update(combine_topics(partials))
+    combined["sentimiento"] = {
+        "distribucion": weighted_mean_dicts([(sentiment.get("distribucion"), n) for sentiment, n in sentiments]),
+        "subjetividad_promedio": weighted_mean([(sentiment.get("subjetividad_promedio"), n) for sentiment, n in sentiments]),
+        "ejemplo_mixto": mixed_example,
+    }
+    return combined
+
+
+class CommentAnnotationStore:
+    """
+    Anotación fusionada de comentarios: una sola llamada al LLM por publicación devuelve
+    emociones (Q1), rasgos de Aaker (Q2), tópicos (Q3) y sentimiento/subjetividad (Q7).
+
+    El orquestador crea una instancia por corrida (config["annotation_store"]) cuando
+    `fused_comment_annotations` está activo. Cada post se anota una única vez: si varios
+    módulos piden el mismo post a la vez, esperan la misma llamada en curso.
+    """
+    # Versión del prompt fusionado; entra en el fingerprint incremental de Q1/Q2/Q3/Q7
+    PROMPT_VERSION = 1
+
+    def __init__(self, openai_client: Any, dataset: Any, config: Dict[str, Any]):
+        self.openai_client = openai_client
+        self.dataset = dataset
+        self.model = config.get("openai_model") or DEFAULT_MODEL
+        self.brand_context = brand_context(dataset.client_ficha)
+        self.max_prompt_tokens = int(config.get("max_prompt_tokens", DEFAULT_MAX_PROMPT_TOKENS))
+        self._annotations: Dict[Any, asyncio.Future] = {}
+        self.requests = 0
+        self.llm_calls = 0
+        self.failures = 0
+        self.chunks = 0
+
+    def build_prompt(self, comments_text: str) -> str:
+        return f"""
+        Analiza la siguiente compilación de comentarios de una publicación en redes sociales y devuelve
+        en un único JSON las cuatro anotaciones pedidas.
+
+        **Contexto de Marca:**
+        - **Narrativa:** {self.brand_context['narrativa']}
+        - **Arquetipo:** {self.brand_context['arquetipo']}
+        - **Tono de Voz:** {self.brand_context['tono_voz']}
+
+        **Comentarios:**
+        {comments_text}
+
+        **Instrucciones:**
+        1. Emociones: puntuación (0 a 1) de las 8 emociones principales y un resumen emocional.
+        2. Personalidad de marca (Aaker): distribución porcentual de los 5 rasgos (debe sumar 100) e
+           intensidad promedio (1 a 100) del rasgo dominante percibido.
+        3. Tópicos: los 3 tópicos principales con su sentimiento (positivo/negativo/neutral/mixto) y
+           su relevancia (0 a 1).
+        4. Sentimiento: clasifica cada comentario como Positivo, Negativo, Neutro o Mixto, devuelve la
+           distribución (proporciones entre 0 y 1), la subjetividad promedio (0.0 objetivo a 1.0 subjetivo)
+           y el comentario más representativo del sentimiento "Mixto".
+
+        Formato de salida JSON:
+        {{
+            "emociones": {{
+                "alegria": float, "tristeza": float, "miedo": float, "ira": float,
+                "sorpresa": float, "disgusto": float, "anticipacion": float, "confianza": float
+            }},
+            "resumen_emocional": "string",
+            "rasgos_distribuidos": {{
+                "sinceridad": float, "emocion": float, "competencia": float,
+                "sofisticacion": float, "robustez": float
+            }},
+            "intensidad_promedio": float,
+            "topicos_principales": [
+                {{"topico": "string", "sentimiento": "positivo/negativo/neutral/mixto", "porcentaje_relevancia": float}}
+            ],
+            "sentimiento": {{
+                "distribucion": {{"positivo": float, "negativo": float, "neutro": float, "mixto": float}},
+                "subjetividad_promedio": float,
+                "ejemplo_mixto": {{"texto": "string", "username": "string"}}
+            }}
+        }}
+        """
+
+    async def _annotate(self, post_url: Any, openai_client: Any) -> Dict[str, Any]:
+        lines = _comment_lines(self.dataset.comments_for(post_url))
+        if not lines:
+            raise ValueError(f"La publicación {post_url} no tiene comentarios para anotar")
+        # Publicaciones con demasiados comentarios se anotan por fragmentos y se combinan
+        request = functools.partial(self._request, openai_client=openai_client)
+        annotation, chunks = await map_reduce(lines, request, combine_annotations,
+                                              self.max_prompt_tokens, separator="\n")
+        self.chunks += chunks
+        return annotation
+
+    async def _request(self, comments_text: str, openai_client: Any) -> Dict[str, Any]:
+        self.llm_calls += 1
+        response = await openai_client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": FUSED_SYSTEM_PROMPT},
+                {"role": "user", "content": self.build_prompt(comments_text)}
+            ],
+            response_format={"type": "json_object"}
+        )
+        return json.loads(response.choices[0].message.content)
+
+    async def annotate(self, post_url: Any, openai_client: Optional[Any] = None) -> Dict[str, Any]:
+        """
+        Anotación fusionada del post (una llamada por post y corrida). Propaga el error si falla.
+        La llamada sale por `openai_client` del módulo que pide el post primero (su cliente
+        instrumentado), así sus tokens y llamadas cuentan en el manifest de ese módulo.
+        """
+        self.requests += 1
+        future = self._annotations.get(post_url)
+        if future is None:
+            future = asyncio.ensure_future(self._annotate(post_url, openai_client or self.openai_client))
+            self._annotations[post_url] = future
+            future.add_done_callback(lambda f, url=post_url: self._on_done(url, f))
+        # shield: si un módulo se cancela, la anotación sigue disponible para los demás
+        return await asyncio.shield(future)
+
+    def _on_done(self, post_url: Any, future: asyncio.Future):
+        if future.cancelled() or future.exception() is not None:
+            self.failures += 1
+            # No se memoriza el fallo: el siguiente módulo que pida el post reintenta
+            if self._annotations.get(post_url) is future:
+                del self._annotations[post_url]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "llm_calls": self.llm_calls,
+            "failures": self.failures,
+            "chunks": self.chunks,
+            "posts_annotated": sum(1 for f in self._annotations.values() if f.done() and not f.exception()),
+        }
@@ -0,0 +1,272 @@
+from collections.abc import Mapping as MappingABC
+from types import MappingProxyType
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+import json
+import math
+import os
+
+import pandas as pd
+
+from . import columnar
+from .incremental import fingerprint
+from .ndjson import HEADER_FILENAME, iter_ndjson, read_header
+from .post_features import SOURCE_COLUMNS as POST_FEATURE_SOURCE_COLUMNS, build_post_features
+
+INGESTED_FILENAME = 'ingested_data.json'
+RECORD_KINDS = ('posts', 'comments')
+
+
+class FrozenDict(dict):
+    """dict de sólo lectura: conserva isinstance(x, dict) y la serialización JSON."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("IngestedDataset es inmutable: copia los datos antes de modificarlos")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+class FrozenList(list):
+    """list de sólo lectura: conserva isinstance(x, list) y la serialización JSON."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("IngestedDataset es inmutable: copia los datos antes de modificarlos")
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = clear = extend = insert = pop = remove = reverse = sort = _readonly
+
+
+def _freeze(value: Any) -> Any:
+    """Convierte dicts/listas anidados en copias de sólo lectura."""
+    if isinstance(value, dict):
+        return FrozenDict((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return FrozenList(_freeze(v) for v in value)
+    return value
+
+
+class _IngestedView(MappingABC):
+    """Vista de sólo lectura con la forma de ingested_data.json; cada clave se materializa al pedirla."""
+
+    def __init__(self, dataset: 'IngestedDataset'):
+        self._dataset = dataset
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'client_ficha':
+            return self._dataset.client_ficha
+        if key in RECORD_KINDS:
+            return self._dataset._records(key)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(('client_ficha',) + RECORD_KINDS)
+
+    def __len__(self) -> int:
+        return 1 + len(RECORD_KINDS)
+
+
+class IngestedDataset:
+    """
+    Snapshot inmutable de los datos ingeridos para una corrida del orquestador.
+
+    El orquestador lo carga una sola vez y lo inyecta a todos los analizadores vía
+    `config["dataset"]`; así el archivo se parsea una vez por corrida y no una vez por módulo.
+    Los posts y comentarios se exponen como tuplas de vistas de sólo lectura (sin copiar
+    cada registro) y client_ficha como copia congelada: ningún analizador puede alterar
+    los datos que ven los demás.
+
+    Con la ingesta NDJSON (ver ndjson.py) sólo se lee la cabecera al cargar: posts y
+    comentarios se materializan la primera vez que un módulo los pide, e `iter_posts()` /
+    `iter_comments()` los recorren desde disco sin materializarlos.
+    """
+
+    def __init__(self, client_ficha: Dict[str, Any], posts: Optional[List[Dict[str, Any]]] = None,
+                 comments: Optional[List[Dict[str, Any]]] = None, source_path: Optional[str] = None,
+                 record_paths: Optional[Dict[str, str]] = None, counts: Optional[Dict[str, int]] = None):
+        self.source_path = source_path
+        self._client_ficha = _freeze(client_ficha or {})
+        # Archivos NDJSON de origen ('posts'/'comments' -> ruta) y sus conteos según la cabecera
+        self._record_paths = dict(record_paths or {})
+        self._counts = dict(counts or {})
+        # Registros originales (privados): sólo se usan para construir DataFrames sin copias extra
+        self._raw: Dict[str, List[Dict[str, Any]]] = {}
+        self._views: Dict[str, Tuple[Mapping[str, Any], ...]] = {}
+        for kind, records in (('posts', posts), ('comments', comments)):
+            if records is not None or kind not in self._record_paths:
+                self._set_records(kind, records or [])
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._post_features: Optional[pd.DataFrame] = None
+        self._comments_by_post: Optional[Dict[Any, Tuple[Mapping[str, Any], ...]]] = None
+
+    def _set_records(self, kind: str, records: List[Dict[str, Any]]):
+        self._raw[kind] = records
+        self._views[kind] = tuple(MappingProxyType(r) for r in records)
+
+    def _records(self, kind: str) -> Tuple[Mapping[str, Any], ...]:
+        if kind not in self._views:
+            self._set_records(kind, list(iter_ndjson(self._record_paths[kind])))
+        return self._views[kind]
+
+    @classmethod
+    def load(cls, outputs_dir: str) -> 'IngestedDataset':
+        """
+        Carga los datos ingeridos desde `outputs_dir`: la ingesta NDJSON si existe su cabecera,
+        si no ingested_data.json.
+        """
+        header = read_header(outputs_dir)
+        if header is not None:
+            record_paths = {kind: os.path.join(outputs_dir, name) for kind, name in (header.get('files') or {}).items()}
+            for kind in RECORD_KINDS:
+                if not os.path.exists(record_paths.get(kind, '')):
+                    raise FileNotFoundError(f"Falta el archivo de {kind} de la ingesta NDJSON en: {outputs_dir}")
+            return cls(
+                client_ficha=header.get('client_ficha', {}) or {},
+                source_path=os.path.join(outputs_dir, HEADER_FILENAME),
+                record_paths=record_paths,
+                counts=header.get('counts'),
+            )
+
+        json_path = os.path.join(outputs_dir, INGESTED_FILENAME)
+
+        if not os.path.exists(json_path):
+            raise FileNotFoundError(f"El archivo de datos ingeridos no se encontró en: {json_path}")
+
+        # use 'utf-8-sig' to gracefully handle files that may contain a BOM
+        with open(json_path, 'r', encoding='utf-8-sig') as f:
+            ingested_data = json.load(f)
+
+        return cls(
+            client_ficha=ingested_data.get('client_ficha', {}) or {},
+            posts=ingested_data.get('posts', []) or [],
+            comments=ingested_data.get('comments', []) or [],
+            source_path=json_path,
+        )
+
+    @property
+    def client_ficha(self) -> Mapping[str, Any]:
+        return self._client_ficha
+
+    @property
+    def posts(self) -> Tuple[Mapping[str, Any], ...]:
+        return self._records('posts')
+
+    @property
+    def comments(self) -> Tuple[Mapping[str, Any], ...]:
+        return self._records('comments')
+
+    @property
+    def post_count(self) -> int:
+        """Número de publicaciones, sin materializarlas si la cabecera NDJSON lo trae."""
+        return self._count('posts')
+
+    @property
+    def comment_count(self) -> int:
+        """Número de comentarios, sin materializarlos si la cabecera NDJSON lo trae."""
+        return self._count('comments')
+
+    def _count(self, kind: str) -> int:
+        if kind not in self._views and kind in self._counts:
+            return int(self._counts[kind])
+        return len(self._records(kind))
+
+    def source_signature(self) -> Optional[str]:
+        """
+        Firma de los archivos de la ingesta (nombre, tamaño y fecha de modificación): cambia si
+        se reingieren los datos. None si el dataset no se cargó desde disco.
+        """
+        if not self.source_path:
+            return None
+        paths = [self.source_path] + [self._record_paths[kind] for kind in sorted(self._record_paths)]
+        stats = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            stats.append((os.path.basename(path), stat.st_size, stat.st_mtime_ns))
+        return fingerprint(*stats)
+
+    def iter_posts(self) -> Iterator[Mapping[str, Any]]:
+        """Recorre las publicaciones; con ingesta NDJSON no materializadas, en streaming desde disco."""
+        return self._iter_records('posts')
+
+    def iter_comments(self) -> Iterator[Mapping[str, Any]]:
+        """Recorre los comentarios; con ingesta NDJSON no materializados, en streaming desde disco."""
+        return self._iter_records('comments')
+
+    def _iter_records(self, kind: str) -> Iterator[Mapping[str, Any]]:
+        if kind in self._views:
+            return iter(self._views[kind])
+        # Cada registro leído del archivo es un dict nuevo: nadie más lo comparte
+        return iter_ndjson(self._record_paths[kind])
+
+    def as_dict(self) -> Mapping[str, Any]:
+        """Vista con la misma forma que ingested_data.json (client_ficha, posts, comments)."""
+        return _IngestedView(self)
+
+    def posts_frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        DataFrame de posts, sólo con `columns` si se indican (las que no existan se omiten).
+        Cada llamada entrega un DataFrame propio.
+        """
+        return self._frame('posts', columns)
+
+    def comments_frame(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """DataFrame de comentarios, sólo con `columns` si se indican. Cada llamada entrega uno propio."""
+        return self._frame('comments', columns)
+
+    def post_features(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Features normalizadas por post (métricas numéricas, interactions, _ts, followers,
+        er_followers, er_views, is_competitor; ver post_features.py), calculadas una sola vez
+        por corrida. Cada llamada entrega un DataFrame propio, sólo con `columns` si se indican.
+        """
+        if self._post_features is None:
+            self._post_features = build_post_features(self.posts_frame(POST_FEATURE_SOURCE_COLUMNS), self._client_ficha)
+        df = self._post_features
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df.copy()
+
+    def _frame(self, kind: str, columns: Optional[List[str]]) -> pd.DataFrame:
+        columnar_path = self._record_paths.get(f'{kind}_columnar')
+        if columnar_path and columnar.available() and os.path.exists(columnar_path):
+            # Copia Parquet tipada: conteos enteros, timestamps datetime y categorías
+            return columnar.read_frame(columnar_path, columns)
+        # Sin copia columnar: el DataFrame se construye una vez a partir de los registros
+        if kind not in self._frames:
+            self._records(kind)
+            self._frames[kind] = pd.DataFrame(self._raw[kind])
+        df = self._frames[kind]
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return df.copy()
+
+    def comments_by_post(self) -> Mapping[Any, Tuple[Mapping[str, Any], ...]]:
+        """
+        Índice post_url -> comentarios (en su orden original), construido en una sola pasada.
+        Evita filtrar la tabla completa de comentarios una vez por publicación.
+        """
+        if self._comments_by_post is None:
+            groups: Dict[Any, List[Mapping[str, Any]]] = {}
+            for comment in self.comments:
+                groups.setdefault(comment.get('post_url'), []).append(comment)
+            self._comments_by_post = {url: tuple(items) for url, items in groups.items()}
+        return MappingProxyType(self._comments_by_post)
+
+    def comments_for(self, post_url: Any) -> Tuple[Mapping[str, Any], ...]:
+        """Comentarios de una publicación (tupla vacía si no tiene)."""
+        return self.comments_by_post().get(post_url, ())
+
+    def comment_texts_for(self, post_url: Any) -> List[str]:
+        """
+        Textos de los comentarios de una publicación, descartando los nulos.
+        Equivale a `comments_df[comments_df.post_url == url]['comment_text'].dropna().astype(str)`.
+        """
+        texts = []
+        for comment in self.comments_for(post_url):
+            text = comment.get('comment_text')
+            if text is None or (isinstance(text, float) and math.isnan(text)):
+                continue
+            texts.append(str(text))
+        return texts
@@ -0,0 +1,40 @@
+"""
+Tasas de engagement vectorizadas (operaciones por columna, sin df.apply fila a fila).
+
+Reproducen exactamente las reglas que los módulos aplicaban por fila:
+
+- `safe_div(i, v)` de Q14/Q15: i / v si v es un número > 0; si no (nulo, NaN, 0, negativo), nulo.
+- `compute_er(row)` de Q11: interactions / followers si los seguidores de la red son > 0;
+  si no, interactions / views con la misma regla; si tampoco, nulo.
+
+Los nulos se devuelven como NaN (float64).
+"""
+import numpy as np
+import pandas as pd
+
+
+def safe_rate(numerator: pd.Series, denominator: pd.Series) -> pd.Series:
+    """numerator / denominator donde el denominador es > 0; NaN en el resto (NaN > 0 es falso)."""
+    num = pd.to_numeric(numerator, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    den = pd.to_numeric(denominator, errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    valid = den > 0
+    out = np.full(den.shape, np.nan)
+    np.divide(num, den, out=out, where=valid)
+    return pd.Series(out, index=denominator.index)
+
+
+def er_by_views(interactions: pd.Series, views: pd.Series) -> pd.Series:
+    """ER sobre vistas: interactions / views (NaN si views no es > 0)."""
+    return safe_rate(interactions, views)
+
+
+def er_by_followers(interactions: pd.Series, followers: pd.Series) -> pd.Series:
+    """ER sobre seguidores: interactions / followers (NaN si followers no es > 0)."""
+    return safe_rate(interactions, followers)
+
+
+def er_followers_first(interactions: pd.Series, followers: pd.Series, views: pd.Series) -> pd.Series:
+    """ER sobre seguidores cuando hay seguidores válidos para la red del post; si no, ER sobre vistas."""
+    by_followers = er_by_followers(interactions, followers)
+    has_followers = pd.to_numeric(followers, errors="coerce").to_numpy(dtype=float, na_value=np.nan) > 0
+    return by_followers.where(has_followers, er_by_views(interactions, views))
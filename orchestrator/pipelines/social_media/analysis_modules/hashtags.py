@@ -0,0 +1,130 @@
+"""
+Extracción de hashtags e índice invertido hashtag -> filas de posts.
+
+Los hashtags se extraen de todos los captions en una sola pasada (str.extractall) y se
+normalizan: minúsculas (casefold) y sin acentos, así "#Diseño", "#diseño" y "#DISENO"
+cuentan como el mismo hashtag ("#diseno").
+
+El índice se guarda en outputs/indexes/hashtags.json:
+
+    {
+        "format_version": 1,
+        "source_signature": "...",     firma de los archivos de la ingesta (ver IngestedDataset)
+        "post_count": 1000,
+        "hashtags": {"#diseno": [0, 17, 245], ...}
+    }
+
+Cada fila es la posición del post en la ingesta (línea de ingested_posts.ndjson, fila del
+Parquet o índice en ingested_data.json["posts"]), sin repetidos y en orden. Mientras la
+firma coincida, Q15 (y cualquier vista que necesite los posts de un hashtag) lo reutiliza
+sin volver a recorrer los captions.
+"""
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import os
+
+import pandas as pd
+
+INDEXES_DIRNAME = 'indexes'
+HASHTAG_INDEX_FILENAME = 'hashtags.json'
+FORMAT_VERSION = 1
+
+HASHTAG_PATTERN = r'#(\w+)'
+# Marcas diacríticas combinantes que quedan separadas de la letra tras la normalización NFKD
+COMBINING_MARKS = '[\u0300-\u036f]'
+
+
+def index_path(outputs_dir: str) -> str:
+    return os.path.join(outputs_dir, INDEXES_DIRNAME, HASHTAG_INDEX_FILENAME)
+
+
+def normalize_tags(tags: pd.Series) -> pd.Series:
+    """Casefold y sin acentos: "Diseño" -> "diseno"."""
+    return (tags.str.casefold()
+            .str.normalize('NFKD')
+            .str.replace(COMBINING_MARKS, '', regex=True)
+            .str.normalize('NFC'))
+
+
+def extract_hashtags(captions: pd.Series) -> pd.DataFrame:
+    """
+    Hashtags normalizados de cada caption como tabla larga (row, hashtag), con `row` la
+    posición del caption en la serie. Un hashtag repetido en el mismo caption cuenta una vez;
+    los captions vacíos, nulos o que no son texto no aportan filas.
+    """
+    captions = pd.Series(captions.to_numpy(dtype=object), dtype=object)
+    captions = captions.where(captions.map(lambda value: isinstance(value, str)))
+    matches = captions.str.extractall(HASHTAG_PATTERN)
+    if matches.empty:
+        return pd.DataFrame({'row': pd.Series(dtype='int64'), 'hashtag': pd.Series(dtype=object)})
+    pairs = pd.DataFrame({
+        'row': matches.index.get_level_values(0).astype('int64'),
+        'hashtag': '#' + normalize_tags(matches[0].astype(object)),
+    })
+    return pairs.drop_duplicates(ignore_index=True)
+
+
+def build_index(captions: pd.Series) -> Dict[str, List[int]]:
+    """Índice invertido hashtag -> filas (ordenadas) de los posts que lo usan."""
+    pairs = extract_hashtags(captions).sort_values(['hashtag', 'row'], kind='stable')
+    return {tag: rows.tolist() for tag, rows in pairs.groupby('hashtag', sort=False)['row']}
+
+
+def load_index(outputs_dir: str, source_signature: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Índice guardado en outputs_dir, o None si no existe, es ilegible o (si se indica
+    `source_signature`) se construyó a partir de otra ingesta.
+    """
+    path = index_path(outputs_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Índice de hashtags ilegible en {path}, se reconstruye: {e}")
+        return None
+    if data.get('format_version') != FORMAT_VERSION:
+        return None
+    if source_signature is not None and data.get('source_signature') != source_signature:
+        return None
+    return data
+
+
+def save_index(outputs_dir: str, hashtags: Dict[str, List[int]], post_count: int,
+               source_signature: Optional[str]) -> str:
+    path = index_path(outputs_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        'format_version': FORMAT_VERSION,
+        'source_signature': source_signature,
+        'post_count': post_count,
+        'hashtags': hashtags,
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def hashtag_index(dataset: Any, outputs_dir: str) -> Dict[str, List[int]]:
+    """
+    Índice de hashtags de la ingesta actual: el guardado si corresponde a los mismos archivos;
+    si no, se construye desde los captions y se guarda para las siguientes lecturas.
+    """
+    signature = dataset.source_signature()
+    if signature is not None:
+        cached = load_index(outputs_dir, signature)
+        if cached is not None:
+            return cached.get('hashtags') or {}
+
+    posts = dataset.posts_frame(['caption'])
+    captions = posts['caption'] if 'caption' in posts.columns else pd.Series([None] * len(posts), dtype=object)
+    hashtags = build_index(captions)
+    try:
+        save_index(outputs_dir, hashtags, len(posts), signature)
+    except OSError as e:
+        logging.warning(f"No se pudo guardar el índice de hashtags: {e}")
+    return hashtags
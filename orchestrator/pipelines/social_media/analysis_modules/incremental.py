@@ -0,0 +1,59 @@
+from typing import Any, Dict, Optional
+import hashlib
+import json
+import logging
+import os
+
+STATE_DIRNAME = '_state'
+
+
+def fingerprint(*parts: Any) -> str:
+    """Hash estable del contenido que se envía al LLM para una publicación."""
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class IncrementalState:
+    """
+    Resultados por publicación de la corrida anterior, indexados por post_url junto con
+    el fingerprint de su contenido (outputs/_state/<stem>.fingerprints.json).
+
+    Si el fingerprint de un post no cambió, su resultado anterior se reutiliza y no se
+    vuelve a llamar al LLM. Al guardar sólo se conservan los posts vistos en esta corrida,
+    así los posts eliminados del dataset no se arrastran.
+    """
+
+    def __init__(self, outputs_dir: str, stem: str):
+        self.path = os.path.join(outputs_dir, STATE_DIRNAME, f"{stem}.fingerprints.json")
+        self._previous: Dict[str, Dict[str, Any]] = {}
+        self._current: Dict[str, Dict[str, Any]] = {}
+        self.reused = 0
+        self.recomputed = 0
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._previous = json.load(f).get('posts', {}) or {}
+            except (OSError, ValueError) as e:
+                logging.warning(f"Estado incremental ilegible en {self.path}, se recalcula todo: {e}")
+                self._previous = {}
+
+    def lookup(self, post_url: str, fp: str) -> Optional[Any]:
+        """Resultado previo si el fingerprint coincide; None si hay que recalcular."""
+        previous = self._previous.get(post_url)
+        if previous is not None and previous.get('fingerprint') == fp:
+            self._current[post_url] = previous
+            self.reused += 1
+            return previous.get('result')
+        self.recomputed += 1
+        return None
+
+    def record(self, post_url: str, fp: str, result: Any):
+        self._current[post_url] = {'fingerprint': fp, 'result': result}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'posts': self._current}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,115 @@
+"""
+Formato de ingesta en streaming (NDJSON) dentro de outputs_dir:
+
+    ingested_header.json            client_ficha, conteos y nombres de los archivos de registros
+    ingested_posts.ndjson[.gz]      una publicación por línea
+    ingested_comments.ndjson[.gz]   un comentario por línea
+
+A diferencia de ingested_data.json (un único documento indentado), los registros se pueden
+recorrer de a uno sin cargar el archivo completo. La cabecera se escribe al final: si existe,
+los archivos de registros que nombra están completos. Con `columnar=True` (y pyarrow) se
+escribe además una copia Parquet tipada de cada archivo (ver columnar.py).
+"""
+from typing import Any, Dict, Iterable, Iterator, Optional
+import gzip
+import json
+import logging
+import os
+
+from . import columnar as columnar_io
+
+HEADER_FILENAME = 'ingested_header.json'
+POSTS_FILENAME = 'ingested_posts.ndjson'
+COMMENTS_FILENAME = 'ingested_comments.ndjson'
+GZIP_SUFFIX = '.gz'
+FORMAT_VERSION = 1
+
+_encoder = json.JSONEncoder(ensure_ascii=False, default=str)
+
+
+def _open_text(path: str, mode: str, compressed: bool):
+    if compressed:
+        # Nivel 5: casi el mismo tamaño que el nivel por defecto (9) y bastante más rápido
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=5)
+    return open(path, mode, encoding='utf-8')
+
+
+def iter_ndjson(path: str) -> Iterator[Dict[str, Any]]:
+    """Recorre un archivo NDJSON (comprimido o no) registro a registro; ignora líneas vacías."""
+    with _open_text(path, 'r', path.endswith(GZIP_SUFFIX)) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def write_ndjson(path: str, records: Iterable[Dict[str, Any]]) -> int:
+    """Escribe `records` en `path` (de forma atómica) y devuelve cuántos escribió."""
+    count = 0
+    tmp_path = path + '.tmp'
+    with _open_text(tmp_path, 'w', path.endswith(GZIP_SUFFIX)) as f:
+        for record in records:
+            f.write(_encoder.encode(record))
+            f.write('\n')
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def read_header(outputs_dir: str) -> Optional[Dict[str, Any]]:
+    """Cabecera de la ingesta NDJSON en `outputs_dir`, o None si no hay una."""
+    path = os.path.join(outputs_dir, HEADER_FILENAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return json.load(f)
+
+
+def _tee(records: Iterable[Dict[str, Any]], writer: 'columnar_io.ColumnarWriter') -> Iterator[Dict[str, Any]]:
+    for record in records:
+        writer.append(record)
+        yield record
+
+
+def write_ingested_ndjson(outputs_dir: str, client_ficha: Dict[str, Any], posts: Iterable[Dict[str, Any]],
+                          comments: Iterable[Dict[str, Any]], compress: bool = False,
+                          columnar: bool = False) -> Dict[str, int]:
+    """
+    Escribe los datos ingeridos en formato NDJSON. `posts` y `comments` pueden ser generadores:
+    se consumen una sola vez, sin acumularlos en memoria (la copia columnar, si se pide, se
+    escribe en la misma pasada).
+    """
+    if columnar and not columnar_io.available():
+        logging.warning("pyarrow no está instalado: se omite la copia columnar de la ingesta.")
+        columnar = False
+    suffix = GZIP_SUFFIX if compress else ''
+    header_path = os.path.join(outputs_dir, HEADER_FILENAME)
+    # Mientras se reescriben los registros no debe quedar una cabecera que los dé por completos
+    if os.path.exists(header_path):
+        os.remove(header_path)
+
+    counts = {}
+    files = {}
+    for key, basename, records, columnar_name in (
+            ('posts', POSTS_FILENAME, posts, columnar_io.POSTS_COLUMNAR_FILENAME),
+            ('comments', COMMENTS_FILENAME, comments, columnar_io.COMMENTS_COLUMNAR_FILENAME)):
+        writer = columnar_io.ColumnarWriter(os.path.join(outputs_dir, columnar_name)) if columnar else None
+        files[key] = basename + suffix
+        counts[key] = write_ndjson(os.path.join(outputs_dir, files[key]), _tee(records, writer) if writer else records)
+        if writer is not None and writer.close():
+            files[f'{key}_columnar'] = columnar_name
+        # Quitar la variante con la otra compresión para no dejar dos versiones del mismo dataset
+        stale = os.path.join(outputs_dir, basename + ('' if compress else GZIP_SUFFIX))
+        if os.path.exists(stale):
+            os.remove(stale)
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'client_ficha': client_ficha or {},
+        'counts': counts,
+        'files': files,
+    }
+    tmp_path = header_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(header, f, ensure_ascii=False, indent=4, default=str)
+    os.replace(tmp_path, header_path)
+    return counts
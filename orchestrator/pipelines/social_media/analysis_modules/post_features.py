@@ -0,0 +1,95 @@
+from typing import Any, Dict, Mapping, Optional
+import math
+
+import numpy as np
+import pandas as pd
+
+from .engagement import er_by_followers, er_by_views
+
+# Columnas de los posts que usan los módulos cuantitativos (las que falten se omiten)
+SOURCE_COLUMNS = ["post_id", "post_url", "ownerUsername", "social_network", "content_type", "timestamp",
+                  "caption", "is_competitor", "likesCount", "commentsCount", "viewsCount"]
+METRIC_COLUMNS = ["likesCount", "commentsCount", "viewsCount"]
+
+# social_network (sin distinguir mayúsculas) -> campo de seguidores en client_ficha
+NETWORK_FOLLOWER_FIELDS = {
+    "instagram": "seguidores_instagram",
+    "tiktok": "seguidores_tiktok",
+    "otra": "seguidores_otra_red_x",
+}
+
+# Valores de texto que cuentan como verdaderos en is_competitor (las planillas traen "TRUE"/"FALSE")
+TRUE_STRINGS = {"true", "1", "yes", "y", "si", "sí", "t"}
+
+
+def _to_float(value: Any) -> Optional[float]:
+    try:
+        number = float(str(value).replace(",", "")) if isinstance(value, str) else float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+def network_followers(client_ficha: Mapping[str, Any]) -> Dict[str, float]:
+    """Seguidores del cliente por red (clave en minúsculas); sólo redes con un valor positivo."""
+    followers = {}
+    for network, field in NETWORK_FOLLOWER_FIELDS.items():
+        value = _to_float((client_ficha or {}).get(field))
+        if value is not None and value > 0:
+            followers[network] = int(value) if value.is_integer() else value
+    return followers
+
+
+def _as_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_STRINGS
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return False
+    return bool(value)
+
+
+def parse_bool(series: pd.Series) -> pd.Series:
+    """Convierte una columna de banderas ("TRUE"/"FALSE", 1/0, bool, nulos) en bool; nulo = False."""
+    if pd.api.types.is_bool_dtype(series):
+        return series.astype(bool)
+    return series.astype(object).map(_as_bool).astype(bool)
+
+
+def build_post_features(posts: pd.DataFrame, client_ficha: Mapping[str, Any]) -> pd.DataFrame:
+    """
+    Normaliza el DataFrame de posts (se modifica en el lugar y se devuelve):
+
+    - likesCount / commentsCount / viewsCount numéricos (NaN si faltan o no son números)
+    - interactions = likes + comments (nulos como 0)
+    - _ts: timestamp en UTC sin zona (NaT si no se puede interpretar), igual que la copia columnar
+    - followers: seguidores del cliente en la red del post, según client_ficha
+    - er_followers = interactions / followers y er_views = interactions / views, NaN cuando
+      el denominador falta o no es positivo
+    - is_competitor como bool
+    """
+    df = posts
+    for col in METRIC_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        else:
+            df[col] = np.nan
+    df["interactions"] = df["likesCount"].fillna(0) + df["commentsCount"].fillna(0)
+
+    if "timestamp" in df.columns:
+        df["_ts"] = pd.to_datetime(df["timestamp"], errors="coerce", utc=True).dt.tz_convert(None)
+    else:
+        df["_ts"] = pd.NaT
+
+    if "social_network" in df.columns:
+        networks = df["social_network"].astype(object).str.lower()
+        df["followers"] = networks.map(network_followers(client_ficha)).astype(float)
+    else:
+        df["followers"] = np.nan
+    df["er_followers"] = er_by_followers(df["interactions"], df["followers"])
+    df["er_views"] = er_by_views(df["interactions"], df["viewsCount"])
+
+    if "is_competitor" in df.columns:
+        df["is_competitor"] = parse_bool(df["is_competitor"])
+    else:
+        df["is_competitor"] = False
+    return df
@@ -1,5 +1,4 @@
 import json
-import os
 from typing import Any, Dict
 from datetime import datetime
 
@@ -19,32 +18,13 @@ class Q10ResumenEjecutivo(BaseAnalyzer):
 		devuelve un resumen heurístico mínimo basado en los outputs
 		disponibles en el directorio de outputs.
 		"""
-		ingested = self.load_ingested_data()
-
-		# Cargar insights previos (Q1..Q9, etc.) para trazabilidad
-		insights = {}
-		try:
-			files = os.listdir(self.outputs_dir)
-		except Exception:
-			files = []
-
-		for fname in files:
-			if not fname.lower().endswith('.json'):
-				continue
-			# evitar leer errores o el propio Q10 si existe
-			if fname.lower().startswith('q10_') or fname.lower().endswith('_error.json'):
-				continue
-			key = fname.split('_')[0].upper()
-			try:
-				with open(os.path.join(self.outputs_dir, fname), 'r', encoding='utf-8') as f:
-					insights[key] = json.load(f)
-			except Exception:
-				continue
+		# Cargar insights previos (Q1..Q9, etc.) para trazabilidad; sin el propio Q10 ni errores
+		insights = self.load_module_outputs(exclude=["Q10"])
 
 		# Construir prompt compacto (evitar enviar todo el contenido por tamaño)
 		available = list(insights.keys())
 		prompt_summary = {
-			"ingested_posts": len(ingested.get('posts', [])),
+			"ingested_posts": self.dataset.post_count,
 			"available_insights": available
 		}
 
@@ -5,6 +5,8 @@ import json
 import pandas as pd
 
 from .base_analyzer import BaseAnalyzer
+from .actors import aggregate_by_actor, competitor_handle_map, landscape_followers
+from .engagement import er_followers_first
 
 
 class Q11Engagement(BaseAnalyzer):
@@ -27,10 +29,7 @@ class Q11Engagement(BaseAnalyzer):
 		Carga datos ingeridos y calcula métricas de engagement.
 		Nota: método pensado como cálculo cuantitativo (no llamadas a LLM).
 		"""
-		ingested = self.load_ingested_data()
-
-		posts = ingested.get("posts", [])
-		if not posts:
+		if not self.dataset.post_count:
 			return {
 				"engagement_global_promedio": None,
 				"engagement_segmentado_red": [],
@@ -38,49 +37,14 @@ class Q11Engagement(BaseAnalyzer):
 				"benchmark_comparativo": {"z_score_er": None, "competitor_mean_er": None}
 			}
 
-		# Crear DataFrame y normalizar columnas
-		df = pd.DataFrame(posts)
-
-		# Normalizar columnas numéricas y valores vacíos
-		for col in ["likesCount", "commentsCount", "viewsCount"]:
-			if col in df.columns:
-				df[col] = pd.to_numeric(df[col], errors="coerce")
-			else:
-				df[col] = pd.NA
-
-		# Interacciones (definición simple: likes + comments)
-		df["interactions"] = df["likesCount"].fillna(0) + df["commentsCount"].fillna(0)
-
-		# Obtener seguidores por red desde client_ficha si está disponible
-		client_ficha = ingested.get("client_ficha", {}) or {}
-		followers_map = {
-			"instagram": client_ficha.get("seguidores_instagram"),
-			"tiktok": client_ficha.get("seguidores_tiktok"),
-			# fallback genérico
-			"otra_red_x": client_ficha.get("seguidores_otra_red_x")
-		}
-
-		def compute_er(row):
-			# Primero intentar usar seguidores por red
-			sn = str(row.get("social_network", "")).lower()
-			followers = None
-			if sn and sn in followers_map and followers_map.get(sn):
-				followers = followers_map.get(sn)
-
-			interactions = row.get("interactions", 0) or 0
-			views = row.get("viewsCount")
-
-			# Preferir tasa sobre seguidores; si no disponible, usar interacciones/views
-			try:
-				if followers and followers > 0:
-					return float(interactions) / float(followers)
-				if views and float(views) > 0:
-					return float(interactions) / float(views)
-			except Exception:
-				return None
-			return None
+		# Features compartidas de la corrida: métricas numéricas, interactions (likes + comments),
+		# _ts, seguidores de la red del post (desde client_ficha) e is_competitor como bool
+		df = self.dataset.post_features(columns=["social_network", "ownerUsername", "timestamp", "_ts", "is_competitor",
+		                                         "interactions", "viewsCount", "followers"])
+		client_ficha = self.dataset.client_ficha or {}
 
-		df["er_interaction"] = df.apply(compute_er, axis=1)
+		# ER por post: sobre los seguidores del cliente en la red del post; si no hay, sobre views
+		df["er_interaction"] = er_followers_first(df["interactions"], df["followers"], df["viewsCount"])
 
 		# Engagement global promedio (media de ER por post)
 		engagement_global_promedio = None
@@ -92,7 +56,7 @@ class Q11Engagement(BaseAnalyzer):
 		# Segmentación por red social
 		engagement_segmentado = []
 		try:
-			grouped = df.groupby("social_network")["er_interaction"].mean()
+			grouped = df.groupby("social_network", observed=True)["er_interaction"].mean()
 			for sn, val in grouped.items():
 				engagement_segmentado.append({"social_network": sn, "engagement_rate": None if pd.isna(val) else float(val)})
 		except Exception:
@@ -102,7 +66,6 @@ class Q11Engagement(BaseAnalyzer):
 		serie_temporal = []
 		if "timestamp" in df.columns:
 			try:
-				df["_ts"] = pd.to_datetime(df["timestamp"], errors="coerce")
 				weekly = df.set_index("_ts")["er_interaction"].resample("W").mean()
 				for ts, val in weekly.items():
 					serie_temporal.append({"week_start": ts.strftime("%Y-%m-%d"), "engagement_rate": None if pd.isna(val) else float(val)})
@@ -114,7 +77,7 @@ class Q11Engagement(BaseAnalyzer):
 		try:
 			# 1) calcular media y std de competidores a partir de posts marcados como is_competitor
 			if "is_competitor" in df.columns:
-				comp_df = df[df["is_competitor"].astype(str).str.upper() == "TRUE"]
+				comp_df = df[df["is_competitor"]]
 				if not comp_df.empty:
 					comp_mean = comp_df["er_interaction"].dropna().mean()
 					comp_std = comp_df["er_interaction"].dropna().std()
@@ -122,7 +85,7 @@ class Q11Engagement(BaseAnalyzer):
 
 					# medias por red
 					try:
-						comp_by_net = comp_df.groupby("social_network")["er_interaction"].mean().to_dict()
+						comp_by_net = comp_df.groupby("social_network", observed=True)["er_interaction"].mean().to_dict()
 						# convertir numpy floats a float nativos y omitir NaN
 						comp_by_net_clean = {k: (None if pd.isna(v) else float(v)) for k, v in comp_by_net.items()}
 						benchmark["competitor_mean_by_network"] = comp_by_net_clean
@@ -164,7 +127,7 @@ class Q11Engagement(BaseAnalyzer):
 		actors: List[Dict[str, Any]] = []
 
 		# Client metrics
-		client_posts = df[~df.get("is_competitor", False).astype(bool)] if "is_competitor" in df.columns else df
+		client_posts = df[~df["is_competitor"]]
 		client_er = None
 		try:
 			client_er = float(client_posts["er_interaction"].dropna().mean())
@@ -183,46 +146,17 @@ class Q11Engagement(BaseAnalyzer):
 		}
 		actors.append(client_entry)
 
-		# Competitor metrics: aggregate per ownerUsername
-		comp_df = df[df.get("is_competitor") == True] if "is_competitor" in df.columns else df[df.get("is_competitor")]
-		comp_by_account = {}
-		if not comp_df.empty:
-			for _, row in comp_df.iterrows():
-				acc = row.get("ownerUsername")
-				if not acc:
-					continue
-				comp_by_account.setdefault(acc, []).append(row.get("er_interaction"))
-
-		# Try to extract competitor follower info from client_ficha competitor_landscape
-		raw_comp_landscape = client_ficha.get("competitor_landscape")
-		comp_landscape = []
-		try:
-			if isinstance(raw_comp_landscape, str):
-				comp_landscape = json.loads(raw_comp_landscape)
-			elif isinstance(raw_comp_landscape, list):
-				comp_landscape = raw_comp_landscape
-		except Exception:
-			comp_landscape = []
-
-		# map handle -> entry
-		handle_map = {}
-		for entry in comp_landscape:
-			insta = entry.get("instagram") or ""
-			handle = insta.rstrip('/').split('/')[-1] if insta else entry.get('instagram_username') or entry.get('name')
-			handle_map[handle] = entry
-
-		for acc, ers in comp_by_account.items():
-			clean_ers = [e for e in ers if e is not None]
-			er_mean = float(pd.Series(clean_ers).mean()) if clean_ers else None
+		# Competitor metrics: aggregate per ownerUsername (nombre y seguidores desde competitor_landscape)
+		comp_by_account = aggregate_by_actor(df.loc[df["is_competitor"], ["ownerUsername", "er_interaction"]], er_column="er_interaction")
+		handle_map = competitor_handle_map(client_ficha)
+
+		for acc, er_mean in comp_by_account["er_mean"].items():
 			entry = handle_map.get(acc, {})
-			followers = None
-			if isinstance(entry, dict):
-				followers = entry.get('instagram_followers') or entry.get('seguidores_instagram')
 			actors.append({
-				"actor": entry.get('name') if isinstance(entry, dict) else acc,
+				"actor": entry.get('name'),
 				"username": acc,
-				"followers": followers,
-				"er_mean": er_mean
+				"followers": landscape_followers(entry),
+				"er_mean": None if pd.isna(er_mean) else float(er_mean)
 			})
 
 		result["actors"] = actors
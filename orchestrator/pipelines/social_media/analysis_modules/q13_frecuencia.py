@@ -1,49 +1,211 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
 import pandas as pd
 import os
 import json
 
 from .base_analyzer import BaseAnalyzer
 
+# granularidad -> nombre en el output
+GRANULARITIES = {
+	"D": "diaria",
+	"W": "semanal",
+	"M": "mensual",
+}
+# Se pueden elegir con config["frequency_analysis"]["granularities"]; la diaria siempre se calcula
+DEFAULT_GRANULARITIES = ("D", "W", "M")
+# Tramos del histograma de intervalos entre posts consecutivos (horas)
+GAP_EDGES_HOURS = [1, 6, 24, 72, 168]
+GAP_LABELS = ["<1h", "1-6h", "6-24h", "1-3d", "3-7d", ">7d"]
+KEY_COLUMNS = ("social_network", "ownerUsername")
+
+
+def present_keys(df: pd.DataFrame, column: str) -> List[Any]:
+	"""Valores no nulos de `column`, ordenados (mismo orden que un groupby)."""
+	if column not in df.columns:
+		return []
+	return list(pd.Index(df[column].dropna().astype(object).unique()).sort_values())
+
+
+def daily_counts(df: pd.DataFrame) -> Dict[str, Any]:
+	"""
+	Posts por (social_network, ownerUsername, día), sólo para los días con posts, como arrays:
+	"day" (días desde 1970-01-01), "posts", y por columna clave "codes" (índice en "labels",
+	ordenados; -1 si es nula: cuenta para el total global pero no para ninguna clave).
+	"""
+	stamps = df["_ts"]
+	if getattr(stamps.dt, "tz", None) is not None:
+		stamps = stamps.dt.tz_convert(None)
+	dated = stamps.notna().to_numpy()
+	days = stamps.to_numpy(dtype="datetime64[ns]")[dated].astype("datetime64[D]").astype(np.int64)
+	codes, labels = {}, {}
+	for col in KEY_COLUMNS:
+		if col in df.columns:
+			codes[col], labels[col] = pd.factorize(df[col].astype(object).to_numpy()[dated], sort=True)
+		else:
+			codes[col], labels[col] = np.full(len(days), -1, dtype=np.int64), np.array([], dtype=object)
+	if len(days) == 0:
+		return {"day": days, "posts": days, "codes": codes, "labels": labels}
+
+	# una celda por (red, actor, día): códigos combinados en un entero y np.unique con conteos
+	first_day = days.min()
+	n_days = int(days.max() - first_day) + 1
+	n_owners = len(labels["ownerUsername"]) + 1
+	cell = ((codes["social_network"] + 1) * n_owners + codes["ownerUsername"] + 1) * n_days + (days - first_day)
+	cells, posts = np.unique(cell, return_counts=True)
+	keys = cells // n_days
+	return {
+		"day": cells % n_days + first_day,
+		"posts": posts,
+		"codes": {"social_network": keys // n_owners - 1, "ownerUsername": keys % n_owners - 1},
+		"labels": labels,
+	}
+
+
+def _periods(days: np.ndarray, granularity: str) -> np.ndarray:
+	"""Número de período (día, semana lunes-domingo o mes) de cada día desde 1970-01-01."""
+	if granularity == "W":
+		# 1970-01-01 fue jueves: corrido 3 días, cada semana empieza en lunes
+		return (days + 3) // 7
+	if granularity == "M":
+		return days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+	return days
+
+
+def _period_stats(groups: np.ndarray, periods: np.ndarray, posts: np.ndarray) -> Dict[int, Tuple[float, float]]:
+	"""
+	Media y desviación (ddof=1) de posts por período de cada grupo (código >= 0), contando
+	como 0 los períodos sin posts entre el primero y el último del grupo. Se calculan
+	analíticamente a partir de los períodos con posts (n, suma y suma de cuadrados), sin
+	rellenar la serie.
+	"""
+	valid = groups >= 0
+	groups, periods, posts = groups[valid], periods[valid], posts[valid]
+	if len(groups) == 0:
+		return {}
+	first_period = periods.min()
+	n_periods = int(periods.max() - first_period) + 1
+	# posts por (grupo, período); las celdas quedan ordenadas por grupo y luego por período
+	cells, inverse = np.unique(groups * n_periods + (periods - first_period), return_inverse=True)
+	sums = np.bincount(inverse.ravel(), weights=posts)
+	cell_groups = cells // n_periods
+	cell_periods = cells % n_periods
+	present, starts = np.unique(cell_groups, return_index=True)
+	ends = np.append(starts[1:], len(cells)) - 1
+	total = np.add.reduceat(sums, starts)
+	sq = np.add.reduceat(sums ** 2, starts)
+	span = (cell_periods[ends] - cell_periods[starts] + 1).astype(float)
+	mean = total / span
+	# suma de desvíos al cuadrado: períodos con posts + (span - activos) períodos en 0
+	squares = np.clip(sq - 2 * mean * total + span * mean ** 2, 0, None)
+	with np.errstate(divide="ignore", invalid="ignore"):
+		std = np.where(span > 1, np.sqrt(squares / (span - 1)), np.nan)
+	return {int(g): (float(m), float(sd)) for g, m, sd in zip(present, mean, std)}
+
+
+def frequency_tables(daily: Optional[Dict[str, Any]], granularity: str) -> Dict[str, Any]:
+	"""Media y desviación de posts por período (día, semana o mes): global, por red y por actor."""
+	tables = {"global": (0.0, 0.0), "social_network": {}, "ownerUsername": {}}
+	if daily is None or len(daily["day"]) == 0:
+		return tables
+	periods = _periods(daily["day"], granularity)
+	tables["global"] = _period_stats(np.zeros(len(periods), dtype=np.int64), periods, daily["posts"])[0]
+	for key in KEY_COLUMNS:
+		labels = daily["labels"][key]
+		stats = _period_stats(daily["codes"][key], periods, daily["posts"])
+		tables[key] = {labels[code]: value for code, value in stats.items()}
+	return tables
+
+
+def _gap_summary(hours: pd.Series) -> Dict[str, Any]:
+	values = hours.to_numpy(dtype=float)
+	if len(values) == 0:
+		return {"intervalos": 0}
+	p25, p50, p75, p90 = np.percentile(values, [25, 50, 75, 90])
+	histogram = np.bincount(np.searchsorted(GAP_EDGES_HOURS, values, side="right"), minlength=len(GAP_LABELS))
+	return {
+		"intervalos": int(len(values)),
+		"media": round(float(values.mean()), 3),
+		"mediana": round(float(p50), 3),
+		"p25": round(float(p25), 3),
+		"p75": round(float(p75), 3),
+		"p90": round(float(p90), 3),
+		"max": round(float(values.max()), 3),
+		"histograma": dict(zip(GAP_LABELS, histogram.tolist())),
+	}
+
+
+def gap_distribution(df: pd.DataFrame) -> Dict[str, Any]:
+	"""
+	Distribución de las horas entre posts consecutivos de un mismo actor en una misma red.
+	Los intervalos se calculan por (red, actor), así no se mezclan las cadencias del cliente
+	y de los competidores, y luego se agregan global, por red y por actor.
+	"""
+	keys = [col for col in KEY_COLUMNS if col in df.columns]
+	dated = df[df["_ts"].notna()].dropna(subset=keys).sort_values("_ts", kind="stable")
+	if keys:
+		gaps = dated.groupby(keys, observed=True, sort=False)["_ts"].diff()
+	else:
+		gaps = dated["_ts"].diff()
+	hours = gaps.dt.total_seconds() / 3600
+	valid = hours.notna()
+	hours, dated = hours[valid], dated[valid]
+	result = {"unidad": "horas", "global": _gap_summary(hours)}
+	for col, name in (("social_network", "por_red"), ("ownerUsername", "por_actor")):
+		if col in dated.columns:
+			result[name] = {key: _gap_summary(group) for key, group in hours.groupby(dated[col], observed=True)}
+	return result
+
 
 class Q13Frecuencia(BaseAnalyzer):
-	"""Análisis Q13: Frecuencia de Publicación."""
+	"""
+	Análisis Q13: Frecuencia de Publicación.
+
+	Los posts se cuentan una sola vez por (red, actor, día); la frecuencia global, por red y
+	por actor (y por semana / mes) sale de esa tabla dispersa, con operaciones sobre arrays.
+	"""
 
 	def __init__(self, openai_client: Any, config: Dict[str, Any]):
 		super().__init__(openai_client, config)
 
 	async def analyze(self) -> Dict[str, Any]:
-		ingested = self.load_ingested_data()
-		posts = ingested.get("posts", [])
-		df = pd.DataFrame(posts)
+		# _ts: timestamp ya interpretado en las features compartidas de la corrida
+		df = self.dataset.post_features(columns=["social_network", "ownerUsername", "_ts"])
 
 		if df.empty:
 			return {"posts_por_dia_promedio_global": None, "frecuencia_por_red": [], "consistencia_desviacion": None, "benchmark_comparativo": {}}
 
-		# Normalizar timestamp
-		if "timestamp" in df.columns:
-			df["_ts"] = pd.to_datetime(df["timestamp"], errors="coerce")
-		else:
-			df["_ts"] = pd.NaT
+		frequency_cfg = self.config.get("frequency_analysis") or {}
+		granularities = [g for g in frequency_cfg.get("granularities", DEFAULT_GRANULARITIES) if g in GRANULARITIES]
+
+		# Una sola pasada sobre los posts: posts por (red, actor, día), sólo días con posts;
+		# semanas y meses se derivan de esa tabla
+		daily = None
+		try:
+			daily = daily_counts(df)
+		except Exception:
+			pass
+
+		by_granularity = {}
+		for granularity in ["D"] + [g for g in granularities if g != "D"]:
+			try:
+				by_granularity[granularity] = frequency_tables(daily, granularity)
+			except Exception:
+				by_granularity[granularity] = None
+
+		day_tables = by_granularity["D"]
 
 		# Calcular posts por día por red
 		freq_list = []
-		try:
-			for sn, group in df.groupby("social_network"):
-				# contar posts por dia
-				series = group.set_index("_ts").resample("D").size()
-				mean_per_day = float(series.mean()) if not series.empty else 0.0
-				std_per_day = float(series.std()) if not series.empty else 0.0
+		if day_tables is not None:
+			for sn in present_keys(df, "social_network"):
+				mean_per_day, std_per_day = day_tables["social_network"].get(sn, (0.0, 0.0))
 				freq_list.append({"social_network": sn, "posts_per_day": mean_per_day, "std_per_day": std_per_day})
-		except Exception:
-			freq_list = []
 
 		# Posts por día promedio global
-		try:
-			all_series = df.set_index("_ts").resample("D").size()
-			posts_por_dia_prom = float(all_series.mean()) if not all_series.empty else 0.0
-			consistencia = float(all_series.std()) if not all_series.empty else 0.0
-		except Exception:
+		if day_tables is not None:
+			posts_por_dia_prom, consistencia = day_tables["global"]
+		else:
 			posts_por_dia_prom = None
 			consistencia = None
 
@@ -66,14 +228,9 @@ class Q13Frecuencia(BaseAnalyzer):
 
 		# Añadir actors: calcular frecuencia por actor (ownerUsername)
 		actors = []
-		try:
-			if "ownerUsername" in df.columns:
-				for owner, group in df.groupby("ownerUsername"):
-					series = group.set_index("_ts").resample("D").size()
-					mean_per_day = float(series.mean()) if not series.empty else 0.0
-					actors.append({"actor": owner, "posts_per_day": mean_per_day})
-		except Exception:
-			actors = []
+		if day_tables is not None and "ownerUsername" in df.columns:
+			for owner in present_keys(df, "ownerUsername"):
+				actors.append({"actor": owner, "posts_per_day": day_tables["ownerUsername"].get(owner, (0.0, 0.0))[0]})
 
 		result = {
 			"posts_por_dia_promedio_global": posts_por_dia_prom,
@@ -83,5 +240,28 @@ class Q13Frecuencia(BaseAnalyzer):
 			"actors": actors
 		}
 
+		# Granularidades adicionales (semana / mes) y distribución de intervalos entre posts
+		extra = {}
+		for granularity in granularities:
+			tables = by_granularity.get(granularity)
+			if granularity == "D" or tables is None:
+				continue
+			mean, std = tables["global"]
+			extra[GRANULARITIES[granularity]] = {
+				"posts_por_periodo_promedio_global": mean,
+				"consistencia_desviacion": std,
+				"frecuencia_por_red": [{"social_network": sn, "posts_per_period": m, "std_per_period": sd}
+				                       for sn, (m, sd) in tables["social_network"].items()],
+				"actors": [{"actor": owner, "posts_per_period": m} for owner, (m, _) in tables["ownerUsername"].items()],
+			}
+		if extra:
+			result["por_granularidad"] = extra
+
+		if frequency_cfg.get("gap_distribution", True):
+			try:
+				result["distribucion_intervalos"] = gap_distribution(df)
+			except Exception:
+				pass
+
 		return result
 
@@ -1,11 +1,12 @@
-from typing import Any, Dict, List
+from typing import Any, Dict
 import os
 import json
-import re
 
+import numpy as np
 import pandas as pd
 
 from .base_analyzer import BaseAnalyzer
+from .hashtags import hashtag_index
 
 
 class Q15Hashtags(BaseAnalyzer):
@@ -15,48 +16,28 @@ class Q15Hashtags(BaseAnalyzer):
 		super().__init__(openai_client, config)
 
 	async def analyze(self) -> Dict[str, Any]:
-		ingested = self.load_ingested_data()
-		posts = ingested.get("posts", [])
-		df = pd.DataFrame(posts)
+		# ER normalizado por post (interactions / views) de las features compartidas de la corrida
+		df = self.dataset.post_features(columns=["er_views"])
 
 		if df.empty:
 			return {"ranking_hashtags_eficientes": []}
 
-		# preparar campos
-		for col in ["likesCount", "commentsCount", "viewsCount"]:
-			if col in df.columns:
-				df[col] = pd.to_numeric(df[col], errors="coerce")
-			else:
-				df[col] = pd.NA
+		# Índice invertido hashtag -> filas de posts (outputs/indexes/hashtags.json); sólo se
+		# recorren los captions si la ingesta cambió desde que se construyó
+		index = hashtag_index(self.dataset, self.outputs_dir)
 
-		df["interactions"] = df["likesCount"].fillna(0) + df["commentsCount"].fillna(0)
-
-		# extraer hashtags
-		def extract_hashtags(text: str) -> List[str]:
-			if not text:
-				return []
-			return re.findall(r"#\w+", text)
-
-		df["hashtags"] = df.get("caption", "").apply(extract_hashtags)
-		df_expl = df.explode("hashtags")
-		df_expl = df_expl.dropna(subset=["hashtags"])
-
-		if df_expl.empty:
+		if not index:
 			return {"ranking_hashtags_eficientes": []}
 
-		# calcular er normalizado por hashtag (interactions / views)
-		def safe_div(i, v):
-			try:
-				if v and float(v) > 0:
-					return float(i) / float(v)
-			except Exception:
-				return None
-			return None
-
-		df_expl["er_normalizado"] = df_expl.apply(lambda r: safe_div(r.get("interactions", 0), r.get("viewsCount")), axis=1)
-
-		# agrupar por hashtag
-		grouped = df_expl.groupby("hashtags").agg(count_posts=("hashtags", "size"), er_mean=("er_normalizado", lambda s: float(s.dropna().mean()) if not s.dropna().empty else None)).reset_index()
+		# tabla larga (hashtag, er del post) y agregación por hashtag
+		tags = np.array(list(index.keys()), dtype=object)
+		rows = [index[tag] for tag in tags]
+		er_views = df["er_views"].to_numpy(dtype=float)
+		df_expl = pd.DataFrame({
+			"hashtags": np.repeat(tags, [len(r) for r in rows]),
+			"er_normalizado": er_views[np.concatenate(rows).astype(np.int64)],
+		})
+		grouped = df_expl.groupby("hashtags").agg(count_posts=("hashtags", "size"), er_mean=("er_normalizado", "mean")).reset_index()
 
 		# aplicar umbral minimo de uso
 		MIN_USE = 5
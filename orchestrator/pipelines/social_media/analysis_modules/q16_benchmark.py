@@ -1,10 +1,11 @@
 import os
-import json
 import numpy as np
 import pandas as pd
 import datetime
 from typing import Dict, Any
+from .actors import aggregate_by_actor, competitor_handle_map, landscape_followers
 from .base_analyzer import BaseAnalyzer
+from .post_features import network_followers
 
 
 def run_q16_benchmark(mock_data: Dict[str, Any]) -> Dict[str, Any]:
@@ -62,85 +63,37 @@ class Q16Benchmark(BaseAnalyzer):
         }
 
         try:
-            data = self.load_ingested_data()
-            posts = data.get("posts", [])
-            client_info = data.get("client_ficha", {})
-
-            # Compute per-post engagement rate using followers from client_ficha according to social_network
-            network_followers_map = {
-                "Instagram": client_info.get("seguidores_instagram"),
-                "TikTok": client_info.get("seguidores_tiktok"),
-                "Otra": client_info.get("seguidores_otra_red_x")
-            }
-
-            client_posts = [p for p in posts if not p.get("is_competitor")]
-            competitor_posts = [p for p in posts if p.get("is_competitor")]
+            client_info = self.dataset.client_ficha
+            # Features compartidas de la corrida: er_followers usa los seguidores del cliente en la red
+            # del post (client_ficha) y er_views = (likes + comments) / viewsCount
+            features = self.dataset.post_features(columns=["ownerUsername", "is_competitor", "er_followers", "er_views"])
 
-            client_ers = []
-            for p in client_posts:
-                followers = network_followers_map.get(p.get("social_network"))
-                likes = p.get("likesCount", 0) or 0
-                comments = p.get("commentsCount", 0) or 0
-                if followers and followers > 0:
-                    er = (likes + comments) / float(followers)
-                    client_ers.append(er)
+            client_ers = features.loc[~features["is_competitor"], "er_followers"].dropna().tolist()
 
             client_er_mean = float(np.mean(client_ers)) if client_ers else None
 
             # For competitors we don't have followers in ingested data; approximate competitor ERs
             # by using (likes+comments)/viewsCount as a proxy per competitor post, then aggregate per competitor.
-            comp_ers_per_account = {}
-            for p in competitor_posts:
-                account = p.get("ownerUsername")
-                likes = p.get("likesCount", 0) or 0
-                comments = p.get("commentsCount", 0) or 0
-                views = p.get("viewsCount") or 0
-                if views and views > 0:
-                    er_proxy = (likes + comments) / float(views)
-                    comp_ers_per_account.setdefault(account, []).append(er_proxy)
-
-            comp_ers = [float(np.mean(v)) for v in comp_ers_per_account.values() if v]
-            comp_ers_list = [float(np.mean(v)) for v in comp_ers_per_account.values() if v]
+            comp_posts = features.loc[features["is_competitor"], ["ownerUsername", "er_views"]].dropna(subset=["er_views"])
+            comp_by_account = aggregate_by_actor(comp_posts, er_column="er_views")
 
             # Build richer competitor info (name, username, er_mean, followers if available)
+            # from the competitor_landscape entry of each instagram handle
+            handle_map = competitor_handle_map(client_info)
             competitor_info = []
-            # Attempt to read competitor landscape from client_info; it might be a JSON string or a list
-            raw_comp_landscape = client_info.get('competitor_landscape')
-            comp_landscape = []
-            try:
-                if isinstance(raw_comp_landscape, str):
-                    comp_landscape = json.loads(raw_comp_landscape)
-                elif isinstance(raw_comp_landscape, list):
-                    comp_landscape = raw_comp_landscape
-            except Exception:
-                comp_landscape = []
-
-            # Create a map from instagram handle -> landscape entry
-            handle_map = {}
-            for entry in comp_landscape:
-                # entry instagram may be a URL like https://www.instagram.com/handle/
-                insta = entry.get('instagram') or ''
-                handle = insta.rstrip('/').split('/')[-1] if insta else entry.get('instagram_username') or entry.get('name')
-                handle_map[handle] = entry
-
-            for account, ers in comp_ers_per_account.items():
-                er_mean = float(np.mean(ers)) if ers else None
+            for account, er_mean in comp_by_account["er_mean"].items():
                 entry = handle_map.get(account, {})
-                followers = None
-                # try common keys
-                if isinstance(entry, dict):
-                    followers = entry.get('instagram_followers') or entry.get('seguidores_instagram')
                 competitor_info.append({
-                    'name': entry.get('name') if isinstance(entry, dict) else account,
+                    'name': entry.get('name'),
                     'username': account,
-                    'er': er_mean,
-                    'followers': followers
+                    'er': float(er_mean),
+                    'followers': landscape_followers(entry)
                 })
 
             mock_input = {
                 "client_er": client_er_mean,
                 "competitor_ers": [c['er'] for c in competitor_info if c.get('er') is not None],
-                "client_followers": sum([v for v in network_followers_map.values() if v]) if network_followers_map else None,
+                "client_followers": sum(network_followers(client_info).values()),
                 "competitor_followers": [c.get('followers') for c in competitor_info if c.get('followers') is not None]
             }
 
@@ -1,15 +1,18 @@
 
 import datetime
-from typing import Dict, Any, List
-import numpy as np
-import pandas as pd
+import logging
+from typing import Dict, Any
+from .anomalies import METRICS, detector_from_config
 from .base_analyzer import BaseAnalyzer
+from .engagement import er_followers_first
 
 
 class Q18Anomalias(BaseAnalyzer):
-    """Q18: Detección de anomalías simples en series de vistas/engagement.
+    """Q18: Detección de anomalías en las series de vistas/engagement.
 
-    Método: detecta posts con `viewsCount` fuera de mean +/- 3*std y reporta.
+    Método: por red social y tipo de contenido, cada post se compara con los posts anteriores
+    de su serie (mediana y MAD móviles, opcionalmente sólo del mismo día de la semana) en
+    views, likes, comments y ER. Ver anomalies.py; parámetros en config["anomaly_detection"].
     """
 
     def __init__(self, openai_client, config: Dict[str, Any]):
@@ -19,38 +22,40 @@ class Q18Anomalias(BaseAnalyzer):
         result = {"metadata": {"analysis": "Q18 Anomalias", "timestamp": datetime.datetime.utcnow().isoformat() + "Z"},
                   "anomalies": [], "errors": []}
         try:
-            data = self.load_ingested_data()
-            posts = [p for p in data.get("posts", []) if not p.get("is_competitor")]
+            # Sólo posts del cliente, con métricas ya numéricas (features compartidas de la corrida)
+            df = self.dataset.post_features(columns=["post_id", "post_url", "_ts", "social_network", "content_type", "viewsCount",
+                                                     "likesCount", "commentsCount", "interactions", "followers",
+                                                     "is_competitor"])
+            df = df[~df["is_competitor"]].reset_index(drop=True)
 
-            if not posts:
+            if len(df) == 0:
                 return result
 
-            df = pd.DataFrame(posts)
-            if "viewsCount" not in df.columns:
+            if df["viewsCount"].isna().all():
                 result["errors"].append("viewsCount no disponible en posts")
-                return result
-
-            df["viewsCount"] = pd.to_numeric(df["viewsCount"], errors="coerce").fillna(0)
-            mu = df["viewsCount"].mean()
-            sigma = df["viewsCount"].std()
-
-            if pd.isna(sigma) or sigma == 0:
-                return result
-
-            upper = mu + 3 * sigma
-            lower = max(0, mu - 3 * sigma)
-
-            anomalous = df[(df["viewsCount"] > upper) | (df["viewsCount"] < lower)]
-
-            for _, row in anomalous.iterrows():
-                result["anomalies"].append({
-                    "post_id": row.get("post_id"),
-                    "viewsCount": int(row.get("viewsCount", 0)),
-                    "reason": "high" if row.get("viewsCount") > upper else "low",
-                    "z_score": float((row.get("viewsCount") - mu) / sigma)
-                })
 
-            result["summary"] = {"mean_views": float(mu), "std_views": float(sigma), "upper_threshold": float(upper), "lower_threshold": float(lower)}
+            # ER por post: sobre seguidores de la red si los hay, si no sobre views (como Q11)
+            df["er"] = er_followers_first(df["interactions"], df["followers"], df["viewsCount"])
+
+            detector = detector_from_config(self.outputs_dir, self.config, incremental=self.incremental_enabled)
+            scored = detector.score(df)
+            if not self.config.get("dry_run"):
+                try:
+                    detector.save()
+                except OSError as e:
+                    logging.warning(f"Q18Anomalias: no se pudo guardar el estado de anomalías: {e}")
+
+            anomalies = scored["anomalies"]
+            result["anomalies"] = anomalies
+            result["summary"] = {
+                "method": "rolling_median_mad",
+                "count": scored["posts"],
+                "posts_evaluados": scored["scored"],
+                "posts_sin_timestamp": scored["sin_timestamp"],
+                "incremental": detector.resumed,
+                "anomalies_by_metric": {metric: sum(1 for a in anomalies if a["metric"] == metric) for metric in METRICS},
+                **detector.params,
+            }
 
         except FileNotFoundError as fe:
             result["errors"].append(str(fe))
@@ -1,15 +1,33 @@
 
 import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
+import numpy as np
 import pandas as pd
 from .base_analyzer import BaseAnalyzer
+from .streaming_stats import CoMoments, best_lag, cross_correlation
+
+METRICS = ["viewsCount", "likesCount", "commentsCount"]
+# Filas por bloque al acumular: acota las copias temporales (bloque x métricas)
+CHUNK_ROWS = 100000
+# Ventanas recientes (días hasta el último post) para la correlación por ventana
+WINDOWS_DAYS = (30, 90)
+# Correlación cruzada entre series diarias: desfase máximo y días mínimos de historia
+MAX_LAG_DAYS = 14
+MIN_DAYS_LAGGED = 21
+
+
+def _matrix(corr: np.ndarray, metrics: List[str]) -> Dict[str, Dict[str, float]]:
+    return pd.DataFrame(corr, index=metrics, columns=metrics).round(4).to_dict()
 
 
 class Q19Correlacion(BaseAnalyzer):
     """Q19: Correlaciones entre métricas clave (views, likes, comments).
 
     Devuelve la matriz de correlación (pearson) entre las métricas y una lista de
-    los pares con mayor correlación absoluta.
+    los pares con mayor correlación absoluta, además de Spearman, la matriz por red y
+    por ventana reciente y la correlación cruzada con desfase entre las series diarias.
+    Las correlaciones salen de acumuladores de co-momentos por red y día (ver
+    streaming_stats.py), que se combinan sin volver a recorrer los posts.
     """
 
     def __init__(self, openai_client, config: Dict[str, Any]):
@@ -20,39 +38,124 @@ class Q19Correlacion(BaseAnalyzer):
                   "correlation_matrix": {}, "top_pairs": [], "errors": []}
 
         try:
-            data = self.load_ingested_data()
-            posts = [p for p in data.get("posts", []) if not p.get("is_competitor")]
-            if not posts:
+            # Sólo posts del cliente, con métricas ya numéricas (features compartidas de la corrida)
+            df = self.dataset.post_features(columns=METRICS + ["social_network", "_ts", "is_competitor"])
+            df = df[~df["is_competitor"]].reset_index(drop=True)
+            if len(df) == 0:
                 return result
 
-            df = pd.DataFrame(posts)
-            for col in ["viewsCount", "likesCount", "commentsCount"]:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-
-            metrics = [c for c in ["viewsCount", "likesCount", "commentsCount"] if c in df.columns]
+            # Una métrica sin ningún valor en los posts no se correlaciona
+            metrics = [c for c in METRICS if df[c].notna().any()]
+            for col in metrics:
+                df[col] = df[col].fillna(0)
             if not metrics:
                 result["errors"].append("No hay métricas numéricas para correlacionar")
                 return result
 
-            corr = df[metrics].corr(method="pearson")
-            result["correlation_matrix"] = corr.round(4).to_dict()
+            k = len(metrics)
+            daily = self._daily_accumulators(df, metrics)
+
+            total = CoMoments.combine(daily.values(), k)
+            corr = total.correlation()
+            result["correlation_matrix"] = _matrix(corr, metrics)
 
             # Flatten to pairs and sort by absolute correlation
             pairs = []
             for i in range(len(metrics)):
                 for j in range(i + 1, len(metrics)):
-                    a = metrics[i]
-                    b = metrics[j]
-                    val = corr.loc[a, b]
-                    pairs.append({"pair": f"{a}__{b}", "corr": float(val)})
+                    pairs.append({"pair": f"{metrics[i]}__{metrics[j]}", "corr": float(corr[i, j])})
 
             pairs = sorted(pairs, key=lambda x: abs(x["corr"]), reverse=True)
             result["top_pairs"] = pairs
 
+            # Spearman: Pearson sobre los rangos (promedio en empates), acumulado por bloques
+            ranks = CoMoments(k)
+            ranked = df[metrics].rank(method="average").to_numpy(dtype=float)
+            for start in range(0, len(ranked), CHUNK_ROWS):
+                ranks.update(ranked[start:start + CHUNK_ROWS])
+            result["correlation_matrix_spearman"] = _matrix(ranks.correlation(), metrics)
+
+            # Por red: combinación de los acumuladores diarios de cada red
+            by_network: Dict[str, CoMoments] = {}
+            for (network, _), acc in daily.items():
+                by_network.setdefault(network, CoMoments(k)).merge(acc)
+            result["por_red"] = {
+                network or "sin_red": {"posts": acc.n, "correlation_matrix": _matrix(acc.correlation(), metrics)}
+                for network, acc in sorted(by_network.items()) if acc.n > 1
+            }
+
+            # Ventanas recientes y series diarias (sólo posts con timestamp)
+            dated = [day for (_, day) in daily if day is not None]
+            if dated:
+                last_day = max(dated)
+                windows = {}
+                for days in WINDOWS_DAYS:
+                    since = last_day - np.timedelta64(days - 1, "D")
+                    acc = CoMoments.combine((a for (_, day), a in daily.items() if day is not None and day >= since), k)
+                    windows[f"ultimos_{days}_dias"] = {"posts": acc.n, "correlation_matrix": _matrix(acc.correlation(), metrics)}
+                result["ventanas"] = windows
+                result["lagged_correlation"] = self._lagged(daily, metrics)
+
         except FileNotFoundError as fe:
             result["errors"].append(str(fe))
         except Exception as e:
             result["errors"].append(f"Unexpected error: {e}")
 
         return result
+
+    @staticmethod
+    def _daily_accumulators(df: pd.DataFrame, metrics: List[str]) -> Dict[Tuple[str, Any], CoMoments]:
+        """Un acumulador por (red, día), llenado bloque a bloque; los posts sin timestamp quedan con día None."""
+        k = len(metrics)
+        networks = df["social_network"].astype(object).fillna("").astype(str) if "social_network" in df.columns \
+            else pd.Series("", index=df.index)
+        days = pd.to_datetime(df["_ts"], errors="coerce")
+        if getattr(days.dt, "tz", None) is not None:
+            days = days.dt.tz_convert(None)
+        days = days.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+        daily: Dict[Tuple[str, Any], CoMoments] = {}
+        for start in range(0, len(df), CHUNK_ROWS):
+            stop = start + CHUNK_ROWS
+            values = df[metrics].iloc[start:stop].to_numpy(dtype=float)
+            keys = pd.DataFrame({"network": networks.iloc[start:stop].to_numpy(), "day": days[start:stop]})
+            for (network, day), idx in keys.groupby(["network", "day"], sort=False, dropna=False).indices.items():
+                key = (network, None if pd.isna(day) else np.datetime64(day, "D"))
+                daily.setdefault(key, CoMoments(k)).update(values[idx])
+        return daily
+
+    @staticmethod
+    def _lagged(daily: Dict[Tuple[str, Any], CoMoments], metrics: List[str]) -> List[Dict[str, Any]]:
+        """
+        Correlación cruzada entre las series diarias (suma por día de cada métrica y posts por
+        día, con 0 en los días sin posts) para desfases de hasta MAX_LAG_DAYS días.
+        """
+        totals: Dict[Any, np.ndarray] = {}
+        for (_, day), acc in daily.items():
+            if day is None:
+                continue
+            row = np.append(acc.sums, acc.n)
+            totals[day] = totals[day] + row if day in totals else row
+        if not totals:
+            return []
+        first, last = min(totals), max(totals)
+        n_days = int((last - first) / np.timedelta64(1, "D")) + 1
+        if n_days < MIN_DAYS_LAGGED:
+            return []
+        series = np.zeros((n_days, len(metrics) + 1))
+        for day, row in totals.items():
+            series[int((day - first) / np.timedelta64(1, "D"))] = row
+        names = metrics + ["posts"]
+
+        lagged = []
+        for i in range(len(names)):
+            for j in range(i + 1, len(names)):
+                cc = cross_correlation(series[:, i], series[:, j], MAX_LAG_DAYS)
+                lag = best_lag(cc)
+                zero = (len(cc) - 1) // 2
+                lagged.append({
+                    "pair": f"{names[i]}__{names[j]}",
+                    "lag_dias": lag,
+                    "corr": None if lag is None else round(float(cc[zero + lag]), 4),
+                    "corr_lag0": None if np.isnan(cc[zero]) else round(float(cc[zero]), 4),
+                })
+        return sorted(lagged, key=lambda x: abs(x["corr"] or 0), reverse=True)
@@ -1,9 +1,21 @@
 import pandas as pd
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import json
 from .base_analyzer import BaseAnalyzer
+from .tokens import weighted_mean_dicts
+
+def combine_emotions(partials: List[Tuple[Dict[str, Any], int]]) -> Dict[str, Any]:
+    """Combina el análisis de varios fragmentos de comentarios: promedio ponderado por número de comentarios."""
+    return {
+        "emociones": weighted_mean_dicts([(result.get("emociones"), n) for result, n in partials]),
+        "resumen_emocional": " ".join(
+            result["resumen_emocional"] for result, _ in partials if result.get("resumen_emocional")
+        ),
+    }
 
 class Q1Emociones(BaseAnalyzer):
+    PROMPT_VERSION = 1
+
     def __init__(self, openai_client: Any, config: Dict[str, Any]):
         super().__init__(openai_client, config)
 
@@ -23,29 +35,28 @@ class Q1Emociones(BaseAnalyzer):
                 "resumen_global_emociones": {}
             }
 
-        comments_df = pd.DataFrame(comments)
-        
-        analisis_por_publicacion = []
-        all_emotions_data = []
-
+        # Consolidar el texto de comentarios por publicación (sin llamadas al LLM)
+        post_texts = []
         for post in posts:
             post_url = post.get("post_url")
             if not post_url:
                 continue
 
-            # Filtrar comentarios para la publicación actual
-            post_comments_df = comments_df[comments_df['post_url'] == post_url]
-            
-            if post_comments_df.empty:
+            # Filtrar comentarios para la publicación actual (índice post_url -> comentarios del dataset)
+            if not self.dataset.comments_for(post_url):
                 continue
             
             # Concatenar el texto de todos los comentarios para esta publicación
             # Se asume que la columna con el texto del comentario se llama 'comment_text'
-            comments_text = " ".join(post_comments_df['comment_text'].dropna().astype(str))
+            comment_texts = self.dataset.comment_texts_for(post_url)
+            comments_text = " ".join(comment_texts)
 
             if not comments_text.strip():
                 continue
 
+            post_texts.append((post_url, comments_text, comment_texts))
+
+        async def request_emotions(comments_text: str) -> Dict[str, Any]:
             prompt = f"""Analiza el siguiente texto, que es una compilación de comentarios de una publicación en redes sociales. Devuelve un objeto JSON con las 8 emociones principales (alegria, tristeza, miedo, ira, sorpresa, disgusto, anticipacion, confianza) y sus puntuaciones (entre 0 y 1). También incluye un resumen emocional de los comentarios.
 
             Texto: "{comments_text}"
@@ -65,32 +76,53 @@ class Q1Emociones(BaseAnalyzer):
                 "resumen_emocional": "string"
             }}
             """
+            response = await self.openai_client.chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": "Eres un asistente experto en análisis de emociones de audiencias."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_object"}
+            )
+            return json.loads(response.choices[0].message.content)
+
+        async def analyze_post(item):
+            post_url, _, comment_texts = item
             try:
-                response = await self.openai_client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": "Eres un asistente experto en análisis de emociones de audiencias."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    response_format={"type": "json_object"}
-                )
+                if self.annotation_store is not None:
+                    # Modo fusionado: las emociones salen de la anotación compartida del post
+                    analysis_result = await self.annotation_store.annotate(post_url, self.openai_client)
+                else:
+                    # Si los comentarios exceden el presupuesto de tokens se analizan por fragmentos
+                    analysis_result = await self.map_reduce(comment_texts, request_emotions, combine_emotions)
                 
-                analysis_result = json.loads(response.choices[0].message.content)
-                
-                analisis_por_publicacion.append({
+                entry = {
                     "post_url": post_url,
                     "emociones": analysis_result["emociones"],
                     "resumen_emocional": analysis_result["resumen_emocional"]
-                })
-                all_emotions_data.append(analysis_result["emociones"])
+                }
+                return entry, analysis_result["emociones"]
 
             except Exception as e:
                 print(f"Error al analizar emociones para la URL {post_url}: {e}")
-                analisis_por_publicacion.append({
+                return {
                     "post_url": post_url,
                     "emociones": {},
                     "resumen_emocional": f"Análisis no disponible debido a un error: {e}"
-                })
+                }, None
+
+        # Una llamada por publicación (sólo las que cambiaron desde la corrida anterior),
+        # con concurrencia acotada y orden estable
+        results = await self.fan_out_incremental(
+            "q1_emociones", post_texts,
+            key=lambda item: item[0],
+            content=lambda item: item[1],
+            worker=analyze_post,
+            is_complete=lambda r: r[1] is not None,
+        )
+        results = [r for r in results if r is not None]
+        analisis_por_publicacion = [entry for entry, _ in results]
+        all_emotions_data = [emotions for _, emotions in results if emotions is not None]
 
         # Calculate global summary
         resumen_global_emociones = {}
@@ -2,8 +2,9 @@
 import datetime
 from typing import Dict, Any
 import numpy as np
-import pandas as pd
+from .actors import aggregate_by_actor
 from .base_analyzer import BaseAnalyzer
+from .post_features import network_followers
 
 
 class Q20KpiGlobal(BaseAnalyzer):
@@ -21,33 +22,34 @@ class Q20KpiGlobal(BaseAnalyzer):
                   "kpis": {}, "errors": []}
 
         try:
-            data = self.load_ingested_data()
-            posts = [p for p in data.get("posts", []) if not p.get("is_competitor")]
-            if not posts:
+            # Features compartidas de la corrida: métricas ya numéricas e is_competitor como bool
+            features = self.dataset.post_features(columns=["content_type", "ownerUsername", "viewsCount", "likesCount",
+                                                           "commentsCount", "interactions", "is_competitor"])
+            df = features[~features["is_competitor"]].reset_index(drop=True)
+            if len(df) == 0:
                 result["kpis"] = {}
                 return result
 
-            df = pd.DataFrame(posts)
-            # Ensure numeric
             for col in ["viewsCount", "likesCount", "commentsCount"]:
-                if col in df.columns:
-                    df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
+                df[col] = df[col].fillna(0)
 
             total_posts = len(df)
             total_views = int(df["viewsCount"].sum()) if "viewsCount" in df.columns else 0
             avg_likes = float(df["likesCount"].mean()) if "likesCount" in df.columns else 0.0
             avg_comments = float(df["commentsCount"].mean()) if "commentsCount" in df.columns else 0.0
 
-            # avg engagement rate per post using (likes + comments) / followers (sum of followers across networks)
-            client_info = data.get("client_ficha", {})
-            followers_total = sum([v for v in [client_info.get("seguidores_instagram"), client_info.get("seguidores_tiktok"), client_info.get("seguidores_otra_red_x")] if v])
+            # avg engagement rate per post using (likes + comments) / followers (sum of followers across networks).
+            # A diferencia de er_followers (seguidores de la red del post), aquí el denominador es el total del cliente
+            client_info = self.dataset.client_ficha
+            followers_total = sum(network_followers(client_info).values())
             if followers_total and followers_total > 0:
-                df["er_post"] = (df.get("likesCount", 0) + df.get("commentsCount", 0)) / float(followers_total)
+                df["er_post"] = df["interactions"] / float(followers_total)
                 avg_er = float(df["er_post"].mean())
             else:
                 avg_er = None
 
-            content_type_counts = df["content_type"].value_counts().to_dict() if "content_type" in df.columns else {}
+            # astype(object): con la copia columnar content_type es categórica y value_counts listaría también las ausentes
+            content_type_counts = df["content_type"].astype(object).value_counts().to_dict() if "content_type" in df.columns else {}
 
             result["kpis"] = {
                 "total_posts": total_posts,
@@ -71,17 +73,11 @@ class Q20KpiGlobal(BaseAnalyzer):
             })
 
             # competitors: aggregate from posts marked as is_competitor
-            all_posts = data.get('posts', [])
             try:
-                import pandas as _pd
-                df_all = _pd.DataFrame(all_posts)
-                if 'is_competitor' in df_all.columns:
-                    comp_df = df_all[df_all['is_competitor'] == True]
-                    for owner, group in comp_df.groupby('ownerUsername'):
-                        tp = int(group.shape[0])
-                        views = int(group['viewsCount'].sum()) if 'viewsCount' in group else 0
-                        likes = float(group['likesCount'].mean()) if 'likesCount' in group else 0.0
-                        actors.append({'actor': owner, 'username': owner, 'total_posts': tp, 'total_views': views, 'avg_likes': likes})
+                comp_by_account = aggregate_by_actor(features.loc[features['is_competitor'], ['ownerUsername', 'viewsCount', 'likesCount']])
+                for owner, row in comp_by_account.sort_index().iterrows():
+                    actors.append({'actor': owner, 'username': owner, 'total_posts': int(row['posts']),
+                                   'total_views': int(row['total_views']), 'avg_likes': float(row['avg_likes'])})
             except Exception:
                 pass
 
@@ -1,10 +1,20 @@
 import pandas as pd
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import json
 from .base_analyzer import BaseAnalyzer
+from .tokens import weighted_mean, weighted_mean_dicts
+
+def combine_traits(partials: List[Tuple[Dict[str, Any], int]]) -> Dict[str, Any]:
+    """Combina el análisis de varios fragmentos de comentarios: promedio ponderado por número de comentarios."""
+    return {
+        "rasgos_distribuidos": weighted_mean_dicts([(result.get("rasgos_distribuidos"), n) for result, n in partials]),
+        "intensidad_promedio": weighted_mean([(result.get("intensidad_promedio"), n) for result, n in partials]),
+    }
 
 class Q2Personalidad(BaseAnalyzer):
+    PROMPT_VERSION = 1
+
     def __init__(self, openai_client: Any, config: Dict[str, Any]):
         super().__init__(openai_client, config)
 
@@ -24,31 +34,31 @@ class Q2Personalidad(BaseAnalyzer):
                 "analisis_por_publicacion": []
             }
 
-        comments_df = pd.DataFrame(comments)
-        
         # Contexto del cliente para el prompt
         narrativa = client_info.get("narrativa", "No disponible")
         arquetipo = client_info.get("arquetipo_marca", "No disponible")
         tono_voz = client_info.get("tono_voz", "No disponible")
 
-        analisis_por_publicacion = []
-        all_traits_data = []
-
+        # Consolidar el texto de comentarios por publicación (sin llamadas al LLM)
+        post_texts = []
         for post in posts:
             post_url = post.get("post_url")
             if not post_url:
                 continue
 
-            post_comments_df = comments_df[comments_df['post_url'] == post_url]
-            
-            if post_comments_df.empty:
+            # Índice post_url -> comentarios del dataset (O(1) por publicación)
+            if not self.dataset.comments_for(post_url):
                 continue
             
-            comments_text = " ".join(post_comments_df['comment_text'].dropna().astype(str))
+            comment_texts = self.dataset.comment_texts_for(post_url)
+            comments_text = " ".join(comment_texts)
 
             if not comments_text.strip():
                 continue
 
+            post_texts.append((post_url, comments_text, comment_texts))
+
+        async def request_traits(comments_text: str) -> Dict[str, Any]:
             prompt = f"""
             **Rol:** Eres un Analista de Personalidad de Marca experto en el Modelo de Aaker y en contextualización estratégica.
 
@@ -77,41 +87,50 @@ class Q2Personalidad(BaseAnalyzer):
                     "intensidad_promedio": float
                 }}
             """
+            response = await self.openai_client.chat.completions.create(
+                model="gpt-4o",
+                messages=[
+                    {"role": "system", "content": "Eres un asistente experto en análisis de personalidad de marca de audiencias."},
+                    {"role": "user", "content": prompt}
+                ],
+                response_format={"type": "json_object"}
+            )
+            return json.loads(response.choices[0].message.content)
+
+        async def analyze_post(item):
+            post_url, comments_text, comment_texts = item
             # If openai_client is available, use it; otherwise use a lightweight heuristic
             if getattr(self, 'openai_client', None):
                 try:
-                    response = await self.openai_client.chat.completions.create(
-                        model="gpt-4o",
-                        messages=[
-                            {"role": "system", "content": "Eres un asistente experto en análisis de personalidad de marca de audiencias."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        response_format={"type": "json_object"}
-                    )
-
-                    analysis_result = json.loads(response.choices[0].message.content)
+                    if self.annotation_store is not None:
+                        # Modo fusionado: los rasgos salen de la anotación compartida del post
+                        analysis_result = await self.annotation_store.annotate(post_url, self.openai_client)
+                    else:
+                        # Si los comentarios exceden el presupuesto de tokens se analizan por fragmentos
+                        analysis_result = await self.map_reduce(comment_texts, request_traits, combine_traits)
 
                     # Validar que la suma de la distribución sea cercana a 100
                     total_dist = sum(analysis_result.get("rasgos_distribuidos", {}).values())
+                    traits = None
                     if not (99 <= total_dist <= 101):
                         print(f"Advertencia: La distribución de rasgos para {post_url} no suma 100 (suma: {total_dist}). Se omitirá del análisis agregado.")
                     else:
-                        all_traits_data.append(analysis_result["rasgos_distribuidos"])
+                        traits = analysis_result["rasgos_distribuidos"]
 
-                    analisis_por_publicacion.append({
+                    return {
                         "post_url": post_url,
                         "rasgos_distribuidos": analysis_result.get("rasgos_distribuidos", {}),
                         "intensidad_promedio": analysis_result.get("intensidad_promedio", 0.0)
-                    })
+                    }, traits
 
                 except Exception as e:
                     print(f"Error al analizar personalidad para la URL {post_url}: {e}")
-                    analisis_por_publicacion.append({
+                    return {
                         "post_url": post_url,
                         "rasgos_distribuidos": {},
                         "intensidad_promedio": 0.0,
                         "error": f"Análisis no disponible: {e}"
-                    })
+                    }, None
             else:
                 # Heuristic offline analysis for testing: simple keyword counts per trait
                 def heuristic_analyze(text: str) -> Dict[str, Any]:
@@ -165,21 +184,33 @@ class Q2Personalidad(BaseAnalyzer):
                 try:
                     analysis_result = heuristic_analyze(comments_text)
                     # accumulate only if non-empty distribution
-                    if analysis_result.get('rasgos_distribuidos'):
-                        all_traits_data.append(analysis_result['rasgos_distribuidos'])
-                    analisis_por_publicacion.append({
+                    return {
                         'post_url': post_url,
                         'rasgos_distribuidos': analysis_result.get('rasgos_distribuidos', {}),
                         'intensidad_promedio': analysis_result.get('intensidad_promedio', 0.0)
-                    })
+                    }, (analysis_result['rasgos_distribuidos'] if analysis_result.get('rasgos_distribuidos') else None)
                 except Exception as e:
                     print(f"Heuristic analysis failed for {post_url}: {e}")
-                    analisis_por_publicacion.append({
+                    return {
                         'post_url': post_url,
                         'rasgos_distribuidos': {},
                         'intensidad_promedio': 0.0,
                         'error': f'Heuristic failed: {e}'
-                    })
+                    }, None
+
+        # Una llamada por publicación (sólo las que cambiaron desde la corrida anterior),
+        # con concurrencia acotada y orden estable
+        use_llm = bool(getattr(self, 'openai_client', None))
+        results = await self.fan_out_incremental(
+            "q2_personalidad", post_texts,
+            key=lambda item: item[0],
+            content=lambda item: [item[1], narrativa, arquetipo, tono_voz, use_llm],
+            worker=analyze_post,
+            is_complete=lambda r: "error" not in r[0],
+        )
+        results = [r for r in results if r is not None]
+        analisis_por_publicacion = [entry for entry, _ in results]
+        all_traits_data = [traits for _, traits in results if traits is not None]
 
         # Calcular el análisis agregado global
         analisis_agregado = {}
@@ -1,4 +1,3 @@
-import pandas as pd
 from typing import Dict, Any, List
 import json
 from .base_analyzer import BaseAnalyzer
@@ -14,7 +13,7 @@ class Q3Temas(BaseAnalyzer):
         Carga los datos, agrupa los comentarios por publicación y analiza el texto consolidado.
         """
         logging.info("Q3Temas: Starting real analysis.")
-        ingested_data = self._load_ingested_data()
+        ingested_data = self.load_ingested_data()
         posts = ingested_data.get("posts", [])
         comments = ingested_data.get("comments", [])
 
@@ -25,8 +24,6 @@ class Q3Temas(BaseAnalyzer):
                 "analisis_por_publicacion": []
             }
 
-        comments_df = pd.DataFrame(comments)
-        
         analisis_por_publicacion_results = []
         all_comments_text = []
 
@@ -35,12 +32,11 @@ class Q3Temas(BaseAnalyzer):
             if not post_url:
                 continue
 
-            post_comments_df = comments_df[comments_df['post_url'] == post_url]
-            
-            if post_comments_df.empty:
+            # Índice post_url -> comentarios del dataset (O(1) por publicación)
+            if not self.dataset.comments_for(post_url):
                 continue
             
-            comments_text = " ".join(post_comments_df['comment_text'].dropna().astype(str))
+            comments_text = " ".join(self.dataset.comment_texts_for(post_url))
             all_comments_text.append(comments_text)
 
             if not comments_text.strip():
@@ -1,7 +1,6 @@
 import json
 import pandas as pd
-from typing import List, Dict, Any
-from tenacity import retry, stop_after_attempt, wait_fixed
+from typing import List, Dict, Any, Tuple
 from openai import AsyncOpenAI
 import asyncio
 import os
@@ -9,13 +8,20 @@ import os
 import logging
 
 from .base_analyzer import BaseAnalyzer
+from .tokens import merge_topics
+
+def combine_topics(partials: List[Tuple[Dict[str, Any], int]]) -> Dict[str, Any]:
+    """Merge per-chunk topics, weighting relevance by the number of comments in each chunk."""
+    return {"topicos_principales": merge_topics([(result.get("topicos_principales"), n) for result, n in partials])}
 
 class Q3Topicos(BaseAnalyzer):
+    PROMPT_VERSION = 1
+
     def __init__(self, openai_client: AsyncOpenAI, config: Dict[str, Any]):
         super().__init__(openai_client, config)
         self.output_file = os.path.join(self.outputs_dir, "q3_topicos.json")
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(15))
+    # Transient API errors (429/5xx) are retried by the orchestrator's process-wide rate limiter
     async def _get_topics_from_openai(self, text: str) -> Dict[str, Any]:
         prompt = f"""
         Analiza el siguiente texto de comentarios de redes sociales. Identifica los 3 tópicos principales y el sentimiento general (positivo, negativo, neutral, mixto) asociado a cada tópico.
@@ -47,40 +53,58 @@ class Q3Topicos(BaseAnalyzer):
             print("No ingested data found for Q3.")
             return {}
 
-        all_posts_analysis = []
-        global_topics_summary: Dict[str, float] = {}
-
+        # Consolidate comments per post before calling the LLM
+        post_texts = []
         for post in ingested_data.get("posts", []):
             post_url = post.get("post_url", "unknown_url")
-            comments = [c for c in ingested_data.get("comments", []) if c.get("post_url") == post_url]
+            comments = self.dataset.comments_for(post_url)
             
             if not comments:
                 continue
 
-            consolidated_comments = " ".join([comment.get("comment_text", "") for comment in comments])
+            comment_texts = [comment.get("comment_text", "") for comment in comments]
+            consolidated_comments = " ".join(comment_texts)
             
             if not consolidated_comments.strip():
                 continue
 
+            post_texts.append((post_url, consolidated_comments, comment_texts))
+
+        async def analyze_post(item):
+            post_url, _, comment_texts = item
             try:
-                topics_analysis = await self._get_topics_from_openai(consolidated_comments)
-                
-                post_topics = {
+                if self.annotation_store is not None:
+                    # Fused mode: topics come from the shared per-post annotation
+                    topics_analysis = await self.annotation_store.annotate(post_url, self.openai_client)
+                else:
+                    # Oversized comment sets are analyzed in token-budgeted chunks and merged
+                    topics_analysis = await self.map_reduce(comment_texts, self._get_topics_from_openai, combine_topics)
+                return {
                     "post_url": post_url,
                     "topicos": topics_analysis.get("topicos_principales", [])
                 }
-                all_posts_analysis.append(post_topics)
-
-                # Aggregate for global summary
-                for topic_info in topics_analysis.get("topicos_principales", []):
-                    topic_name = topic_info.get("topico")
-                    relevance = topic_info.get("porcentaje_relevancia", 0.0)
-                    if topic_name:
-                        global_topics_summary[topic_name] = global_topics_summary.get(topic_name, 0.0) + relevance
-
             except Exception as e:
                 print(f"Error analyzing topics for post {post_url}: {e}")
-                continue
+                return None
+
+        # One call per post (only posts whose comments changed since the previous run)
+        # with bounded concurrency; failed posts are skipped
+        all_posts_analysis = await self.fan_out_incremental(
+            "q3_topicos", post_texts,
+            key=lambda item: item[0],
+            content=lambda item: [item[1], self.config.get("openai_model")],
+            worker=analyze_post,
+        )
+        all_posts_analysis = [r for r in all_posts_analysis if r is not None]
+
+        # Aggregate for global summary
+        global_topics_summary: Dict[str, float] = {}
+        for post_topics in all_posts_analysis:
+            for topic_info in post_topics["topicos"]:
+                topic_name = topic_info.get("topico")
+                relevance = topic_info.get("porcentaje_relevancia", 0.0)
+                if topic_name:
+                    global_topics_summary[topic_name] = global_topics_summary.get(topic_name, 0.0) + relevance
         
         # Normalize global topic relevance
         total_relevance = sum(global_topics_summary.values())
@@ -1,6 +1,38 @@
-from typing import Any, Dict
+import json
+from typing import Any, Dict, List, Tuple
 from .base_analyzer import BaseAnalyzer
 
+# Máximo de marcos narrativos en el resultado (igual que lo pedido en el prompt)
+MAX_MARCOS = 5
+MAX_EJEMPLOS_POR_MARCO = 3
+
+def combine_frames(partials: List[Tuple[Dict[str, Any], int]]) -> Dict[str, Any]:
+    """
+    Combina los marcos narrativos de varios fragmentos de captions: los marcos con el mismo
+    nombre se unen (con sus ejemplos) y se conservan los que aparecen en más fragmentos.
+    """
+    frames: Dict[str, Dict[str, Any]] = {}
+    weights: Dict[str, int] = {}
+    for result, n in partials:
+        for frame in result.get("marcos_narrativos", []) or []:
+            name = (frame.get("marco") or "").strip()
+            if not name:
+                continue
+            key = name.casefold()
+            if key not in frames:
+                frames[key] = {"marco": name, "descripcion": frame.get("descripcion", ""), "ejemplos": []}
+                weights[key] = 0
+            weights[key] += n
+            for ejemplo in frame.get("ejemplos", []) or []:
+                if ejemplo not in frames[key]["ejemplos"] and len(frames[key]["ejemplos"]) < MAX_EJEMPLOS_POR_MARCO:
+                    frames[key]["ejemplos"].append(ejemplo)
+
+    top = sorted(frames, key=lambda key: weights[key], reverse=True)[:MAX_MARCOS]
+    return {
+        "marcos_narrativos": [frames[key] for key in top],
+        "resumen_marcos": " ".join(result["resumen_marcos"] for result, _ in partials if result.get("resumen_marcos")),
+    }
+
 class Q4MarcosNarrativos(BaseAnalyzer):
     def __init__(self, openai_client: Any, config: Dict[str, Any]):
         super().__init__(openai_client, config)
@@ -10,8 +42,6 @@ class Q4MarcosNarrativos(BaseAnalyzer):
         Analiza los datos para identificar los marcos narrativos.
         """
         # Cargar datos ingeridos
-        ingested_data = self.load_ingested_data()
-
         ingested_data = self.load_ingested_data()
         posts = ingested_data.get("posts", [])
 
@@ -20,37 +50,37 @@ class Q4MarcosNarrativos(BaseAnalyzer):
             return {"marcos_narrativos": [], "resumen_marcos": "No hay datos para analizar."}
 
         # Consolidar el texto de todas las publicaciones
-        all_posts_text = " ".join([post.get('caption', '') for post in posts if post.get('caption')])
+        captions = [post.get('caption', '') for post in posts if post.get('caption')]
+        all_posts_text = " ".join(captions)
 
         if not all_posts_text.strip():
             print("Advertencia: No se encontró texto en las publicaciones para analizar en el Módulo Q4.")
             return {"marcos_narrativos": [], "resumen_marcos": "No hay texto en las publicaciones para analizar."}
 
-        prompt = f"""
-        Analiza el siguiente conjunto de textos de publicaciones de redes sociales para identificar los marcos narrativos dominantes. Un marco narrativo es la estructura subyacente de la historia que da forma a cómo se presenta la información.
+        async def request_frames(all_posts_text: str) -> Dict[str, Any]:
+            prompt = f"""
+            Analiza el siguiente conjunto de textos de publicaciones de redes sociales para identificar los marcos narrativos dominantes. Un marco narrativo es la estructura subyacente de la historia que da forma a cómo se presenta la información.
 
-        Texto de las publicaciones:
-        "{all_posts_text}"
+            Texto de las publicaciones:
+            "{all_posts_text}"
 
-        Basado en el texto, identifica y describe hasta 5 marcos narrativos clave. Para cada marco, proporciona una descripción y ejemplos extraídos del texto.
+            Basado en el texto, identifica y describe hasta 5 marcos narrativos clave. Para cada marco, proporciona una descripción y ejemplos extraídos del texto.
 
-        Formato de salida JSON:
-        {{
-          "marcos_narrativos": [
+            Formato de salida JSON:
             {{
-              "marco": "Nombre del Marco Narrativo (ej. El Viaje del Héroe, Nosotros vs. Ellos, Innovación Disruptiva)",
-              "descripcion": "Una breve descripción de cómo se utiliza este marco en las publicaciones.",
-              "ejemplos": [
-                "Ejemplo de texto de una publicación que ilustra este marco.",
-                "Otro ejemplo..."
-              ]
+              "marcos_narrativos": [
+                {{
+                  "marco": "Nombre del Marco Narrativo (ej. El Viaje del Héroe, Nosotros vs. Ellos, Innovación Disruptiva)",
+                  "descripcion": "Una breve descripción de cómo se utiliza este marco en las publicaciones.",
+                  "ejemplos": [
+                    "Ejemplo de texto de una publicación que ilustra este marco.",
+                    "Otro ejemplo..."
+                  ]
+                }}
+              ],
+              "resumen_marcos": "Un resumen general de cómo la marca utiliza los marcos narrativos para comunicarse con su audiencia."
             }}
-          ],
-          "resumen_marcos": "Un resumen general de cómo la marca utiliza los marcos narrativos para comunicarse con su audiencia."
-        }}
-        """
-
-        try:
+            """
             response = await self.openai_client.chat.completions.create(
                 model="gpt-4o",
                 messages=[
@@ -59,7 +89,11 @@ class Q4MarcosNarrativos(BaseAnalyzer):
                 ],
                 response_format={"type": "json_object"}
             )
-            analysis_result = json.loads(response.choices[0].message.content)
+            return json.loads(response.choices[0].message.content)
+
+        try:
+            # Cuentas grandes: las captions se analizan por fragmentos y los marcos se combinan
+            analysis_result = await self.map_reduce(captions, request_frames, combine_frames)
             return analysis_result
         except Exception as e:
             print(f"Error al analizar marcos narrativos: {e}")
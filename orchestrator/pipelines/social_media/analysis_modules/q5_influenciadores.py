@@ -1,5 +1,6 @@
 
 import json
+from itertools import islice
 from typing import Any, Dict, List
 import pandas as pd
 from .base_analyzer import BaseAnalyzer
@@ -13,10 +14,10 @@ class Q5Influenciadores(BaseAnalyzer):
         Identifica a los 10 principales influenciadores a partir de los comentarios,
         analiza la polaridad de su discurso y extrae un comentario de evidencia.
         """
-        ingested_data = self.load_ingested_data()
-        comments = ingested_data.get("comments", [])
+        # Sólo hace falta una muestra: se lee en streaming sin materializar todos los comentarios
+        comments_sample = list(islice(self.iter_comments(), 500))
 
-        if not comments:
+        if not comments_sample:
             print("Advertencia: No se encontraron comentarios para analizar en el Módulo Q5.")
             return {
                 "top_influenciadores_detallado": [],
@@ -26,8 +27,7 @@ class Q5Influenciadores(BaseAnalyzer):
 
         # Para evitar un prompt demasiado grande, podemos trabajar con una muestra representativa
         # o con un resumen pre-procesado. Aquí, usaremos una muestra de hasta 500 comentarios.
-        comments_sample = comments[:500]
-        
+
         # Convertir solo los campos necesarios para el prompt a una cadena JSON
         comments_for_prompt = json.dumps([
             {
@@ -107,7 +107,8 @@ class Q5Influenciadores(BaseAnalyzer):
                         "score_centralidad": float(inf.get("score_centralidad", 0.0))
                     })
                 # Filter actors to client-only (system single-client by design)
-                actors = self.filter_to_client_actors(actors, ingested_data)
+                actors = self.filter_to_client_actors(
+                    actors, {"client_ficha": self.dataset.client_ficha, "posts": self.iter_posts()})
                 analysis_result["actors"] = actors
             except Exception:
                 analysis_result["actors"] = []
@@ -1,4 +1,5 @@
 import json
+from itertools import islice
 from typing import Any, Dict, List
 from .base_analyzer import BaseAnalyzer
 
@@ -10,21 +11,17 @@ class Q6Oportunidades(BaseAnalyzer):
         """
         Identifica oportunidades clave a partir de los datos ingeridos.
         """
-        ingested_data = self.load_ingested_data()
-        comments = ingested_data.get("comments", [])
-        posts = ingested_data.get("posts", [])
+        # Usar una muestra de comentarios y posts para el prompt (leída en streaming)
+        comments_sample = list(islice(self.iter_comments(), 200)) # Limit to 200 comments
+        posts_sample = list(islice(self.iter_posts(), 50)) # Limit to 50 posts
 
-        if not comments and not posts:
+        if not comments_sample and not posts_sample:
             print("Advertencia: No se encontraron comentarios ni publicaciones para analizar en el Módulo Q6.")
             return {
                 "oportunidades_identificadas": [],
                 "resumen_ejecutivo": "No hay datos disponibles para identificar oportunidades."
             }
 
-        # Usar una muestra de comentarios y posts para el prompt
-        comments_sample = comments[:200] # Limit to 200 comments
-        posts_sample = posts[:50] # Limit to 50 posts
-
         # Prepare data for prompt
         data_for_prompt = {
             "comments": [
@@ -100,7 +97,8 @@ class Q6Oportunidades(BaseAnalyzer):
                     actors.append({"actor": user, "username": user, "post_count": int(count)})
 
                 # Filter actors to client-only (single-client system)
-                actors = self.filter_to_client_actors(actors, ingested_data)
+                actors = self.filter_to_client_actors(
+                    actors, {"client_ficha": self.dataset.client_ficha, "posts": self.iter_posts()})
                 analysis_result['actors'] = actors
             except Exception:
                 analysis_result['actors'] = []
@@ -3,6 +3,8 @@ from typing import Any, Dict, List
 from .base_analyzer import BaseAnalyzer
 
 class Q7SentimientoDetallado(BaseAnalyzer):
+    PROMPT_VERSION = 1
+
     def __init__(self, openai_client: Any, config: Dict[str, Any]):
         super().__init__(openai_client, config)
 
@@ -38,16 +40,11 @@ class Q7SentimientoDetallado(BaseAnalyzer):
                 "username": comment.get("ownerUsername", "anonymous")
             })
 
-        # Analizar cada publicación
-        results_by_post = []
+        # Analizar cada publicación (una llamada por post, con concurrencia acotada)
         total_comments = len(comments)
-        total_positivos = 0
-        total_negativos = 0
-        total_neutros = 0
-        total_mixtos = 0
-        total_subjetividad = 0
 
-        for post_url, post_comments in comments_by_post.items():
+        async def analyze_post(item):
+            post_url, post_comments = item
             # Preparar datos para el prompt
             comments_text = [
                 f"Comment {i+1}: {comment['text']}"
@@ -90,37 +87,63 @@ class Q7SentimientoDetallado(BaseAnalyzer):
             """
 
             try:
-                response = await self.openai_client.chat.completions.create(
-                    model="gpt-4",
-                    messages=[
-                        {"role": "system", "content": "Eres un experto en análisis de sentimiento y detección de ambivalencia en texto."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    response_format={"type": "json_object"}
-                )
-                
-                post_analysis = response.choices[0].message.content
-                post_results = json.loads(post_analysis)
-                
-                # Actualizar totales globales
-                total_positivos += len(post_comments) * post_results["distribucion"]["positivo"]
-                total_negativos += len(post_comments) * post_results["distribucion"]["negativo"]
-                total_neutros += len(post_comments) * post_results["distribucion"]["neutro"]
-                total_mixtos += len(post_comments) * post_results["distribucion"]["mixto"]
-                total_subjetividad += len(post_comments) * post_results["subjetividad_promedio"]
+                if self.annotation_store is not None:
+                    # Modo fusionado: el sentimiento sale de la anotación compartida del post
+                    annotation = await self.annotation_store.annotate(post_url, self.openai_client)
+                    post_results = annotation["sentimiento"]
+                else:
+                    response = await self.openai_client.chat.completions.create(
+                        model="gpt-4",
+                        messages=[
+                            {"role": "system", "content": "Eres un experto en análisis de sentimiento y detección de ambivalencia en texto."},
+                            {"role": "user", "content": prompt}
+                        ],
+                        response_format={"type": "json_object"}
+                    )
+
+                    post_analysis = response.choices[0].message.content
+                    post_results = json.loads(post_analysis)
+
+                # Validar la respuesta antes de sumarla a los totales globales
+                for category in ("positivo", "negativo", "neutro", "mixto"):
+                    float(post_results["distribucion"][category])
+                float(post_results["subjetividad_promedio"])
 
                 # Guardar resultados de esta publicación
-                results_by_post.append({
+                return {
                     "post_url": post_url,
                     "distribucion": post_results["distribucion"],
                     "subjetividad_promedio": post_results["subjetividad_promedio"],
                     "ejemplo_mixto": post_results["ejemplo_mixto"],
                     "total_comentarios": len(post_comments)
-                })
+                }
 
             except Exception as e:
                 print(f"Error al analizar post {post_url}: {str(e)}")
-                continue
+                return None
+
+        # Sólo se reanalizan las publicaciones cuyos comentarios cambiaron desde la corrida anterior
+        results_by_post = await self.fan_out_incremental(
+            "q7_sentimiento_detallado", comments_by_post.items(),
+            key=lambda item: item[0],
+            content=lambda item: item[1],
+            worker=analyze_post,
+        )
+        results_by_post = [r for r in results_by_post if r is not None]
+
+        # Actualizar totales globales (ponderados por número de comentarios)
+        total_positivos = 0
+        total_negativos = 0
+        total_neutros = 0
+        total_mixtos = 0
+        total_subjetividad = 0
+        for post_result in results_by_post:
+            n_comments = post_result["total_comentarios"]
+            total_positivos += n_comments * post_result["distribucion"]["positivo"]
+            total_negativos += n_comments * post_result["distribucion"]["negativo"]
+            total_neutros += n_comments * post_result["distribucion"]["neutro"]
+            total_mixtos += n_comments * post_result["distribucion"]["mixto"]
+            total_subjetividad += n_comments * post_result["subjetividad_promedio"]
 
         # Calcular promedios globales
         return {
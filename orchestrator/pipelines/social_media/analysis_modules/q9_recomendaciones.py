@@ -1,5 +1,4 @@
 import json
-import os
 from typing import Any, Dict, List
 from datetime import datetime
 
@@ -18,30 +17,8 @@ class Q9Recomendaciones(BaseAnalyzer):
         """
         ingested_data = self.load_ingested_data()
 
-        # Buscar outputs existentes (Q1..Q20) en el directorio de outputs
-        insights: Dict[str, Any] = {}
-        try:
-            files = os.listdir(self.outputs_dir)
-        except Exception:
-            files = []
-
-        for fname in files:
-            if not fname.lower().endswith('.json'):
-                continue
-            # Evitar leer el propio archivo de salida (si ya existe)
-            if fname.lower().startswith('q9_'):
-                continue
-
-            parts = fname.split('_')
-            if len(parts) == 0:
-                continue
-            module_id = parts[0].upper()  # e.g., 'q1'
-            try:
-                with open(os.path.join(self.outputs_dir, fname), 'r', encoding='utf-8') as f:
-                    insights[module_id] = json.load(f)
-            except Exception:
-                # Si no se puede leer, omitir
-                continue
+        # Buscar outputs existentes (Q1..Q20) en el directorio de outputs (sin el propio Q9)
+        insights: Dict[str, Any] = self.load_module_outputs(exclude=["Q9"])
 
         # System is single-client by design; do not include Q16 competitor aggregates in recommendations
         try:
@@ -114,7 +91,8 @@ class Q9Recomendaciones(BaseAnalyzer):
             # Fallback: generar recomendaciones heurísticas a partir de posts ingeridos
             try:
                 posts = ingested_data.get('posts', [])
-                # Calcular engagement por post
+                # Calcular engagement por post (los posts del snapshot son de sólo lectura)
+                posts_engagement = []
                 for p in posts:
                     likes = p.get('likesCount') or 0
                     comments = p.get('commentsCount') or 0
@@ -124,13 +102,13 @@ class Q9Recomendaciones(BaseAnalyzer):
                         views = int(views) if views not in ("", None) else 0
                     except Exception:
                         views = 0
-                    p['__engagement'] = int(likes) + int(comments) + int(views)
+                    posts_engagement.append((int(likes) + int(comments) + int(views), p))
 
-                df_posts = sorted(posts, key=lambda x: x.get('__engagement', 0), reverse=True)
+                df_posts = sorted(posts_engagement, key=lambda x: x[0], reverse=True)
                 top_types = {}
-                for p in df_posts[:200]:
+                for engagement, p in df_posts[:200]:
                     ct = p.get('content_type', 'Desconocido')
-                    top_types.setdefault(ct, []).append(p.get('__engagement', 0))
+                    top_types.setdefault(ct, []).append(engagement)
 
                 avg_by_type = {k: int(sum(v)/len(v)) for k, v in top_types.items()} if top_types else {}
                 # Pick top content types
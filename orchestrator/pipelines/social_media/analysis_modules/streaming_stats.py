@@ -0,0 +1,124 @@
+"""
+Estadísticos combinables para correlaciones sobre muchas filas (Q19).
+
+`CoMoments` acumula n, medias y la matriz de co-momentos (suma de productos de desvíos) de
+k métricas. Se actualiza por bloques de filas y dos acumuladores se combinan sin volver a
+ver los datos (Chan et al.), así un acumulador por red y día se puede sumar por red, por
+ventana de tiempo o en total. De ahí salen covarianzas y correlaciones de Pearson con
+memoria O(k²), sin materializar la tabla completa.
+
+`cross_correlation` calcula la correlación cruzada con desfase entre dos series diarias
+por FFT (O(n log n) para todos los desfases a la vez).
+"""
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+
+class CoMoments:
+    """n, medias y co-momentos de k métricas; combinable con `merge`."""
+
+    def __init__(self, k: int):
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k))
+
+    @property
+    def k(self) -> int:
+        return len(self.mean)
+
+    def update(self, block: np.ndarray) -> 'CoMoments':
+        """Agrega un bloque de filas (n_filas x k, sin NaN)."""
+        block = np.asarray(block, dtype=float)
+        if block.shape[0] == 0:
+            return self
+        mean = block.mean(axis=0)
+        centered = block - mean
+        return self._combine(block.shape[0], mean, centered.T @ centered)
+
+    def merge(self, other: 'CoMoments') -> 'CoMoments':
+        """Suma en el lugar los datos resumidos en `other`."""
+        return self._combine(other.n, other.mean, other.comoment)
+
+    def _combine(self, n: int, mean: np.ndarray, comoment: np.ndarray) -> 'CoMoments':
+        if n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.comoment = n, np.array(mean, dtype=float), np.array(comoment, dtype=float)
+            return self
+        total = self.n + n
+        delta = mean - self.mean
+        self.comoment = self.comoment + comoment + np.outer(delta, delta) * (self.n * n / total)
+        self.mean = self.mean + delta * (n / total)
+        self.n = total
+        return self
+
+    @classmethod
+    def combine(cls, accumulators: Iterable['CoMoments'], k: int) -> 'CoMoments':
+        """Nuevo acumulador con la suma de `accumulators` (no los modifica)."""
+        result = cls(k)
+        for acc in accumulators:
+            result.merge(acc)
+        return result
+
+    @property
+    def sums(self) -> np.ndarray:
+        """Suma de cada métrica."""
+        return self.mean * self.n
+
+    def covariance(self, ddof: int = 1) -> np.ndarray:
+        if self.n - ddof <= 0:
+            return np.full((self.k, self.k), np.nan)
+        return self.comoment / (self.n - ddof)
+
+    def correlation(self) -> np.ndarray:
+        """Matriz de correlación de Pearson (NaN para métricas sin varianza)."""
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoment / np.outer(std, std)
+        corr[~np.isfinite(corr)] = np.nan
+        return corr
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"n": self.n, "mean": self.mean.tolist(), "comoment": self.comoment.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'CoMoments':
+        acc = cls(len(data["mean"]))
+        acc.n = int(data["n"])
+        acc.mean = np.asarray(data["mean"], dtype=float)
+        acc.comoment = np.asarray(data["comoment"], dtype=float)
+        return acc
+
+
+def cross_correlation(a: Sequence[float], b: Sequence[float], max_lag: int) -> np.ndarray:
+    """
+    Correlación cruzada de dos series de igual largo para los desfases -max_lag..max_lag:
+    el valor del desfase l es corr(a[t], b[t + l]), con l > 0 cuando `a` se adelanta a `b`.
+    Se normaliza con las desviaciones de las series completas (estimador sesgado habitual);
+    NaN si alguna serie es constante.
+    """
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    n = len(a)
+    max_lag = max(0, min(int(max_lag), n - 1))
+    if n == 0:
+        return np.full(2 * max_lag + 1, np.nan)
+    denom = n * a.std() * b.std()
+    if not denom > 0:
+        return np.full(2 * max_lag + 1, np.nan)
+    a = a - a.mean()
+    b = b - b.mean()
+    # relleno con ceros hasta >= 2n - 1 para que la correlación circular no se solape
+    size = 1 << int(2 * n - 1).bit_length()
+    cc = np.fft.irfft(np.conj(np.fft.rfft(a, size)) * np.fft.rfft(b, size), size)
+    if max_lag == 0:
+        return cc[:1] / denom
+    return np.concatenate([cc[-max_lag:], cc[:max_lag + 1]]) / denom
+
+
+def best_lag(values: np.ndarray) -> Optional[int]:
+    """Desfase con mayor |correlación| en la salida de `cross_correlation` (None si todo es NaN)."""
+    if np.all(np.isnan(values)):
+        return None
+    return int(np.nanargmax(np.abs(values))) - (len(values) - 1) // 2
@@ -0,0 +1,280 @@
+"""
+Patrones temporales de las publicaciones (Q8), calculados localmente y vectorizados.
+
+Los timestamps se pasan a la zona horaria del cliente (los que no traen zona se toman como
+UTC, igual que la copia columnar) y se agrupan con np.bincount: día de la semana x hora,
+día calendario y ventanas de varias horas. Las funciones devuelven estructuras listas para
+el JSON de Q8; el LLM sólo recibe `compact_summary` para narrarlo.
+"""
+from typing import Any, Dict, List, Mapping, Optional
+import logging
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_TIMEZONE = "UTC"
+WEEKDAYS = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+HOURS_PER_WEEK = 7 * 24
+# Ventanas pico: horas consecutivas y cuántas reportar
+PEAK_WINDOW_HOURS = 3
+TOP_PEAK_WINDOWS = 3
+TOP_MOMENTS = 5
+# Comparación de períodos: últimos N días frente a los N anteriores
+COMPARISON_DAYS = (7, 28, 90)
+
+
+def client_timezone(client_ficha: Mapping[str, Any], config: Mapping[str, Any]) -> str:
+    """Zona horaria IANA del cliente: client_ficha (zona_horaria / timezone), temporal_analysis.timezone o UTC."""
+    for candidate in ((client_ficha or {}).get("zona_horaria"), (client_ficha or {}).get("timezone"),
+                      (config.get("temporal_analysis") or {}).get("timezone")):
+        if not candidate:
+            continue
+        try:
+            pd.Timestamp("2024-01-01", tz=str(candidate))
+            return str(candidate)
+        except Exception:
+            logging.warning(f"Zona horaria desconocida '{candidate}', se ignora.")
+    return DEFAULT_TIMEZONE
+
+
+def local_times(stamps: pd.Series, tz: str) -> pd.Series:
+    """Timestamps en la zona `tz`, sin zona (hora local de pared); NaT se conserva."""
+    stamps = pd.to_datetime(stamps, errors="coerce")
+    if getattr(stamps.dt, "tz", None) is None:
+        stamps = stamps.dt.tz_localize("UTC")
+    return stamps.dt.tz_convert(tz).dt.tz_localize(None)
+
+
+def _mean(total: np.ndarray, count: np.ndarray) -> List[Optional[float]]:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = total / count
+    return [None if not c else round(float(m), 6) for m, c in zip(means, count)]
+
+
+def _pct_change(current: float, previous: float) -> Optional[float]:
+    if previous is None or current is None or not previous:
+        return None
+    return round((current - previous) / previous * 100, 2)
+
+
+def _slope(values: np.ndarray) -> Dict[str, Optional[float]]:
+    """Pendiente (por día) y R² de la recta de mínimos cuadrados sobre una serie diaria."""
+    n = len(values)
+    if n < 3:
+        return {"pendiente_por_dia": None, "r2": None}
+    x = np.arange(n, dtype=float)
+    x_centered = x - x.mean()
+    y_centered = values - values.mean()
+    sxx = float(x_centered @ x_centered)
+    syy = float(y_centered @ y_centered)
+    sxy = float(x_centered @ y_centered)
+    slope = sxy / sxx
+    r2 = sxy * sxy / (sxx * syy) if syy > 0 else None
+    return {"pendiente_por_dia": round(slope, 6), "r2": None if r2 is None else round(r2, 4)}
+
+
+class TemporalProfile:
+    """
+    Acumula por post la hora local, las interacciones y el ER (NaN si no hay) y calcula los
+    agregados de Q8. Los posts sin timestamp se descartan.
+    """
+
+    def __init__(self, posts: pd.DataFrame, tz: str):
+        local = local_times(posts["_ts"], tz)
+        valid = local.notna().to_numpy()
+        self.tz = tz
+        self.local = local[valid].reset_index(drop=True)
+        self.interactions = posts["interactions"].to_numpy(dtype=float)[valid]
+        self.er = posts["er"].to_numpy(dtype=float)[valid]
+        self.n = len(self.local)
+        if self.n:
+            self.weekday = self.local.dt.weekday.to_numpy()
+            self.hour = self.local.dt.hour.to_numpy()
+            days = self.local.dt.normalize().to_numpy(dtype="datetime64[D]")
+            self.first_day = days.min()
+            self.last_day = days.max()
+            self.day_index = (days - self.first_day).astype(np.int64)
+            self.n_days = int(self.day_index.max()) + 1
+
+    def _bins(self, codes: np.ndarray, size: int) -> Dict[str, np.ndarray]:
+        has_er = ~np.isnan(self.er)
+        return {
+            "posts": np.bincount(codes, minlength=size).astype(float),
+            "interacciones": np.bincount(codes, weights=self.interactions, minlength=size),
+            "er_sum": np.bincount(codes[has_er], weights=self.er[has_er], minlength=size),
+            "er_posts": np.bincount(codes[has_er], minlength=size).astype(float),
+        }
+
+    def weekday_hour(self) -> Dict[str, np.ndarray]:
+        bins = self._bins(self.weekday * 24 + self.hour, HOURS_PER_WEEK)
+        return {key: value.reshape(7, 24) for key, value in bins.items()}
+
+    def daily(self) -> Dict[str, np.ndarray]:
+        return self._bins(self.day_index, self.n_days)
+
+    def heatmap(self, cells: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        return {
+            "zona_horaria": self.tz,
+            "dias": WEEKDAYS,
+            "horas": list(range(24)),
+            "posts": cells["posts"].astype(int).tolist(),
+            "interacciones_promedio": [_mean(cells["interacciones"][d], cells["posts"][d]) for d in range(7)],
+            "er_promedio": [_mean(cells["er_sum"][d], cells["er_posts"][d]) for d in range(7)],
+        }
+
+    @staticmethod
+    def weekday_patterns(cells: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        posts = cells["posts"].sum(axis=1)
+        interactions = _mean(cells["interacciones"].sum(axis=1), posts)
+        er = _mean(cells["er_sum"].sum(axis=1), cells["er_posts"].sum(axis=1))
+        return [{"dia": WEEKDAYS[d], "posts": int(posts[d]), "promedio_interacciones": interactions[d],
+                 "er_promedio": er[d]} for d in range(7)]
+
+    @staticmethod
+    def hour_patterns(cells: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        posts = cells["posts"].sum(axis=0)
+        interactions = _mean(cells["interacciones"].sum(axis=0), posts)
+        er = _mean(cells["er_sum"].sum(axis=0), cells["er_posts"].sum(axis=0))
+        return [{"hora": h, "posts": int(posts[h]), "promedio_actividad": interactions[h], "er_promedio": er[h]}
+                for h in range(24)]
+
+    def peak_windows(self, cells: Dict[str, np.ndarray], hours: int = PEAK_WINDOW_HOURS,
+                     top: int = TOP_PEAK_WINDOWS) -> List[Dict[str, Any]]:
+        """
+        Ventanas de `hours` horas consecutivas (la semana es circular: domingo 23h sigue con
+        lunes 0h) con más interacciones promedio por post. Sólo cuentan ventanas con al menos
+        max(3, 1% de los posts) publicaciones, para que un único post viral no sea "pico".
+        """
+        posts = cells["posts"].ravel()
+        interactions = cells["interacciones"].ravel()
+        window_posts = sum(np.roll(posts, -k) for k in range(hours))
+        window_interactions = sum(np.roll(interactions, -k) for k in range(hours))
+        min_posts = max(3, int(np.ceil(self.n * 0.01)))
+        overall = self.interactions.mean() if self.n else 0.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.where(window_posts >= min_posts, window_interactions / window_posts, -np.inf)
+        windows = []
+        taken = np.zeros(HOURS_PER_WEEK, dtype=bool)
+        for start in np.argsort(-means, kind="stable"):
+            if len(windows) >= top or not np.isfinite(means[start]):
+                break
+            span = (start + np.arange(hours)) % HOURS_PER_WEEK
+            if taken[span].any():
+                continue
+            taken[span] = True
+            end = (start + hours) % HOURS_PER_WEEK
+            windows.append({
+                "dia": WEEKDAYS[start // 24],
+                "hora_inicio": int(start % 24),
+                "hora_fin": int(end % 24),
+                "posts": int(window_posts[start]),
+                "promedio_interacciones": round(float(means[start]), 2),
+                "lift_vs_promedio": round(float(means[start] / overall), 3) if overall else None,
+            })
+        return windows
+
+    def daily_trend(self, days: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        dates = (self.first_day + np.arange(self.n_days)).astype(str)
+        return [{"fecha": date, "posts": int(p), "interacciones": int(i)}
+                for date, p, i in zip(dates, days["posts"], days["interacciones"])]
+
+    def trend(self, days: Dict[str, np.ndarray]) -> Dict[str, Any]:
+        """Pendiente de interacciones y posts por día, y la de interacciones relativa a su media (% por semana)."""
+        interactions = _slope(days["interacciones"])
+        mean_daily = float(days["interacciones"].mean())
+        relative = None
+        if interactions["pendiente_por_dia"] is not None and mean_daily:
+            relative = round(interactions["pendiente_por_dia"] * 7 / mean_daily * 100, 2)
+        return {
+            "interacciones_por_dia": interactions,
+            "posts_por_dia": _slope(days["posts"]),
+            "cambio_semanal_relativo_pct": relative,
+        }
+
+    def period_comparison(self, days: Dict[str, np.ndarray]) -> List[Dict[str, Any]]:
+        """Últimos N días frente a los N anteriores (hasta el último día con posts)."""
+        comparisons = []
+        for n in COMPARISON_DAYS:
+            if self.n_days < 2 * n:
+                continue
+            current = slice(self.n_days - n, self.n_days)
+            previous = slice(self.n_days - 2 * n, self.n_days - n)
+            summary = {}
+            for label, window in (("actual", current), ("anterior", previous)):
+                posts = float(days["posts"][window].sum())
+                er_posts = float(days["er_posts"][window].sum())
+                summary[label] = {
+                    "posts": int(posts),
+                    "interacciones": int(days["interacciones"][window].sum()),
+                    "interacciones_por_post": round(float(days["interacciones"][window].sum()) / posts, 2) if posts else None,
+                    "er_promedio": round(float(days["er_sum"][window].sum()) / er_posts, 6) if er_posts else None,
+                }
+            comparisons.append({
+                "periodo_dias": n,
+                **summary,
+                "cambio_pct": {key: _pct_change(summary["actual"][key], summary["anterior"][key])
+                               for key in ("posts", "interacciones", "interacciones_por_post", "er_promedio")},
+            })
+        return comparisons
+
+    def top_moments(self, days: Dict[str, np.ndarray], top: int = TOP_MOMENTS) -> List[Dict[str, Any]]:
+        mean_daily = float(days["interacciones"].mean()) if self.n_days else 0.0
+        moments = []
+        for rank, idx in enumerate(np.argsort(-days["interacciones"], kind="stable")[:top], start=1):
+            if days["posts"][idx] == 0:
+                break
+            interactions = float(days["interacciones"][idx])
+            lift = interactions / mean_daily if mean_daily else None
+            moments.append({
+                "fecha": str(self.first_day + idx),
+                "titulo": f"Pico de interacciones #{rank}",
+                "interacciones": int(interactions),
+                "posts": int(days["posts"][idx]),
+                "descripcion": f"{int(days['posts'][idx])} posts" + (f", {lift:.1f}x el promedio diario" if lift else ""),
+            })
+        return moments
+
+
+def temporal_analysis(posts: pd.DataFrame, tz: str) -> Dict[str, Any]:
+    """
+    Agregados de Q8 para `posts` (_ts, interactions, er). Vacío si ningún post tiene timestamp.
+    """
+    profile = TemporalProfile(posts, tz)
+    if profile.n == 0:
+        return {}
+    cells = profile.weekday_hour()
+    days = profile.daily()
+    return {
+        "zona_horaria": tz,
+        "rango": {"desde": str(profile.first_day), "hasta": str(profile.last_day), "dias": profile.n_days,
+                  "posts": profile.n},
+        "tendencia_general": profile.daily_trend(days),
+        "patrones_dia_semana": profile.weekday_patterns(cells),
+        "horas_pico": profile.hour_patterns(cells),
+        "heatmap_dia_hora": profile.heatmap(cells),
+        "ventanas_pico": profile.peak_windows(cells),
+        "tendencia": profile.trend(days),
+        "comparacion_periodos": profile.period_comparison(days),
+        "momentos_destacados": profile.top_moments(days),
+    }
+
+
+def compact_summary(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Resumen corto de `temporal_analysis` para el prompt (sin series ni heatmap)."""
+    def top(rows: List[Dict[str, Any]], key: str, n: int = 3) -> List[Dict[str, Any]]:
+        return sorted((r for r in rows if r.get(key) is not None), key=lambda r: r[key], reverse=True)[:n]
+
+    return {
+        "zona_horaria": analysis.get("zona_horaria"),
+        "rango": analysis.get("rango"),
+        "mejores_dias": [{k: r[k] for k in ("dia", "posts", "promedio_interacciones")}
+                         for r in top(analysis.get("patrones_dia_semana", []), "promedio_interacciones")],
+        "mejores_horas": [{k: r[k] for k in ("hora", "posts", "promedio_actividad")}
+                          for r in top(analysis.get("horas_pico", []), "promedio_actividad")],
+        "ventanas_pico": analysis.get("ventanas_pico"),
+        "tendencia": analysis.get("tendencia"),
+        "comparacion_periodos": [{"periodo_dias": c["periodo_dias"], "cambio_pct": c["cambio_pct"]}
+                                 for c in analysis.get("comparacion_periodos", [])],
+        "momentos_destacados": [{k: m[k] for k in ("fecha", "interacciones", "posts")}
+                                for m in analysis.get("momentos_destacados", [])[:3]],
+    }
@@ -0,0 +1,159 @@
+from typing import Any, Awaitable, Callable, List, Optional, Sequence, Tuple
+import asyncio
+import math
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Presupuesto por defecto para el texto variable de un prompt (config: max_prompt_tokens).
+# Deja margen sobre el contexto del modelo para la plantilla del prompt y la respuesta.
+DEFAULT_MAX_PROMPT_TOKENS = 48000
+
+# Aproximación cuando tiktoken no está instalado (~4 caracteres por token)
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Número de tokens de `text` (exacto con tiktoken, aproximado sin él)."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _split_oversized(piece: str, max_tokens: int) -> List[str]:
+    """Parte un único texto que por sí solo excede el presupuesto."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(piece, disallowed_special=())
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    step = max_tokens * CHARS_PER_TOKEN
+    return [piece[i:i + step] for i in range(0, len(piece), step)]
+
+
+def chunk_pieces(pieces: Sequence[str], max_tokens: int, separator: str = " ") -> List[Tuple[str, int]]:
+    """
+    Agrupa `pieces` (comentarios, captions...) en fragmentos de a lo sumo `max_tokens` tokens,
+    sin partir ninguna pieza salvo que ella sola exceda el presupuesto.
+    Devuelve [(texto_del_fragmento, número_de_piezas)]. Si todo cabe, hay un único fragmento
+    idéntico a `separator.join(pieces)`.
+    """
+    pieces = list(pieces)
+    sizes = [count_tokens(p) for p in pieces]
+    separator_tokens = count_tokens(separator)
+    if sum(sizes) + separator_tokens * max(0, len(pieces) - 1) <= max_tokens:
+        return [(separator.join(pieces), len(pieces))]
+
+    chunks: List[Tuple[str, int]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for piece, size in zip(pieces, sizes):
+        if size > max_tokens:
+            if current:
+                chunks.append((separator.join(current), len(current)))
+                current, current_tokens = [], 0
+            chunks.extend((part, 1) for part in _split_oversized(piece, max_tokens))
+            continue
+        extra = size + (separator_tokens if current else 0)
+        if current and current_tokens + extra > max_tokens:
+            chunks.append((separator.join(current), len(current)))
+            current, current_tokens = [], 0
+            extra = size
+        current.append(piece)
+        current_tokens += extra
+    if current:
+        chunks.append((separator.join(current), len(current)))
+    return chunks
+
+
+async def map_reduce(pieces: Sequence[str], map_fn: Callable[[str], Awaitable[Any]],
+                     combine: Callable[[List[Tuple[Any, int]]], Any], max_tokens: int,
+                     separator: str = " ", max_concurrency: Optional[int] = None) -> Tuple[Any, int]:
+    """
+    Ejecuta `map_fn` sobre cada fragmento (en paralelo) y combina los resultados parciales con
+    `combine([(resultado, número_de_piezas), ...])`. Si la entrada cabe en un solo fragmento se
+    devuelve directamente el resultado de `map_fn`, sin pasar por el combinador.
+    Devuelve (resultado, número_de_fragmentos). Un error en cualquier fragmento se propaga.
+    """
+    chunks = chunk_pieces(pieces, max_tokens, separator)
+    if len(chunks) == 1:
+        return await map_fn(chunks[0][0]), 1
+
+    semaphore = asyncio.Semaphore(max_concurrency or len(chunks))
+
+    async def _run(text: str):
+        async with semaphore:
+            return await map_fn(text)
+
+    partials = await asyncio.gather(*(_run(text) for text, _ in chunks))
+    return combine([(partial, weight) for partial, (_, weight) in zip(partials, chunks)]), len(chunks)
+
+
+def weighted_mean_dicts(partials: List[Tuple[Optional[dict], int]]) -> dict:
+    """Promedio ponderado, clave a clave, de diccionarios numéricos (p. ej. emociones o rasgos)."""
+    totals: dict = {}
+    weights: dict = {}
+    for values, weight in partials:
+        for key, value in (values or {}).items():
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            totals[key] = totals.get(key, 0.0) + value * weight
+            weights[key] = weights.get(key, 0) + weight
+    return {key: totals[key] / weights[key] for key in totals if weights[key]}
+
+
+def weighted_mean(partials: List[Tuple[Any, int]]) -> float:
+    total = 0.0
+    weight_sum = 0
+    for value, weight in partials:
+        try:
+            total += float(value) * weight
+            weight_sum += weight
+        except (TypeError, ValueError):
+            continue
+    return total / weight_sum if weight_sum else 0.0
+
+
+def merge_topics(partials: List[Tuple[Optional[list], int]], top_n: int = 3) -> list:
+    """
+    Une los tópicos de varios fragmentos: suma la relevancia ponderada por tamaño del
+    fragmento, conserva el sentimiento del fragmento que más aportó y renormaliza el top N.
+    """
+    relevance: dict = {}
+    best: dict = {}
+    for topics, weight in partials:
+        for topic in topics or []:
+            name = topic.get("topico")
+            if not name:
+                continue
+            try:
+                score = float(topic.get("porcentaje_relevancia", 0.0) or 0.0) * weight
+            except (TypeError, ValueError):
+                score = 0.0
+            relevance[name] = relevance.get(name, 0.0) + score
+            if name not in best or score > best[name][0]:
+                best[name] = (score, topic.get("sentimiento"))
+    top = sorted(relevance.items(), key=lambda item: item[1], reverse=True)[:top_n]
+    total = sum(score for _, score in top)
+    return [
+        {"topico": name, "sentimiento": best[name][1], "porcentaje_relevancia": (score / total) if total else 0.0}
+        for name, score in top
+    ]
@@ -1,17 +1,31 @@
 import os
+import io
 import json
+import time
 import asyncio
+import contextlib
+import tracemalloc
 import re
 from dotenv import load_dotenv
 import logging
 from openai import AsyncOpenAI
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
+
+from scheduler import run_dag
+from llm_cache import LLMResponseCache, CachedOpenAIClient
+from rate_limiter import RateLimitedOpenAIClient, get_rate_limiter
+from instrumentation import PROFILES_DIRNAME, InstrumentedOpenAIClient, ModuleTimer, RunManifest
+from llm_batch import (BATCH_MODULES, BATCHES_DIRNAME, DEFAULT_POLL_INTERVAL_SECONDS, DEFAULT_TIMEOUT_HOURS,
+                       BatchRequestRecorder, BatchReplayClient, backend_from_config, run_batch)
 
 script_dir = os.path.dirname(__file__)
 # Configure logging to a file within the mounted volume
 log_file_path = os.path.join(script_dir, '..', '..', 'outputs', 'orchestrator_debug.log')
 logging.basicConfig(filename=log_file_path, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+from analysis_modules.dataset import IngestedDataset
+from analysis_modules.comment_annotations import CommentAnnotationStore
+
 # --- Importar Módulos de Análisis ---
 # A medida que se creen nuevos módulos, se importarán aquí
 from analysis_modules.q1_emociones import Q1Emociones
@@ -76,6 +90,59 @@ ANALYSIS_MODULES = {
     "Q20": Q20KpiGlobal
 }
 
+def module_output_filename(module_name: str) -> str:
+    """Nombre del archivo de salida de un módulo (ej. Q1 -> q1_emociones.json)."""
+    # Convertir el nombre de la clase (p.ej. Q11Engagement) a snake_case removiendo
+    # el prefijo Q\d+ para evitar nombres como q11_1_engagement.json
+    class_name_raw = ANALYSIS_MODULES[module_name].__name__
+    # Eliminar prefijo Q seguido de dígitos (Q1, Q11, etc.)
+    class_name_base = re.sub(r'^Q\d+', '', class_name_raw)
+    class_name_suffix = re.sub(r'(?<!^)(?=[A-Z])', '_', class_name_base).lower()
+    return f"{module_name.lower()}_{class_name_suffix}.json"
+
+# Número máximo de módulos ejecutándose a la vez (config: max_concurrent_modules)
+DEFAULT_MAX_CONCURRENT_MODULES = 4
+
+async def _run_batch_pass(config: Dict[str, Any], openai_client: Any, modules: List[str],
+                          llm_cache: Optional[LLMResponseCache] = None) -> Optional[BatchReplayClient]:
+    """
+    Primera pasada del modo batch: ejecuta los módulos por publicación con un cliente que sólo
+    registra las peticiones (sin escribir outputs ni estado), las envía como un lote al backend
+    configurado y espera los resultados. Devuelve el cliente que los sirve en la corrida normal.
+    """
+    batch_modules = [m for m in modules if m in BATCH_MODULES]
+    if not batch_modules:
+        return None
+
+    # Las peticiones ya cacheadas no se vuelven a pagar en el lote
+    recorder = BatchRequestRecorder(llm_cache)
+    collect_config = dict(config)
+    collect_config['dry_run'] = True
+    collect_config['annotation_store'] = None
+    if config.get('fused_comment_annotations') and config.get('dataset') is not None:
+        collect_config['annotation_store'] = CommentAnnotationStore(recorder, config['dataset'], config)
+
+    # Las respuestas de la recolección están vacías: se descartan los avisos que imprimen los módulos
+    with contextlib.redirect_stdout(io.StringIO()):
+        for module_name in batch_modules:
+            try:
+                await ANALYSIS_MODULES[module_name](recorder, collect_config).analyze()
+            except Exception as e:
+                logging.warning(f"Batch LLM: no se pudieron recolectar las peticiones de {module_name}: {e}")
+
+    settings = config.get('llm_batch', {}) or {}
+    work_dir = os.path.join(config['outputs_dir'], BATCHES_DIRNAME, time.strftime('%Y%m%d-%H%M%S'))
+    results = await run_batch(
+        recorder,
+        backend_from_config(config, openai_client),
+        work_dir,
+        poll_interval=float(settings.get('poll_interval_seconds', DEFAULT_POLL_INTERVAL_SECONDS)),
+        timeout_seconds=float(settings.get('timeout_hours', DEFAULT_TIMEOUT_HOURS)) * 3600,
+    )
+    replay = BatchReplayClient(openai_client, results, llm_cache)
+    replay.cached_requests = recorder.cached
+    return replay
+
 async def analyze_data(config: Dict[str, Any], module_to_run="all"):
     """
     Orquestador principal para el análisis de datos de redes sociales.
@@ -83,7 +150,6 @@ async def analyze_data(config: Dict[str, Any], module_to_run="all"):
     """
     try:
         logging.info("Iniciando el motor de análisis...")
-        openai_client = AsyncOpenAI(api_key=os.environ.get("OPENAI_API_KEY")) # Use OPENAI_API_KEY for OpenAI API key
         # Ensure analyzers use the same outputs directory as this orchestrator
         # Default outputs dir (relative to this script) -> pixely_stable/orchestrator/outputs
         default_outputs_dir = os.path.join(script_dir, '..', '..', 'outputs')
@@ -92,9 +158,63 @@ async def analyze_data(config: Dict[str, Any], module_to_run="all"):
             config.setdefault('outputs_dir', default_outputs_dir)
         else:
             config = {'outputs_dir': default_outputs_dir}
+
+        # Los reintentos los gestiona el limitador del proceso (RPM/TPM, Retry-After, backoff con jitter).
+        # `openai_base_url` apunta a un endpoint compatible (p. ej. stand_in_server.py para pruebas de carga).
+        base_url = config.get('openai_base_url') or None
+        api_key = os.environ.get("OPENAI_API_KEY") # Use OPENAI_API_KEY for OpenAI API key
+        if base_url and not api_key:
+            api_key = "stand-in"
+        openai_client = AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0)
+        if base_url:
+            logging.info(f"Cliente OpenAI apuntando a {base_url}")
+
+        # Los módulos escriben sus resultados (y el manifiesto de la corrida) aquí
+        results_dir = os.path.abspath(os.path.join(script_dir, '..', '..', 'outputs'))
+        manifest = RunManifest(module_to_run, config)
+        # Perfilado opcional (config: profiling.enabled / profiling.cprofile; --profile / --cprofile)
+        profiling = config.get('profiling') or {}
+        profiling_enabled = bool(profiling.get('enabled') or profiling.get('cprofile'))
+        if profiling_enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+        # Archivo de salida de cada módulo, para que Q9/Q10 lean los outputs de esta corrida
+        config['module_output_files'] = {name: module_output_filename(name) for name in ANALYSIS_MODULES}
+
+        # Parsear ingested_data.json una sola vez por corrida y compartir el snapshot
+        # (inmutable) con todos los analizadores a través de config["dataset"].
+        load_started = time.perf_counter()
+        try:
+            config['dataset'] = IngestedDataset.load(config['outputs_dir'])
+            logging.info(f"Datos ingeridos cargados una vez para la corrida: {config['dataset'].source_path}")
+            manifest.data['dataset'] = {
+                'path': config['dataset'].source_path,
+                'load_seconds': round(time.perf_counter() - load_started, 3),
+                'posts': config['dataset'].post_count,
+                'comments': config['dataset'].comment_count,
+            }
+        except FileNotFoundError as e:
+            # Cada módulo reintentará la carga y registrará su propio error
+            config['dataset'] = None
+            logging.error(f"No se pudieron cargar los datos ingeridos: {e}")
+            manifest.data['dataset'] = {'error': str(e)}
+
+        rate_limiter = get_rate_limiter(config)
+        openai_client = RateLimitedOpenAIClient(openai_client, rate_limiter)
+
+        # Caché persistente de respuestas del LLM (config: llm_cache; --no-cache la desactiva)
+        llm_cache = None
+        try:
+            llm_cache = LLMResponseCache.from_config(config)
+        except Exception as e:
+            logging.warning(f"LLM cache deshabilitada: no se pudo abrir ({e})")
+        if llm_cache is not None:
+            openai_client = CachedOpenAIClient(openai_client, llm_cache)
+            logging.info(f"LLM cache activa en {llm_cache.path} ({llm_cache.stats()['entries']} entradas)")
+
         modules_to_execute = []
         if module_to_run.lower() == "all":
-            modules_to_execute = ANALYSIS_MODULES.keys()
+            modules_to_execute = list(ANALYSIS_MODULES.keys())
             logging.info(f"Se ejecutarán todos los módulos disponibles: {list(modules_to_execute)}")
         elif module_to_run.upper() in ANALYSIS_MODULES:
             modules_to_execute = [module_to_run.upper()]
@@ -102,30 +222,63 @@ async def analyze_data(config: Dict[str, Any], module_to_run="all"):
             logging.error(f"Error: Módulo '{module_to_run}' no es reconocido. Módulos disponibles: {list(ANALYSIS_MODULES.keys())}")
             return
 
-        for module_name in modules_to_execute:
+        # Modo batch (config: llm_execution_mode = "batch"): las peticiones por publicación de
+        # Q1/Q2/Q3/Q7 se envían como un único lote offline y la corrida normal las reconcilia.
+        batch_client = None
+        if config.get('llm_execution_mode', 'interactive') == 'batch':
+            try:
+                batch_client = await _run_batch_pass(config, openai_client, modules_to_execute, llm_cache)
+            except Exception as e:
+                logging.error(f"Batch LLM: falló el envío por lotes, se continúa en modo interactivo: {e}")
+            if batch_client is not None:
+                openai_client = batch_client
+
+        # Modo fusionado: una sola llamada por post alimenta Q1/Q2/Q3/Q7 (config: fused_comment_annotations)
+        annotation_store = None
+        if config.get('fused_comment_annotations') and config.get('dataset') is not None:
+            annotation_store = CommentAnnotationStore(openai_client, config['dataset'], config)
+            logging.info("Anotación fusionada de comentarios activa para Q1/Q2/Q3/Q7.")
+        config['annotation_store'] = annotation_store
+
+        async def run_module(module_name: str):
+            # Cada módulo ve el cliente compartido a través de un proxy que cuenta sus llamadas y tokens
+            module_client = InstrumentedOpenAIClient(openai_client)
+            cprofile_path = None
+            if profiling.get('cprofile'):
+                cprofile_path = os.path.join(results_dir, PROFILES_DIRNAME, manifest.run_id, f"{module_name.lower()}.prof")
+            timer = ModuleTimer(cprofile_path)
+            metrics = {'status': 'ok'}
             try:
                 logging.info(f"--- Ejecutando Módulo {module_name} ---")
                 
                 analyzer_class = ANALYSIS_MODULES[module_name]
-                analyzer_instance = analyzer_class(openai_client, config) # Pass openai_client and config
-                result = await analyzer_instance.analyze()
+                analyzer_instance = analyzer_class(module_client, config) # Pass openai_client and config
+                timer.start()
+                try:
+                    result = await analyzer_instance.analyze()
+                finally:
+                    metrics.update(timer.stop())
+                chunk_stats = analyzer_instance.chunk_stats
+                if chunk_stats["inputs"]:
+                    logging.info(
+                        f"Módulo {module_name}: {chunk_stats['chunks']} fragmentos para {chunk_stats['inputs']} entradas "
+                        f"({chunk_stats['chunked_inputs']} divididas por límite de tokens)."
+                    )
                 
-                # Convención de nombres para el archivo de salida (ej. q1_emociones.json)
-                # Convertir el nombre de la clase (p.ej. Q11Engagement) a snake_case removiendo
-                # el prefijo Q\d+ para evitar nombres como q11_1_engagement.json
-                class_name_raw = analyzer_class.__name__
-                # Eliminar prefijo Q seguido de dígitos (Q1, Q11, etc.)
-                class_name_base = re.sub(r'^Q\d+', '', class_name_raw)
-                class_name_suffix = re.sub(r'(?<!^)(?=[A-Z])', '_', class_name_base).lower()
-                output_filename = f"{module_name.lower()}_{class_name_suffix}.json"
+                output_filename = module_output_filename(module_name)
                 output_path = os.path.join(script_dir, '..', '..', 'outputs', output_filename)
                 
                 logging.info(f"Attempting to save result for {module_name} to: {output_path}")
+                write_started = time.perf_counter()
                 with open(output_path, 'w', encoding='utf-8') as f:
                     json.dump(result, f, indent=4, ensure_ascii=False)
+                metrics['write_seconds'] = round(time.perf_counter() - write_started, 3)
+                metrics['output_path'] = os.path.abspath(output_path)
+                metrics['output_bytes'] = os.path.getsize(output_path)
                 logging.info(f"Módulo {module_name} ejecutado y resultado guardado en: {output_path}")
 
             except Exception as e:
+                metrics.update({'status': 'error', 'error': str(e)})
                 logging.error(f"ERROR en Módulo {module_name}: {e}")
                 error_result = {"error": f"El módulo {module_name} no se pudo ejecutar: {e}"}
                 output_filename = f"{module_name.lower()}_error.json"
@@ -133,8 +286,79 @@ async def analyze_data(config: Dict[str, Any], module_to_run="all"):
                 with open(output_path, 'w', encoding='utf-8') as f:
                     json.dump(error_result, f, indent=4, ensure_ascii=False)
                 logging.info(f"Error del Módulo {module_name} registrado en: {output_path}")
+                raise
+            finally:
+                metrics.update(module_client.stats())
+                manifest.record_module(module_name, metrics)
+
+        # Los módulos independientes se ejecutan en paralelo; Q9/Q10 esperan al resto
+        # y Q11-Q13 a Q16 (ver scheduler.MODULE_DEPENDENCIES).
+        max_concurrency = config.get("max_concurrent_modules", DEFAULT_MAX_CONCURRENT_MODULES)
+        if profiling_enabled:
+            # CPU, memoria y cProfile son del proceso: con un módulo a la vez se atribuyen sin mezclarse
+            max_concurrency = 1
+            logging.info("Perfilado activo: los módulos se ejecutan de a uno.")
+        report = await run_dag(modules_to_execute, run_module, max_concurrency=max_concurrency)
+
+        cp = report["critical_path"]
+        logging.info(
+            f"Scheduler: {len(report['durations_seconds'])} módulos en {report['wall_seconds']:.1f}s "
+            f"(suma secuencial {report['sequential_seconds']:.1f}s, concurrencia máx. {report['max_concurrency']})."
+        )
+        logging.info(f"Scheduler: camino crítico {' -> '.join(cp['path'])} ({cp['duration_seconds']:.1f}s)")
+        if report["errors"]:
+            logging.warning(f"Scheduler: módulos con error: {sorted(report['errors'])}")
+
+        if annotation_store is not None:
+            report["comment_annotations"] = annotation_store.stats()
+            logging.info(
+                f"Anotación fusionada: {report['comment_annotations']['llm_calls']} llamadas al LLM para "
+                f"{report['comment_annotations']['requests']} peticiones de módulos."
+            )
+        if batch_client is not None:
+            report["llm_batch"] = {
+                "served": batch_client.served,
+                "failed": batch_client.failed,
+                "passthrough": batch_client.passthrough,
+                "cached_requests": batch_client.cached_requests,
+            }
+            logging.info(
+                f"Batch LLM: {batch_client.served} respuestas servidas desde el lote, {batch_client.failed} fallidas, "
+                f"{batch_client.passthrough} llamadas interactivas fuera del lote, "
+                f"{batch_client.cached_requests} peticiones omitidas del lote por estar en caché."
+            )
+        report["rate_limiter"] = rate_limiter.stats()
+        rl = report["rate_limiter"]
+        logging.info(
+            f"Rate limiter: {rl['requests']} peticiones / {rl['tokens']} tokens; último minuto "
+            f"{rl['current_requests_per_minute']} RPM, {rl['current_tokens_per_minute']} TPM; "
+            f"{rl['throttled']} respuestas 429, {rl['retries']} reintentos, {rl['wait_seconds']}s en espera."
+        )
+        if llm_cache is not None:
+            report["llm_cache"] = llm_cache.stats()
+            llm_cache.close()
+            cs = report["llm_cache"]
+            logging.info(
+                f"LLM cache: {cs['hits']} hits / {cs['misses']} misses, {cs['writes']} escrituras, "
+                f"{cs['evictions']} desalojos, {cs['entries']} entradas."
+            )
+
+        if profiling_enabled:
+            tracemalloc.stop()
+        try:
+            manifest_path = manifest.write(
+                results_dir,
+                scheduler={key: report[key] for key in ('wall_seconds', 'sequential_seconds', 'max_concurrency',
+                                                        'critical_path', 'errors') if key in report},
+                **{key: report[key] for key in ('rate_limiter', 'llm_cache', 'llm_batch', 'comment_annotations')
+                   if key in report},
+            )
+            logging.info(f"Manifiesto de la corrida escrito en: {manifest_path}")
+        except Exception as e:
+            logging.warning(f"No se pudo escribir el manifiesto de la corrida: {e}")
 
         logging.info("\nMotor de análisis completado.")
+        return report
 
     except Exception as e:
         logging.error(f"Ocurrió un error inesperado en el motor de análisis: {e}")
@@ -0,0 +1,168 @@
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+MANIFEST_FILENAME = "run_manifest.json"
+PROFILES_DIRNAME = "profiles"
+# Historial de manifiestos (uno por corrida) que lee la página "Hilos de Trabajo" del frontend
+RUNS_DIRNAME = "runs"
+DEFAULT_RUN_HISTORY_KEEP = 90
+
+
+class InstrumentedOpenAIClient:
+    """
+    Proxy por módulo sobre el cliente compartido: cuenta llamadas al LLM, tokens de prompt y
+    de salida facturados (las respuestas servidas desde la caché se cuentan aparte) y el tiempo
+    que el módulo pasa esperando al LLM (tiempo con al menos una llamada en vuelo, así las
+    llamadas concurrentes no se suman).
+    """
+
+    def __init__(self, client: Any):
+        self._client = client
+        self.calls = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.wait_seconds = 0.0
+        self._in_flight = 0
+        self._busy_since: Optional[float] = None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        if self._in_flight == 0:
+            self._busy_since = time.perf_counter()
+        self._in_flight += 1
+        self.calls += 1
+        try:
+            response = await self._client.chat.completions.create(**kwargs)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            if self._in_flight == 0:
+                self.wait_seconds += time.perf_counter() - self._busy_since
+        if getattr(response, "cached", False):
+            # Servida desde la caché: no consume tokens de la API
+            self.cache_hits += 1
+            return response
+        usage = getattr(response, "usage", None)
+        self.prompt_tokens += getattr(usage, "prompt_tokens", 0) or 0
+        self.completion_tokens += getattr(usage, "completion_tokens", 0) or 0
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "llm_calls": self.calls,
+            "llm_errors": self.errors,
+            "llm_cache_hits": self.cache_hits,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "llm_wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+class ModuleTimer:
+    """
+    Mide una ejecución de analyze(): tiempo de reloj y de CPU, pico de tracemalloc (si el
+    trazado está activo) y, opcionalmente, un volcado de cProfile en `cprofile_path`.
+    CPU y memoria son del proceso: sólo se atribuyen con exactitud a un módulo cuando los
+    módulos se ejecutan de a uno (el modo de perfilado lo fuerza).
+    """
+
+    def __init__(self, cprofile_path: Optional[str] = None):
+        self.cprofile_path = cprofile_path
+        self._profiler: Optional[cProfile.Profile] = None
+        self.metrics: Dict[str, Any] = {}
+
+    def start(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        if self.cprofile_path:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    def stop(self) -> Dict[str, Any]:
+        self.metrics["wall_seconds"] = round(time.perf_counter() - self._wall, 3)
+        self.metrics["cpu_seconds"] = round(time.process_time() - self._cpu, 3)
+        if self._profiler is not None:
+            self._profiler.disable()
+            os.makedirs(os.path.dirname(self.cprofile_path), exist_ok=True)
+            self._profiler.dump_stats(self.cprofile_path)
+            self.metrics["cprofile_path"] = self.cprofile_path
+        if tracemalloc.is_tracing():
+            self.metrics["alloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        return self.metrics
+
+
+class RunManifest:
+    """
+    Resumen legible por máquina de una corrida de analyze_data. La última corrida queda en
+    outputs/run_manifest.json y cada corrida se archiva en outputs/runs/<run_id>.json
+    (se conservan las `run_history_keep` más recientes).
+    """
+
+    def __init__(self, module_to_run: str, config: Dict[str, Any]):
+        self.started = datetime.now()
+        self.run_id = self.started.strftime("%Y%m%dT%H%M%S")
+        self.keep_runs = int(config.get("run_history_keep", DEFAULT_RUN_HISTORY_KEEP))
+        self.data: Dict[str, Any] = {
+            "run_id": self.run_id,
+            "started_at": self.started.isoformat(timespec="seconds"),
+            "module_to_run": module_to_run,
+            "settings": {
+                "openai_model": config.get("openai_model"),
+                "openai_base_url": config.get("openai_base_url") or None,
+                "llm_execution_mode": config.get("llm_execution_mode", "interactive"),
+                "fused_comment_annotations": bool(config.get("fused_comment_annotations")),
+                "incremental_analysis": bool(config.get("incremental_analysis")),
+                "max_concurrent_modules": config.get("max_concurrent_modules"),
+                "profiling": config.get("profiling") or {},
+            },
+            "modules": {},
+        }
+
+    def record_module(self, module_name: str, metrics: Dict[str, Any]):
+        self.data["modules"][module_name] = metrics
+
+    def write(self, outputs_dir: str, **sections: Any) -> str:
+        """Escribe el manifiesto (de forma atómica) con las secciones adicionales dadas."""
+        finished = datetime.now()
+        self.data.update(sections)
+        self.data["finished_at"] = finished.isoformat(timespec="seconds")
+        self.data["wall_seconds"] = round((finished - self.started).total_seconds(), 3)
+        path = os.path.join(outputs_dir, MANIFEST_FILENAME)
+        _write_json_atomic(path, self.data)
+        if self.keep_runs > 0:
+            runs_dir = os.path.join(outputs_dir, RUNS_DIRNAME)
+            os.makedirs(runs_dir, exist_ok=True)
+            _write_json_atomic(os.path.join(runs_dir, f"{self.run_id}.json"), self.data)
+            self._prune_history(runs_dir)
+        return path
+
+    def _prune_history(self, runs_dir: str):
+        # Los nombres son timestamps ordenables: basta con ordenar y borrar los más viejos
+        history = sorted(f for f in os.listdir(runs_dir) if f.endswith(".json"))
+        for name in history[:-self.keep_runs]:
+            try:
+                os.remove(os.path.join(runs_dir, name))
+            except OSError:
+                pass
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False, default=str)
+    os.replace(tmp_path, path)
@@ -0,0 +1,300 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Optional
+
+from llm_cache import LLMResponseCache, cached_response, store_response
+
+# Módulos con una llamada al LLM por publicación: son los que se envían en lote
+BATCH_MODULES = ["Q1", "Q2", "Q3", "Q7"]
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCHES_DIRNAME = "batches"
+
+DEFAULT_POLL_INTERVAL_SECONDS = 60
+DEFAULT_TIMEOUT_HOURS = 24
+
+# Respuesta neutra que devuelve el cliente de recolección: los módulos la tratan como
+# una respuesta vacía y siguen adelante sin reintentos.
+_PLACEHOLDER_CONTENT = "{}"
+
+
+def _to_namespace(body: Dict[str, Any]) -> Any:
+    """Convierte el body JSON de una chat completion en un objeto con acceso por atributos."""
+    return json.loads(json.dumps(body), object_hook=lambda d: SimpleNamespace(**d))
+
+
+class BatchRequestRecorder:
+    """
+    Cliente de recolección (primera pasada del modo batch): registra cada petición a
+    `chat.completions.create` en formato de batch de OpenAI y devuelve una respuesta vacía.
+    Peticiones idénticas se registran una sola vez (custom_id = hash de la petición).
+    Con `cache`, las peticiones que ya tienen respuesta guardada no se registran (no se
+    vuelven a pagar en el lote) y se responden desde la caché.
+    """
+
+    def __init__(self, cache: Optional[LLMResponseCache] = None):
+        self.requests: Dict[str, Dict[str, Any]] = {}
+        self.cache = cache
+        self.cached = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        if self.cache is not None:
+            response = cached_response(self.cache, kwargs)
+            if response is not None:
+                self.cached += 1
+                return response
+        custom_id = LLMResponseCache.make_key(kwargs)
+        self.requests.setdefault(custom_id, {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": BATCH_ENDPOINT,
+            "body": kwargs,
+        })
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=_PLACEHOLDER_CONTENT),
+                                     finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=0, completion_tokens=0, total_tokens=0),
+        )
+
+    def write(self, path: str) -> int:
+        """Escribe las peticiones como JSONL (una por línea) y devuelve cuántas se escribieron."""
+        with open(path, "w", encoding="utf-8") as f:
+            for request in self.requests.values():
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        return len(self.requests)
+
+
+def read_batch_results(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Lee el JSONL de resultados de un batch y devuelve {custom_id: {"body": ...}} para las
+    respuestas correctas y {custom_id: {"error": ...}} para las fallidas.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            custom_id = record.get("custom_id")
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                results[custom_id] = {"error": record.get("error") or response.get("body")}
+            else:
+                results[custom_id] = {"body": response.get("body")}
+    return results
+
+
+class BatchReplayClient:
+    """
+    Cliente de la segunda pasada: responde desde los resultados del batch y delega en el
+    cliente real las peticiones que no formaron parte del lote (p. ej. Q4-Q6, Q9, Q10).
+    Con `cache`, cada resultado servido se guarda en ella para las corridas interactivas.
+    """
+
+    def __init__(self, client: Any, results: Dict[str, Dict[str, Any]], cache: Optional[LLMResponseCache] = None):
+        self._client = client
+        self.results = results
+        self.cache = cache
+        # Peticiones que no entraron al lote porque la caché ya tenía su respuesta
+        self.cached_requests = 0
+        self.served = 0
+        self.failed = 0
+        self.passthrough = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        key = LLMResponseCache.make_key(kwargs)
+        result = self.results.get(key)
+        if result is None:
+            self.passthrough += 1
+            return await self._client.chat.completions.create(**kwargs)
+        if "error" in result:
+            self.failed += 1
+            raise RuntimeError(f"La petición falló en el batch: {result['error']}")
+        self.served += 1
+        response = _to_namespace(result["body"])
+        if self.cache is not None:
+            store_response(self.cache, kwargs, response, key)
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+class BatchBackend:
+    """Interfaz de los backends de batch: subir el JSONL, consultar estado y descargar resultados."""
+
+    async def submit(self, input_path: str) -> str:
+        raise NotImplementedError
+
+    async def status(self, batch_id: str) -> str:
+        """Uno de: "in_progress", "completed", "failed", "expired", "cancelled"."""
+        raise NotImplementedError
+
+    async def download(self, batch_id: str, output_path: str):
+        raise NotImplementedError
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """Batch API de OpenAI (mitad de precio, ventana de 24h) usando el cliente AsyncOpenAI."""
+
+    TERMINAL_FAILURES = {"failed", "expired", "cancelled"}
+
+    def __init__(self, client: Any, completion_window: str = "24h"):
+        self.client = client
+        self.completion_window = completion_window
+
+    async def submit(self, input_path: str) -> str:
+        with open(input_path, "rb") as f:
+            input_file = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> str:
+        batch = await self.client.batches.retrieve(batch_id)
+        if batch.status in self.TERMINAL_FAILURES or batch.status == "completed":
+            return batch.status
+        return "in_progress"
+
+    async def download(self, batch_id: str, output_path: str):
+        batch = await self.client.batches.retrieve(batch_id)
+        with open(output_path, "w", encoding="utf-8") as f:
+            if batch.output_file_id:
+                content = await self.client.files.content(batch.output_file_id)
+                f.write(content.text)
+            # Las peticiones fallidas vienen en un archivo aparte con el mismo formato
+            if getattr(batch, "error_file_id", None):
+                errors = await self.client.files.content(batch.error_file_id)
+                f.write(errors.text)
+
+
+class LocalFileBatchBackend(BatchBackend):
+    """
+    Backend local basado en archivos, para probar el flujo sin red.
+
+    Cada batch es un directorio `<root>/<batch_id>/` con input.jsonl. El batch se da por
+    completado cuando aparece output.jsonl (mismo formato que la Batch API). Si se pasa un
+    `responder` (body de la petición -> body de la chat completion, sync o async) el
+    backend genera output.jsonl al enviar; si no, espera a que alguien lo deje ahí.
+    """
+
+    def __init__(self, root: str, responder: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.root = root
+        self.responder = responder
+
+    def _dir(self, batch_id: str) -> str:
+        return os.path.join(self.root, batch_id)
+
+    async def submit(self, input_path: str) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        batch_dir = self._dir(batch_id)
+        os.makedirs(batch_dir, exist_ok=True)
+        shutil.copyfile(input_path, os.path.join(batch_dir, "input.jsonl"))
+        if self.responder is not None:
+            await self._respond(batch_id)
+        return batch_id
+
+    async def _respond(self, batch_id: str):
+        lines = []
+        with open(os.path.join(self._dir(batch_id), "input.jsonl"), "r", encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        for request in requests:
+            record = {"id": f"req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"], "error": None}
+            try:
+                body = self.responder(request["body"])
+                if asyncio.iscoroutine(body):
+                    body = await body
+                record["response"] = {"status_code": 200, "body": body}
+            except Exception as e:
+                record["response"] = None
+                record["error"] = {"code": "responder_error", "message": str(e)}
+            lines.append(json.dumps(record, ensure_ascii=False))
+        tmp_path = os.path.join(self._dir(batch_id), "output.jsonl.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + ("\n" if lines else ""))
+        os.replace(tmp_path, os.path.join(self._dir(batch_id), "output.jsonl"))
+
+    async def status(self, batch_id: str) -> str:
+        if os.path.exists(os.path.join(self._dir(batch_id), "output.jsonl")):
+            return "completed"
+        return "in_progress"
+
+    async def download(self, batch_id: str, output_path: str):
+        shutil.copyfile(os.path.join(self._dir(batch_id), "output.jsonl"), output_path)
+
+
+def backend_from_config(config: Dict[str, Any], openai_client: Any) -> BatchBackend:
+    settings = config.get("llm_batch", {}) or {}
+    name = settings.get("backend", "openai")
+    if name == "openai":
+        return OpenAIBatchBackend(openai_client, settings.get("completion_window", "24h"))
+    if name == "local":
+        root = settings.get("local_dir") or os.path.join(config["outputs_dir"], BATCHES_DIRNAME, "local")
+        return LocalFileBatchBackend(root, local_responder(settings.get("local_responder", "stand_in")))
+    raise ValueError(f"Backend de batch desconocido: {name}")
+
+
+def local_responder(name: Optional[str]) -> Optional[Callable[[Dict[str, Any]], Any]]:
+    """
+    Responder del backend local según `llm_batch.local_responder`: "stand_in" (por defecto)
+    responde con los payloads falsos de stand_in_server; "external" no responde y deja que
+    un proceso externo escriba output.jsonl en el directorio del batch.
+    """
+    if name == "stand_in":
+        from stand_in_server import StandInSettings, build_completion
+
+        settings = StandInSettings(latency_ms=0.0, latency_sigma=0.0)
+        return lambda body: build_completion(body, settings)[1]
+    if name in ("external", None):
+        return None
+    raise ValueError(f"Responder de batch local desconocido: {name}")
+
+
+async def run_batch(recorder: BatchRequestRecorder, backend: BatchBackend, work_dir: str,
+                    poll_interval: float = DEFAULT_POLL_INTERVAL_SECONDS,
+                    timeout_seconds: float = DEFAULT_TIMEOUT_HOURS * 3600) -> Dict[str, Dict[str, Any]]:
+    """
+    Escribe las peticiones registradas, las envía al backend, espera a que el batch termine
+    y devuelve los resultados indexados por custom_id.
+    """
+    if not recorder.requests:
+        logging.info("Batch LLM: no hay peticiones que enviar.")
+        return {}
+
+    os.makedirs(work_dir, exist_ok=True)
+    input_path = os.path.join(work_dir, "requests.jsonl")
+    output_path = os.path.join(work_dir, "results.jsonl")
+    count = recorder.write(input_path)
+
+    batch_id = await backend.submit(input_path)
+    logging.info(f"Batch LLM: {count} peticiones enviadas como {batch_id} ({input_path}).")
+
+    started = time.monotonic()
+    while True:
+        status = await backend.status(batch_id)
+        if status == "completed":
+            break
+        if status != "in_progress":
+            raise RuntimeError(f"El batch {batch_id} terminó con estado '{status}'")
+        if time.monotonic() - started > timeout_seconds:
+            raise TimeoutError(f"El batch {batch_id} no terminó en {timeout_seconds:.0f}s")
+        await asyncio.sleep(poll_interval)
+
+    await backend.download(batch_id, output_path)
+    results = read_batch_results(output_path)
+    failed = sum(1 for r in results.values() if "error" in r)
+    logging.info(f"Batch LLM: {batch_id} completado en {time.monotonic() - started:.0f}s; "
+                 f"{len(results) - failed} respuestas correctas, {failed} fallidas.")
+    return results
@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+
+CACHE_FILENAME = 'llm_cache.sqlite3'
+
+# Valores por defecto (config: llm_cache.enabled / ttl_hours / max_entries)
+DEFAULT_TTL_HOURS = 24 * 7
+DEFAULT_MAX_ENTRIES = 20000
+
+
+class LLMResponseCache:
+    """
+    Caché persistente (SQLite en outputs/) de respuestas de chat completions.
+
+    La clave es un hash de model + messages + response_format (y del resto de parámetros
+    de la llamada), de modo que un prompt idéntico no vuelve a enviarse al modelo.
+    Las entradas expiran por TTL y, al superar `max_entries`, se descartan las menos
+    usadas recientemente (LRU).
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = DEFAULT_TTL_HOURS * 3600,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                payload TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used_at)")
+        self._conn.commit()
+        self.evictions += self._purge_expired()
+        self._entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['LLMResponseCache']:
+        """Crea la caché en outputs_dir según config["llm_cache"]; None si está deshabilitada."""
+        settings = config.get('llm_cache', {}) or {}
+        if not settings.get('enabled', True):
+            return None
+        filename = settings.get('filename', CACHE_FILENAME)
+        base_url = config.get('openai_base_url')
+        if base_url:
+            # Endpoints alternativos (p. ej. el stand-in local) no comparten caché con OpenAI
+            stem, ext = os.path.splitext(filename)
+            filename = f"{stem}.{hashlib.sha256(base_url.encode('utf-8')).hexdigest()[:12]}{ext}"
+        path = os.path.join(config['outputs_dir'], filename)
+        return cls(
+            path,
+            ttl_seconds=float(settings.get('ttl_hours', DEFAULT_TTL_HOURS)) * 3600,
+            max_entries=settings.get('max_entries', DEFAULT_MAX_ENTRIES),
+        )
+
+    @staticmethod
+    def make_key(request: Dict[str, Any]) -> str:
+        """Hash estable de la petición (model, messages, response_format y demás parámetros)."""
+        canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT payload, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is None or now - row[1] > self.ttl_seconds:
+            self.misses += 1
+            return None
+        self._conn.execute("UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, model: Optional[str], payload: Dict[str, Any]):
+        now = time.time()
+        existed = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, model, payload, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+            (key, model, json.dumps(payload, ensure_ascii=False), now, now),
+        )
+        self.writes += 1
+        if not existed:
+            self._entries += 1
+        if self._entries > self.max_entries:
+            self._evict_lru()
+        self._conn.commit()
+
+    def _purge_expired(self) -> int:
+        cursor = self._conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+        self._conn.commit()
+        return cursor.rowcount
+
+    def _evict_lru(self):
+        # Se libera un 10% extra para no desalojar en cada inserción
+        target = int(self.max_entries * 0.9)
+        excess = self._entries - target
+        cursor = self._conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used_at ASC LIMIT ?)",
+            (excess,),
+        )
+        self._entries -= cursor.rowcount
+        self.evictions += cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else None,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "entries": self._entries,
+        }
+
+    def close(self):
+        self._conn.close()
+
+
+def _response_from_payload(payload: Dict[str, Any]) -> Any:
+    """Reconstruye un objeto con la forma de ChatCompletion (choices[0].message.content, usage)."""
+    usage = payload.get('usage') or {}
+    return SimpleNamespace(
+        model=payload.get('model'),
+        choices=[SimpleNamespace(
+            index=0,
+            finish_reason=payload.get('finish_reason'),
+            message=SimpleNamespace(role='assistant', content=payload.get('content')),
+        )],
+        usage=SimpleNamespace(
+            prompt_tokens=usage.get('prompt_tokens', 0),
+            completion_tokens=usage.get('completion_tokens', 0),
+            total_tokens=usage.get('total_tokens', 0),
+        ),
+        cached=True,
+    )
+
+
+def _payload_from_response(response: Any) -> Optional[Dict[str, Any]]:
+    """Extrae lo necesario para cachear; None si la respuesta no es reutilizable."""
+    try:
+        choice = response.choices[0]
+        content = choice.message.content
+    except (AttributeError, IndexError, TypeError):
+        return None
+    if not content or getattr(choice, 'finish_reason', None) == 'length':
+        return None
+    usage = getattr(response, 'usage', None)
+    return {
+        'model': getattr(response, 'model', None),
+        'content': content,
+        'finish_reason': getattr(choice, 'finish_reason', None),
+        'usage': {
+            'prompt_tokens': getattr(usage, 'prompt_tokens', 0) or 0,
+            'completion_tokens': getattr(usage, 'completion_tokens', 0) or 0,
+            'total_tokens': getattr(usage, 'total_tokens', 0) or 0,
+        },
+    }
+
+
+def cached_response(cache: LLMResponseCache, request: Dict[str, Any]) -> Optional[Any]:
+    """Respuesta guardada para la petición (con forma de ChatCompletion) o None."""
+    payload = cache.get(cache.make_key(request))
+    return None if payload is None else _response_from_payload(payload)
+
+
+def store_response(cache: LLMResponseCache, request: Dict[str, Any], response: Any, key: Optional[str] = None) -> bool:
+    """Guarda la respuesta de `request` si es reutilizable; devuelve si se guardó."""
+    payload = _payload_from_response(response)
+    if payload is None:
+        return False
+    # En modo JSON sólo se cachean respuestas que parsean: un JSON roto no debe repetirse
+    if (request.get('response_format') or {}).get('type') == 'json_object':
+        try:
+            json.loads(payload['content'])
+        except (TypeError, ValueError):
+            return False
+    try:
+        cache.put(key or cache.make_key(request), request.get('model'), payload)
+    except sqlite3.Error as e:
+        logging.warning(f"LLM cache: no se pudo guardar la respuesta: {e}")
+        return False
+    return True
+
+
+class _CachedCompletions:
+    def __init__(self, completions: Any, cache: LLMResponseCache):
+        self._completions = completions
+        self._cache = cache
+
+    async def create(self, **kwargs):
+        if kwargs.get('stream'):
+            return await self._completions.create(**kwargs)
+
+        key = self._cache.make_key(kwargs)
+        payload = self._cache.get(key)
+        if payload is not None:
+            return _response_from_payload(payload)
+
+        response = await self._completions.create(**kwargs)
+        store_response(self._cache, kwargs, response, key)
+        return response
+
+
+class CachedOpenAIClient:
+    """
+    Envoltorio del cliente AsyncOpenAI: `chat.completions.create` pasa por la caché y
+    cualquier otro atributo se delega al cliente original.
+    """
+
+    def __init__(self, client: Any, cache: LLMResponseCache):
+        self._client = client
+        self.cache = cache
+        self.chat = SimpleNamespace(completions=_CachedCompletions(client.chat.completions, cache))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
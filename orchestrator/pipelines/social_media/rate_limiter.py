@@ -0,0 +1,250 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from analysis_modules.tokens import count_tokens
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+# Valores por defecto (config: rate_limits.*)
+DEFAULT_REQUESTS_PER_MINUTE = 500
+DEFAULT_TOKENS_PER_MINUTE = 200000
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_MAX_BACKOFF_SECONDS = 60.0
+# Estimación de tokens de salida cuando la petición no fija max_tokens (se corrige con `usage`)
+DEFAULT_COMPLETION_TOKENS = 1000
+
+# AIMD: ante un 429 la tasa efectiva se reduce a la mitad; cada respuesta correcta la
+# recupera poco a poco hasta el límite configurado.
+DECREASE_FACTOR = 0.5
+INCREASE_STEP = 0.05
+MIN_RATE_FACTOR = 0.1
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class TokenBucket:
+    """Cubo de capacidad `per_minute` que se rellena de forma continua."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = float(per_minute) / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self, factor: float):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate * factor)
+        self.updated = now
+
+    def wait_time(self, amount: float, factor: float) -> float:
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / (self.rate * factor)
+
+    def consume(self, amount: float):
+        # Puede quedar en negativo al corregir con el uso real: la deuda se paga con el relleno
+        self.tokens -= amount
+
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        return None
+    return None
+
+
+def _is_retryable(error: Exception) -> bool:
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if openai is not None and isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(error, (asyncio.TimeoutError, ConnectionError))
+
+
+class AdaptiveRateLimiter:
+    """
+    Limitador compartido por todo el proceso para el tráfico hacia OpenAI.
+
+    Presupuesta peticiones y tokens por minuto (RPM/TPM) con dos token buckets, respeta
+    Retry-After, reintenta errores transitorios con backoff exponencial y jitter, y adapta
+    la tasa (AIMD) cuando el proveedor responde 429.
+    """
+
+    def __init__(self, requests_per_minute: float = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = DEFAULT_TOKENS_PER_MINUTE,
+                 max_retries: int = DEFAULT_MAX_RETRIES,
+                 max_backoff_seconds: float = DEFAULT_MAX_BACKOFF_SECONDS):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.max_backoff_seconds = max_backoff_seconds
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self.rate_factor = 1.0
+        self._paused_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop = None
+        self._window: deque = deque()
+
+        self.requests = 0
+        self.tokens = 0
+        self.throttled = 0
+        self.retries = 0
+        self.failures = 0
+        self.wait_seconds = 0.0
+
+    def _get_lock(self) -> asyncio.Lock:
+        # El limitador vive todo el proceso pero cada asyncio.run() crea un loop nuevo
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    async def acquire(self, estimated_tokens: int):
+        """Espera hasta que haya presupuesto para una petición de `estimated_tokens` tokens."""
+        async with self._get_lock():
+            while True:
+                self._requests.refill(self.rate_factor)
+                self._tokens.refill(self.rate_factor)
+                wait = max(
+                    self._paused_until - time.monotonic(),
+                    self._requests.wait_time(1, self.rate_factor),
+                    self._tokens.wait_time(estimated_tokens, self.rate_factor),
+                )
+                if wait <= 0:
+                    self._requests.consume(1)
+                    self._tokens.consume(estimated_tokens)
+                    return
+                self.wait_seconds += wait
+                await asyncio.sleep(wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Corrige el presupuesto con los tokens reales de la respuesta."""
+        used = actual_tokens if actual_tokens is not None else estimated_tokens
+        if actual_tokens is not None:
+            self._tokens.consume(actual_tokens - estimated_tokens)
+        now = time.monotonic()
+        self._window.append((now, used))
+        self.requests += 1
+        self.tokens += used
+        self.rate_factor = min(1.0, self.rate_factor + INCREASE_STEP)
+
+    def _on_throttled(self, retry_after: Optional[float]):
+        self.throttled += 1
+        self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor * DECREASE_FACTOR)
+        if retry_after:
+            # Pausa global: ninguna petición sale antes de que venza el Retry-After
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return min(self.max_backoff_seconds, retry_after) + random.uniform(0, 1)
+        # Full jitter sobre backoff exponencial
+        return random.uniform(0, min(self.max_backoff_seconds, 2 ** attempt))
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], estimated_tokens: int) -> Any:
+        """Ejecuta `fn` dentro del presupuesto, reintentando errores transitorios."""
+        attempt = 0
+        while True:
+            await self.acquire(estimated_tokens)
+            try:
+                response = await fn()
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    self.failures += 1
+                    raise
+                retry_after = _retry_after_seconds(e)
+                if getattr(e, "status_code", None) == 429:
+                    self._on_throttled(retry_after)
+                attempt += 1
+                self.retries += 1
+                delay = self._backoff(attempt, retry_after)
+                logging.warning(f"Rate limiter: error transitorio ({e}); reintento {attempt}/{self.max_retries} en {delay:.1f}s")
+                self.wait_seconds += delay
+                await asyncio.sleep(delay)
+                continue
+            usage = getattr(response, "usage", None)
+            self.record_usage(estimated_tokens, getattr(usage, "total_tokens", None))
+            return response
+
+    def stats(self) -> Dict[str, Any]:
+        """Throughput del último minuto y contadores acumulados."""
+        now = time.monotonic()
+        while self._window and now - self._window[0][0] > 60:
+            self._window.popleft()
+        return {
+            "requests_per_minute_limit": self.requests_per_minute,
+            "tokens_per_minute_limit": self.tokens_per_minute,
+            "rate_factor": round(self.rate_factor, 3),
+            "current_requests_per_minute": len(self._window),
+            "current_tokens_per_minute": sum(tokens for _, tokens in self._window),
+            "requests": self.requests,
+            "tokens": self.tokens,
+            "throttled": self.throttled,
+            "retries": self.retries,
+            "failures": self.failures,
+            "wait_seconds": round(self.wait_seconds, 2),
+        }
+
+
+def estimate_request_tokens(kwargs: Dict[str, Any]) -> int:
+    """Tokens estimados de una chat completion: prompt + máximo de salida."""
+    prompt_tokens = 0
+    for message in kwargs.get("messages") or []:
+        content = message.get("content")
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        prompt_tokens += count_tokens(content)
+    completion = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS
+    return prompt_tokens + int(completion)
+
+
+class RateLimitedOpenAIClient:
+    """Envoltorio del cliente AsyncOpenAI: toda chat completion pasa por el limitador del proceso."""
+
+    def __init__(self, client: Any, limiter: AdaptiveRateLimiter):
+        self._client = client
+        self.limiter = limiter
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        return await self.limiter.call(lambda: self._client.chat.completions.create(**kwargs),
+                                       estimate_request_tokens(kwargs))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+
+_process_limiter: Optional[AdaptiveRateLimiter] = None
+
+
+def get_rate_limiter(config: Dict[str, Any]) -> AdaptiveRateLimiter:
+    """Limitador único del proceso (se crea con la primera configuración recibida)."""
+    global _process_limiter
+    if _process_limiter is None:
+        settings = config.get("rate_limits", {}) or {}
+        _process_limiter = AdaptiveRateLimiter(
+            requests_per_minute=float(settings.get("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE)),
+            tokens_per_minute=float(settings.get("tokens_per_minute", DEFAULT_TOKENS_PER_MINUTE)),
+            max_retries=int(settings.get("max_retries", DEFAULT_MAX_RETRIES)),
+            max_backoff_seconds=float(settings.get("max_backoff_seconds", DEFAULT_MAX_BACKOFF_SECONDS)),
+        )
+    return _process_limiter
@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Set
+
+# --- Dependencias reales entre módulos ---
+# Q9 y Q10 leen los outputs de los demás módulos desde el directorio de outputs
+# (Q10 además lee el de Q9). Q11, Q12 y Q13 leen q16_benchmark.json.
+# Las dependencias hacia módulos que no se ejecutan en la corrida se ignoran
+# (p. ej. Q16 está deshabilitado en modo single-client).
+ALL_OTHERS = "*"
+
+MODULE_DEPENDENCIES: Dict[str, Any] = {
+    "Q9": ALL_OTHERS,
+    "Q10": ALL_OTHERS,
+    "Q11": ["Q16"],
+    "Q12": ["Q16"],
+    "Q13": ["Q16"],
+}
+
+
+def resolve_dependencies(modules: Iterable[str], dependencies: Dict[str, Any] = None) -> Dict[str, Set[str]]:
+    """
+    Construye el grafo de dependencias restringido a los módulos de la corrida.
+    Un módulo marcado con ALL_OTHERS depende de todos los demás módulos que no
+    dependan a su vez de él (así Q10 espera a Q9 y Q9 no espera a Q10).
+    """
+    dependencies = MODULE_DEPENDENCIES if dependencies is None else dependencies
+    modules = list(modules)
+    selected = set(modules)
+
+    graph: Dict[str, Set[str]] = {}
+    for name in modules:
+        deps = dependencies.get(name, [])
+        if deps != ALL_OTHERS:
+            graph[name] = {d for d in deps if d in selected and d != name}
+
+    # Los módulos "agregadores" se resuelven en el orden de la corrida:
+    # cada uno depende de todo lo anterior que no sea agregador y de los agregadores previos.
+    aggregators = [name for name in modules if dependencies.get(name) == ALL_OTHERS]
+    for idx, name in enumerate(aggregators):
+        later = set(aggregators[idx + 1:])
+        graph[name] = {m for m in modules if m != name and m not in later}
+
+    _check_acyclic(graph)
+    return graph
+
+
+def _check_acyclic(graph: Dict[str, Set[str]]) -> List[str]:
+    """Devuelve un orden topológico o lanza ValueError si hay ciclos."""
+    indegree = {n: len(deps) for n, deps in graph.items()}
+    dependents: Dict[str, List[str]] = {n: [] for n in graph}
+    for n, deps in graph.items():
+        for d in deps:
+            dependents[d].append(n)
+
+    ready = [n for n, deg in indegree.items() if deg == 0]
+    order = []
+    while ready:
+        n = ready.pop(0)
+        order.append(n)
+        for m in dependents[n]:
+            indegree[m] -= 1
+            if indegree[m] == 0:
+                ready.append(m)
+
+    if len(order) != len(graph):
+        pending = sorted(n for n, deg in indegree.items() if deg > 0)
+        raise ValueError(f"Ciclo de dependencias entre módulos: {pending}")
+    return order
+
+
+def execution_order(modules: Iterable[str], dependencies: Dict[str, Any] = None) -> List[str]:
+    """Orden secuencial de los módulos que respeta sus dependencias."""
+    return _check_acyclic(resolve_dependencies(modules, dependencies))
+
+
+def critical_path(graph: Dict[str, Set[str]], durations: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Calcula la cadena de dependencias más lenta (camino crítico) con las duraciones medidas.
+    Esa cadena es la cota inferior del tiempo total de la corrida con concurrencia ilimitada.
+    """
+    order = _check_acyclic(graph)
+    finish: Dict[str, float] = {}
+    previous: Dict[str, Any] = {}
+    for n in order:
+        best_dep = max(graph[n], key=lambda d: finish[d], default=None)
+        start = finish[best_dep] if best_dep is not None else 0.0
+        finish[n] = start + durations.get(n, 0.0)
+        previous[n] = best_dep
+
+    if not finish:
+        return {"path": [], "duration_seconds": 0.0}
+
+    last = max(finish, key=finish.get)
+    path = []
+    node = last
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    path.reverse()
+    return {"path": path, "duration_seconds": finish[last]}
+
+
+async def run_dag(modules: Iterable[str], run_module: Callable[[str], Awaitable[Any]],
+                  max_concurrency: int = 4, dependencies: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Ejecuta `run_module(nombre)` para cada módulo respetando sus dependencias y con
+    un máximo de `max_concurrency` módulos simultáneos.
+
+    Un fallo en un módulo no cancela a sus dependientes: estos se ejecutan igual
+    (los módulos ya toleran outputs faltantes) y el fallo queda registrado.
+    Devuelve duraciones, errores, suma secuencial y camino crítico de la corrida.
+    """
+    modules = list(modules)
+    graph = resolve_dependencies(modules, dependencies)
+    max_concurrency = max(1, int(max_concurrency or 1))
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    tasks: Dict[str, asyncio.Task] = {}
+    durations: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+
+    async def _run(name: str):
+        deps = [tasks[d] for d in graph[name]]
+        if deps:
+            await asyncio.gather(*deps, return_exceptions=True)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await run_module(name)
+            except Exception as e:
+                errors[name] = str(e)
+                logging.error(f"Scheduler: el módulo {name} terminó con error: {e}")
+            finally:
+                durations[name] = time.perf_counter() - start
+
+    run_start = time.perf_counter()
+    # Crear las tareas en orden topológico para que las dependencias ya existan
+    for name in _check_acyclic(graph):
+        tasks[name] = asyncio.ensure_future(_run(name))
+    await asyncio.gather(*tasks.values())
+    wall = time.perf_counter() - run_start
+
+    report = {
+        "max_concurrency": max_concurrency,
+        "durations_seconds": durations,
+        "errors": errors,
+        "wall_seconds": wall,
+        "sequential_seconds": sum(durations.values()),
+        "critical_path": critical_path(graph, durations),
+    }
+    return report
@@ -0,0 +1,340 @@
+"""
+Servidor local compatible con el endpoint de chat completions de OpenAI (modo JSON).
+
+Devuelve payloads falsos pero válidos según el esquema de cada módulo Q, con latencia,
+errores 429/500 y uso de tokens configurables, para medir scheduler, rate limiter y caché
+sin red ni costo. El orquestador lo usa con `openai_base_url` en config.json, p. ej.:
+
+    python stand_in_server.py --port 8765 --latency-ms 300 --rate-429 0.05
+    # config.json: "openai_base_url": "http://127.0.0.1:8765/v1"
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from analysis_modules.tokens import count_tokens
+
+EMOTIONS = ["alegria", "tristeza", "miedo", "ira", "sorpresa", "disgusto", "anticipacion", "confianza"]
+AAKER_TRAITS = ["sinceridad", "emocion", "competencia", "sofisticacion", "robustez"]
+TOPICS = ["precio", "calidad", "envíos", "atención al cliente", "diseño", "sostenibilidad", "lanzamientos", "promociones"]
+SENTIMENTS = ["positivo", "negativo", "neutral", "mixto"]
+FRAMES = ["El Viaje del Héroe", "Nosotros vs. Ellos", "Innovación Disruptiva", "Comunidad y Pertenencia", "Superación Personal"]
+AREAS = ["Contenido", "Tono", "Campañas", "Engagement", "Formatos"]
+WEEKDAYS = ["lunes", "martes", "miércoles", "jueves", "viernes", "sábado", "domingo"]
+
+
+def _distribution(rng: random.Random, keys: List[str], total: float) -> Dict[str, float]:
+    weights = [rng.random() + 0.05 for _ in keys]
+    scale = total / sum(weights)
+    values = [round(w * scale, 2) for w in weights]
+    values[-1] = round(total - sum(values[:-1]), 2)
+    return dict(zip(keys, values))
+
+
+def _emotions(rng):
+    return {"emociones": {e: round(rng.random(), 2) for e in EMOTIONS},
+            "resumen_emocional": "La audiencia muestra una reacción mayoritariamente positiva con matices de expectativa."}
+
+
+def _traits(rng):
+    return {"rasgos_distribuidos": _distribution(rng, AAKER_TRAITS, 100.0),
+            "intensidad_promedio": round(rng.uniform(20, 90), 1)}
+
+
+def _topics(rng):
+    relevance = _distribution(rng, ["a", "b", "c"], 1.0)
+    return {"topicos_principales": [
+        {"topico": topic, "sentimiento": rng.choice(SENTIMENTS), "porcentaje_relevancia": score}
+        for topic, score in zip(rng.sample(TOPICS, 3), relevance.values())
+    ]}
+
+
+def _sentiment(rng):
+    return {"distribucion": _distribution(rng, ["positivo", "negativo", "neutro", "mixto"], 1.0),
+            "subjetividad_promedio": round(rng.random(), 2),
+            "ejemplo_mixto": {"texto": "Me gusta el diseño, pero el precio es muy alto.", "username": f"usuario_{rng.randint(1, 999)}"}}
+
+
+def _fused(rng):
+    payload = {}
+    payload.update(_emotions(rng))
+    payload.update(_traits(rng))
+    payload.update(_topics(rng))
+    payload["sentimiento"] = _sentiment(rng)
+    return payload
+
+
+def _frames(rng):
+    return {"marcos_narrativos": [
+        {"marco": frame, "descripcion": "Marco recurrente en las publicaciones de la marca.",
+         "ejemplos": ["Ejemplo de caption que ilustra el marco."]}
+        for frame in rng.sample(FRAMES, 3)
+    ], "resumen_marcos": "La marca combina narrativas de comunidad con mensajes de innovación."}
+
+
+def _influencers(rng):
+    top = [{"username": f"usuario_{i}", "score_centralidad": round(rng.random(), 2),
+            "polaridad_dominante": rng.choice(["Promotor", "Detractor"]),
+            "comentario_evidencia": "Comentario representativo del usuario."} for i in range(1, 11)]
+    promotores = sum(1 for t in top if t["polaridad_dominante"] == "Promotor")
+    return {"top_influenciadores_detallado": top,
+            "resumen_polaridad": {"Promotor": promotores, "Detractor": len(top) - promotores}}
+
+
+def _opportunities(rng):
+    items = [{"tema": topic.capitalize(), "gap_score": rng.randint(10, 95),
+              "actividad_competitiva": rng.choice(["Baja", "Media", "Alta"]),
+              "justificacion": "Alta demanda en comentarios y poca cobertura en el contenido actual.",
+              "recomendacion_accion": "Crear una serie de contenidos dedicada a este tema."}
+             for topic in rng.sample(TOPICS, 5)]
+    distribution = {level: sum(1 for i in items if i["actividad_competitiva"] == level) for level in ["Baja", "Media", "Alta"]}
+    return {"lista_oportunidades": items, "metadata": {
+        "fecha_analisis": time.strftime("%Y-%m-%d"), "total_oportunidades": len(items),
+        "promedio_gap": sum(i["gap_score"] for i in items) / len(items), "distribucion_actividad": distribution}}
+
+
+def _temporal(rng):
+    return {"resumen": f"La actividad de la marca se concentra los {rng.choice(WEEKDAYS)} por la tarde.",
+            "hallazgos": ["Las horas pico coinciden con el mayor engagement.",
+                          f"La tendencia diaria es {rng.choice(['creciente', 'estable', 'decreciente'])}."],
+            "recomendaciones": ["Programar las publicaciones clave dentro de las ventanas pico."]}
+
+
+def _recommendations(rng):
+    items = [{"area_estrategica": rng.choice(AREAS), "recomendacion": "Aumentar la frecuencia de Reels en horario pico.",
+              "score_impacto": rng.randint(40, 95), "justificacion_framework": rng.sample(["Q1", "Q4", "Q6", "Q11", "Q14"], 2),
+              "evidencia": "Basado en los insights de engagement y formatos."} for _ in range(rng.randint(5, 8))]
+    return {"lista_recomendaciones": items, "metadata": {
+        "fecha_analisis": time.strftime("%Y-%m-%d"), "total_recomendaciones": len(items),
+        "promedio_score": sum(i["score_impacto"] for i in items) / len(items)}}
+
+
+def _executive_summary(rng):
+    return {"resumen": ["El engagement se mantiene estable.", "Los Reels lideran el rendimiento."],
+            "prioridades": [{"acción": "Reforzar Reels", "impacto_score": rng.randint(50, 95),
+                             "frameworks_relevantes": ["Q11", "Q14"]} for _ in range(3)]}
+
+
+# (marcador en el prompt, módulo, generador). Se evalúan en orden y gana el primero que
+# coincide: Q10, Q9 y Q6 van antes porque sus prompts incluyen los outputs de otros módulos.
+PAYLOADS: List[Tuple[str, str, Callable[[random.Random], Dict[str, Any]]]] = [
+    ("Director de Estrategia de Marketing para ejecutivos", "Q10", _executive_summary),
+    ("síntesis de insights", "Q9", _recommendations),
+    ("lista_oportunidades", "Q6", _opportunities),
+    ("top_influenciadores_detallado", "Q5", _influencers),
+    ("patrones temporales ya calculados", "Q8", _temporal),
+    ("marcos_narrativos", "Q4", _frames),
+    ("cuatro anotaciones", "fused", _fused),
+    ("subjetividad_promedio", "Q7", _sentiment),
+    ("topicos_principales", "Q3", _topics),
+    ("rasgos_distribuidos", "Q2", _traits),
+    ("resumen_emocional", "Q1", _emotions),
+]
+
+
+class StandInSettings:
+    """Parámetros de comportamiento del servidor (latencia, errores, uso de tokens)."""
+
+    def __init__(self, latency_ms: float = 200.0, latency_sigma: float = 0.5, ms_per_output_token: float = 0.0,
+                 rate_429: float = 0.0, rate_500: float = 0.0, retry_after_seconds: float = 1.0,
+                 completion_tokens: Optional[int] = None, seed: int = 0):
+        self.latency_ms = latency_ms                    # mediana de la latencia (log-normal)
+        self.latency_sigma = latency_sigma              # 0 = latencia fija
+        self.ms_per_output_token = ms_per_output_token
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.retry_after_seconds = retry_after_seconds
+        self.completion_tokens = completion_tokens      # None = según el tamaño del payload
+        self.seed = seed
+
+
+class StandInState:
+    def __init__(self, settings: StandInSettings):
+        self.settings = settings
+        self.lock = threading.Lock()
+        self.rng = random.Random(settings.seed)
+        self.requests = 0
+        self.by_module: Dict[str, int] = {}
+        self.errors_429 = 0
+        self.errors_500 = 0
+
+    def roll(self) -> float:
+        with self.lock:
+            return self.rng.random()
+
+    def latency_seconds(self) -> float:
+        s = self.settings
+        with self.lock:
+            factor = math.exp(self.rng.gauss(0, s.latency_sigma)) if s.latency_sigma > 0 else 1.0
+        return max(0.0, s.latency_ms * factor) / 1000.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {"requests": self.requests, "by_module": dict(self.by_module),
+                    "errors_429": self.errors_429, "errors_500": self.errors_500}
+
+
+def build_completion(body: Dict[str, Any], settings: StandInSettings) -> Tuple[str, Dict[str, Any]]:
+    """Chat completion falsa para la petición: (módulo detectado, body de la respuesta)."""
+    messages = body.get("messages") or []
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    module, generator = "unknown", None
+    for marker, name, gen in PAYLOADS:
+        if marker in prompt:
+            module, generator = name, gen
+            break
+
+    # Determinista por prompt: la misma petición recibe el mismo payload (útil para la caché)
+    digest = hashlib.sha256(f"{settings.seed}:{prompt}".encode("utf-8")).hexdigest()
+    rng = random.Random(int(digest[:16], 16))
+    content = json.dumps(generator(rng) if generator else {}, ensure_ascii=False)
+
+    prompt_tokens = count_tokens(prompt)
+    completion_tokens = settings.completion_tokens if settings.completion_tokens is not None else count_tokens(content)
+    return module, {
+        "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "gpt-4o"),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+class StandInOpenAIClient:
+    """
+    Variante en proceso (sin HTTP) con la misma interfaz que AsyncOpenAI para chat completions.
+    Útil en benchmarks donde el costo de la red y del servidor no debe medirse.
+    """
+
+    def __init__(self, settings: Optional[StandInSettings] = None):
+        self.settings = settings or StandInSettings(latency_ms=0.0, latency_sigma=0.0)
+        self.state = StandInState(self.settings)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        module, completion = build_completion(kwargs, self.settings)
+        with self.state.lock:
+            self.state.requests += 1
+            self.state.by_module[module] = self.state.by_module.get(module, 0) + 1
+        delay = self.state.latency_seconds()
+        if delay:
+            await asyncio.sleep(delay)
+        return json.loads(json.dumps(completion), object_hook=lambda d: SimpleNamespace(**d))
+
+
+def _make_handler(state: StandInState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/stats"):
+                self._send(200, state.stats())
+            else:
+                self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._send(400, {"error": {"message": "Invalid JSON body", "type": "invalid_request_error"}})
+                return
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                return
+
+            settings = state.settings
+            module, completion = build_completion(body, settings)
+            roll = state.roll()
+            with state.lock:
+                state.requests += 1
+                state.by_module[module] = state.by_module.get(module, 0) + 1
+
+            if roll < settings.rate_429:
+                with state.lock:
+                    state.errors_429 += 1
+                self._send(429, {"error": {"message": "Rate limit reached (stand-in)", "type": "rate_limit_exceeded",
+                                           "code": "rate_limit_exceeded"}},
+                           {"Retry-After": f"{settings.retry_after_seconds:g}"})
+                return
+
+            delay = state.latency_seconds()
+            delay += completion["usage"]["completion_tokens"] * settings.ms_per_output_token / 1000.0
+            time.sleep(delay)
+
+            if roll < settings.rate_429 + settings.rate_500:
+                with state.lock:
+                    state.errors_500 += 1
+                self._send(500, {"error": {"message": "Internal server error (stand-in)", "type": "server_error"}})
+                return
+            self._send(200, completion)
+
+    return Handler
+
+
+def start_stand_in_server(host: str = "127.0.0.1", port: int = 0,
+                          settings: Optional[StandInSettings] = None) -> Tuple[ThreadingHTTPServer, str]:
+    """Arranca el servidor en un hilo en segundo plano. Devuelve (servidor, base_url con /v1)."""
+    state = StandInState(settings or StandInSettings())
+    server = ThreadingHTTPServer((host, port), _make_handler(state))
+    server.daemon_threads = True
+    server.state = state
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local compatible con OpenAI chat completions para pruebas de carga.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Mediana de la latencia por petición.")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Dispersión log-normal de la latencia (0 = fija).")
+    parser.add_argument("--ms-per-output-token", type=float, default=0.0, help="Latencia adicional por token de salida.")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fracción de peticiones que responden 429.")
+    parser.add_argument("--rate-500", type=float, default=0.0, help="Fracción de peticiones que responden 500.")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Valor del header Retry-After en los 429.")
+    parser.add_argument("--completion-tokens", type=int, default=None, help="Tokens de salida fijos a reportar en usage.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    settings = StandInSettings(
+        latency_ms=args.latency_ms, latency_sigma=args.latency_sigma, ms_per_output_token=args.ms_per_output_token,
+        rate_429=args.rate_429, rate_500=args.rate_500, retry_after_seconds=args.retry_after,
+        completion_tokens=args.completion_tokens, seed=args.seed,
+    )
+    server, base_url = start_stand_in_server(args.host, args.port, settings)
+    print(f"Stand-in OpenAI escuchando en {base_url} (estadísticas en {base_url}/stats)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
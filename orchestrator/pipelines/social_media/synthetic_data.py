@@ -0,0 +1,350 @@
+"""
+Generador local de datos sintéticos con el formato de outputs/ingested_data.json.
+
+A diferencia de populate_data.py (pocas filas, a Google Sheets), genera cuentas del tamaño
+de producción (de 1k a 1M publicaciones y hasta 10M comentarios) de forma reproducible
+(--seed) y escribiendo en streaming, sin tener todo el dataset en memoria:
+
+    python synthetic_data.py --posts 100000 --comments 2000000 --output /tmp/ingested_data.json
+    python synthetic_data.py --posts 100000 --comments 2000000 --format ndjson-gzip --output /tmp/pixely
+
+Las publicaciones se generan por bloques con un RNG derivado de (seed, bloque): la segunda
+pasada (comentarios) regenera cada bloque de publicaciones en lugar de guardarlo.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from analysis_modules import ndjson
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CHUNK_SIZE = 10000
+
+NETWORKS = ["Instagram", "TikTok", "Otra"]
+NETWORK_WEIGHTS = [0.6, 0.3, 0.1]
+CONTENT_TYPES = {
+    "Instagram": (["Imagen", "Carrusel", "Reel", "Video"], [0.25, 0.3, 0.35, 0.1]),
+    "TikTok": (["Video"], [1.0]),
+    "Otra": (["Imagen", "Video"], [0.6, 0.4]),
+}
+_CONTENT_TYPE_CDF = {network: np.cumsum(weights) for network, (_, weights) in CONTENT_TYPES.items()}
+URL_PREFIX = {"Instagram": "https://www.instagram.com/p/", "TikTok": "https://www.tiktok.com/video/", "Otra": "https://x.com/status/"}
+
+# Multiplicadores de actividad por hora y día de la semana (lunes=0): más actividad por la tarde
+HOUR_WEIGHTS = np.array([1, 0.6, 0.4, 0.3, 0.3, 0.4, 0.8, 1.2, 1.6, 1.8, 1.9, 2.0,
+                         2.3, 2.2, 1.9, 1.8, 1.9, 2.2, 2.6, 3.0, 3.2, 2.9, 2.2, 1.5])
+WEEKDAY_WEIGHTS = np.array([1.0, 1.05, 1.1, 1.1, 1.2, 0.9, 0.8])
+
+COMPETITOR_NAMES = ["Adidas", "Puma", "Reebok", "Under Armour", "New Balance", "Asics", "Fila", "Converse", "Vans", "Skechers"]
+
+HASHTAGS = ["#marketing", "#brand", "#tips", "#social", "#IA", "#analítica", "#innovación", "#estilo", "#running",
+            "#deporte", "#moda", "#sostenibilidad", "#lanzamiento", "#promo", "#comunidad", "#fitness", "#tech",
+            "#NewDrop", "#justdoit", "#TBT", "#Tendencias", "#Diseño", "#ofertas", "#behindthescenes"]
+EMOJIS = ["🔥", "💯", "😍", "🙌", "👏", "😂", "🤔", "😡", "❤️", "✨", "👀", "😢"]
+
+# (texto, idioma) por polaridad: mezclas de español e inglés como en las cuentas reales
+COMMENT_PHRASES = {
+    "positivo": [
+        "Excelente contenido, muy útil para mi equipo.", "Me encanta esta colección!", "Gran explicación, gracias por compartir.",
+        "Qué buena calidad, como siempre.", "Los mejores, sin duda.", "Love the new collection!", "Best shoes ever.",
+        "This is exactly what I needed.", "Amazing design, instant cop!", "So hyped for this release.",
+    ],
+    "negativo": [
+        "El envío tardó casi un mes, muy mal servicio.", "Demasiado caro para lo que ofrecen.", "Mi pedido llegó dañado.",
+        "Nadie responde en atención al cliente.", "La calidad ha bajado mucho.", "Worst customer service ever.",
+        "Way too expensive.", "Mine broke after two weeks.", "Still waiting for my refund.",
+    ],
+    "neutral": [
+        "¿Cuándo sale el próximo lanzamiento?", "¿Tienen tallas grandes?", "¿Hacen envíos a Chile?", "¿Cuál es el precio?",
+        "When is the next drop?", "Is this available in Europe?", "What size should I get?", "Link please",
+    ],
+    "mixto": [
+        "Me gusta el diseño, pero el precio es muy alto.", "Buen producto, aunque el envío fue lento.",
+        "Love the colorway but the sizing is off.", "Great quality, terrible delivery times.",
+    ],
+}
+POLARITY_WEIGHTS = [0.5, 0.15, 0.25, 0.1]
+
+CAPTION_WORDS = ("nuevo lanzamiento colección descubre estilo comunidad gracias equipo hoy mañana semana "
+                 "oferta edición limitada innovación diseño rendimiento energía ciudad historia "
+                 "new drop available now limited edition behind the scenes community style").split()
+
+
+def _chunk_rng(seed: int, stream: int, chunk: int) -> np.random.Generator:
+    # stream 0: publicaciones, stream 1: comentarios. Mismo (seed, bloque) -> mismos datos.
+    return np.random.default_rng([seed, stream, chunk])
+
+
+def _handle(name: str) -> str:
+    return "".join(ch for ch in name.lower() if ch.isalnum() or ch == "_")
+
+
+class SyntheticAccount:
+    """Parámetros de la cuenta a generar y generadores de sus registros."""
+
+    def __init__(self, posts: int = 1000, comments: int = 20000, competitor_share: float = 0.3,
+                 competitors: int = 4, days: int = 365, end_date: Optional[datetime] = None,
+                 client_name: str = "PixelyBrand", client_id: int = 1, seed: int = 42):
+        self.posts = posts
+        self.comments = comments
+        self.competitor_share = competitor_share
+        self.competitors = COMPETITOR_NAMES[:max(0, min(competitors, len(COMPETITOR_NAMES)))]
+        self.days = days
+        self.end_date = end_date or datetime(2025, 9, 30)
+        self.client_name = client_name
+        self.client_id = client_id
+        self.seed = seed
+        self.client_handle = _handle(client_name)
+        # Pool de usuarios que comentan (los recurrentes están al principio del pool)
+        self.commenter_pool = max(100, comments // 20)
+
+        slot_weights = np.outer(WEEKDAY_WEIGHTS, HOUR_WEIGHTS).ravel()
+        self._slot_probs = slot_weights / slot_weights.sum()
+
+    def client_ficha(self) -> Dict[str, Any]:
+        rng = _chunk_rng(self.seed, 2, 0)
+        landscape = [{
+            "name": name,
+            "instagram": f"https://www.instagram.com/{_handle(name)}/",
+            "instagram_username": _handle(name),
+            "instagram_followers": int(rng.integers(200_000, 50_000_000)),
+            "tiktok_followers": int(rng.integers(50_000, 10_000_000)),
+        } for name in self.competitors]
+        return {
+            "client_id": self.client_id,
+            "client_name": self.client_name,
+            "primary_business_goal": "Aumentar Engagement",
+            "brand_archetype": "El Sabio",
+            "tone_of_voice": "Educativo",
+            "content_pillars": "Marketing Digital, IA, Analítica",
+            "seguidores_instagram": int(rng.integers(100_000, 2_000_000)),
+            "seguidores_tiktok": int(rng.integers(50_000, 800_000)),
+            "seguidores_otra_red_x": int(rng.integers(10_000, 200_000)),
+            "competitor_landscape": landscape,
+        }
+
+    def _post_chunk(self, chunk: int) -> List[Dict[str, Any]]:
+        start = chunk * CHUNK_SIZE
+        n = min(CHUNK_SIZE, self.posts - start)
+        rng = _chunk_rng(self.seed, 0, chunk)
+
+        networks = rng.choice(len(NETWORKS), size=n, p=NETWORK_WEIGHTS)
+        competitor = rng.random(n) < (self.competitor_share if self.competitors else 0.0)
+        competitor_idx = rng.integers(0, max(1, len(self.competitors)), size=n)
+        # Día dentro de la ventana y franja (día de semana, hora) según la estacionalidad
+        days_back = rng.integers(0, self.days, size=n)
+        minutes = rng.integers(0, 60, size=n)
+        slots = rng.choice(len(self._slot_probs), size=n, p=self._slot_probs)
+        views = np.round(rng.lognormal(9.0, 1.2, size=n)).astype(int)
+        like_rate = rng.beta(2, 30, size=n)
+        likes = np.round(views * like_rate * rng.uniform(0.5, 3.0, size=n)).astype(int)
+        # Comentarios extraídos por post: cola pesada con media comments/posts
+        mean_comments = self.comments / max(1, self.posts)
+        sigma = 1.0
+        scraped = np.round(rng.lognormal(np.log(max(mean_comments, 1e-9)) - sigma ** 2 / 2, sigma, size=n)).astype(int)
+        comments_count = scraped + rng.poisson(scraped * 0.3 + 1)
+        sponsored = rng.random(n) < 0.08
+        type_pick = rng.random(n)
+        caption_lengths = rng.integers(6, 30, size=n)
+        hashtag_counts = rng.integers(0, 6, size=n)
+        # Palabras, hashtags y ids del bloque en arrays planos (una sola llamada al RNG por campo)
+        words = rng.integers(0, len(CAPTION_WORDS), size=int(caption_lengths.sum())).tolist()
+        word_ends = np.cumsum(caption_lengths).tolist()
+        tags = rng.integers(0, len(HASHTAGS), size=int(hashtag_counts.sum())).tolist()
+        tag_ends = np.cumsum(hashtag_counts).tolist()
+        caption_emojis = rng.integers(0, len(EMOJIS), size=n)
+        url_ids = rng.bytes(16 * n)
+
+        posts = []
+        for i in range(n):
+            network = NETWORKS[networks[i]]
+            types, _ = CONTENT_TYPES[network]
+            content_type = types[min(int(np.searchsorted(_CONTENT_TYPE_CDF[network], type_pick[i])), len(types) - 1)]
+            weekday, hour = divmod(int(slots[i]), 24)
+            day = self.end_date - timedelta(days=int(days_back[i]))
+            day -= timedelta(days=(day.weekday() - weekday) % 7)
+            timestamp = day.replace(hour=hour, minute=int(minutes[i]), second=0)
+            owner = _handle(self.competitors[competitor_idx[i]]) if competitor[i] else self.client_handle
+            word_start = word_ends[i - 1] if i else 0
+            caption = " ".join(CAPTION_WORDS[w] for w in words[word_start:word_ends[i]]).capitalize()
+            caption += ". " + EMOJIS[caption_emojis[i]]
+            tag_start = tag_ends[i - 1] if i else 0
+            if tag_ends[i] > tag_start:
+                caption += " " + " ".join(HASHTAGS[t] for t in tags[tag_start:tag_ends[i]])
+            post_id = uuid.UUID(bytes=url_ids[16 * i:16 * (i + 1)], version=4)
+            posts.append({
+                "client_id": self.client_id,
+                "post_url": f"{URL_PREFIX[network]}{post_id}/",
+                "ownerUsername": owner,
+                "social_network": network,
+                "timestamp": timestamp.isoformat(),
+                "content_type": content_type,
+                "caption": caption,
+                "likesCount": int(likes[i]),
+                "commentsCount": int(comments_count[i]),
+                "viewsCount": int(views[i]),
+                "is_sponsored": bool(sponsored[i]),
+                "is_competitor": bool(competitor[i]),
+                "_scraped_comments": int(scraped[i]),
+            })
+        return posts
+
+    @property
+    def n_chunks(self) -> int:
+        return (self.posts + CHUNK_SIZE - 1) // CHUNK_SIZE
+
+    def iter_posts(self) -> Iterator[Dict[str, Any]]:
+        for chunk in range(self.n_chunks):
+            for post in self._post_chunk(chunk):
+                post.pop("_scraped_comments")
+                yield post
+
+    def iter_comments(self) -> Iterator[Dict[str, Any]]:
+        polarities = list(COMMENT_PHRASES)
+        competitor_handles = [_handle(name) for name in self.competitors]
+        for chunk in range(self.n_chunks):
+            posts = self._post_chunk(chunk)
+            rng = _chunk_rng(self.seed, 1, chunk)
+            total = sum(p["_scraped_comments"] for p in posts)
+            if not total:
+                continue
+            polarity = rng.choice(len(polarities), size=total, p=POLARITY_WEIGHTS)
+            phrase_pick = rng.random(total)
+            # ~30% de los comentarios vienen de un núcleo de usuarios recurrentes (1% del pool)
+            heavy = rng.random(total) < 0.3
+            users = np.where(heavy, rng.integers(0, max(10, self.commenter_pool // 100), size=total),
+                             rng.integers(0, self.commenter_pool, size=total))
+            extra = rng.random(total)
+            delays = np.round(rng.exponential(6 * 3600, size=total)).astype("timedelta64[s]")
+            emoji_idx = rng.integers(0, len(EMOJIS), size=total)
+            hashtag_idx = rng.integers(0, len(HASHTAGS), size=total)
+            posted_at = np.array([p["timestamp"] for p in posts], dtype="datetime64[s]")
+            counts = [p["_scraped_comments"] for p in posts]
+            timestamps = np.datetime_as_string(np.repeat(posted_at, counts) + delays, unit="s").tolist()
+            # Listas de Python: indexar arrays de numpy elemento a elemento es mucho más lento
+            polarity, phrase_pick, users, extra = polarity.tolist(), phrase_pick.tolist(), users.tolist(), extra.tolist()
+            emoji_idx, hashtag_idx = emoji_idx.tolist(), hashtag_idx.tolist()
+
+            k = 0
+            for post, count in zip(posts, counts):
+                for _ in range(count):
+                    phrases = COMMENT_PHRASES[polarities[polarity[k]]]
+                    text = phrases[int(phrase_pick[k] * len(phrases))]
+                    if extra[k] < 0.2:
+                        text += " " + EMOJIS[emoji_idx[k]]
+                    elif extra[k] < 0.27:
+                        text += " " + HASHTAGS[hashtag_idx[k]]
+                    if extra[k] > 0.98 and competitor_handles:
+                        # Respuestas de las propias marcas en los comentarios
+                        username = self.client_handle if extra[k] > 0.99 else competitor_handles[k % len(competitor_handles)]
+                    else:
+                        username = f"user_{users[k]:07d}"
+                    yield {
+                        "post_url": post["post_url"],
+                        "comment_text": text,
+                        "ownerUsername": username,
+                        "timestamp": timestamps[k],
+                    }
+                    k += 1
+
+
+_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def _write_json_array(f, items: Iterator[Dict[str, Any]]) -> int:
+    count = 0
+    for item in items:
+        f.write(",\n" if count else "\n")
+        f.write(_encoder.encode(item))
+        count += 1
+    return count
+
+
+def write_ingested_json(account: SyntheticAccount, path: str) -> Dict[str, int]:
+    """Escribe el dataset como ingested_data.json (mismo esquema que run_pipelines.py) en streaming."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write('{"client_ficha": ')
+        f.write(json.dumps(account.client_ficha(), ensure_ascii=False))
+        f.write(', "posts": [')
+        n_posts = _write_json_array(f, account.iter_posts())
+        f.write('\n], "comments": [')
+        n_comments = _write_json_array(f, account.iter_comments())
+        f.write("\n]}\n")
+    os.replace(tmp_path, path)
+    return {"posts": n_posts, "comments": n_comments}
+
+
+def write_ingested_ndjson(account: SyntheticAccount, path: str, compress: bool = False,
+                          columnar: bool = False) -> Dict[str, int]:
+    """
+    Escribe el dataset con el formato de ingesta NDJSON (cabecera + posts + comentarios) en el
+    directorio `path`; con `columnar`, también la copia Parquet.
+    """
+    os.makedirs(path, exist_ok=True)
+    return ndjson.write_ingested_ndjson(path, account.client_ficha(), account.iter_posts(), account.iter_comments(),
+                                        compress=compress, columnar=columnar)
+
+
+WRITERS = {
+    "json": write_ingested_json,
+    "ndjson": write_ingested_ndjson,
+    "ndjson-gzip": lambda account, path: write_ingested_ndjson(account, path, compress=True),
+    "ndjson-parquet": lambda account, path: write_ingested_ndjson(account, path, compress=True, columnar=True),
+}
+
+
+def main():
+    outputs_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "outputs")
+    parser = argparse.ArgumentParser(description="Genera un ingested_data.json sintético y reproducible para pruebas de rendimiento.")
+    parser.add_argument("--posts", type=int, default=1000, help="Número de publicaciones (cliente + competidores).")
+    parser.add_argument("--comments", type=int, default=20000, help="Número aproximado de comentarios en total.")
+    parser.add_argument("--competitor-share", type=float, default=0.3, help="Fracción de publicaciones de competidores.")
+    parser.add_argument("--competitors", type=int, default=4, help=f"Número de competidores (máx. {len(COMPETITOR_NAMES)}).")
+    parser.add_argument("--days", type=int, default=365, help="Ventana temporal de las publicaciones, en días.")
+    parser.add_argument("--end-date", type=str, default="2025-09-30", help="Fecha de la publicación más reciente (YYYY-MM-DD).")
+    parser.add_argument("--client-name", type=str, default="PixelyBrand")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", choices=sorted(WRITERS), default="json")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Archivo de salida (json) o directorio (ndjson). Por defecto, orchestrator/outputs.")
+    parser.add_argument("--force", action="store_true", help="Sobrescribir el archivo de salida si ya existe.")
+    args = parser.parse_args()
+
+    if args.format == "json":
+        output = os.path.abspath(args.output or os.path.join(outputs_dir, "ingested_data.json"))
+        existing = output
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    else:
+        output = os.path.abspath(args.output or outputs_dir)
+        existing = os.path.join(output, ndjson.HEADER_FILENAME)
+    if os.path.exists(existing) and not args.force:
+        logging.error(f"{existing} ya existe; usa --force para sobrescribirlo.")
+        sys.exit(1)
+
+    account = SyntheticAccount(
+        posts=args.posts, comments=args.comments, competitor_share=args.competitor_share,
+        competitors=args.competitors, days=args.days, end_date=datetime.fromisoformat(args.end_date),
+        client_name=args.client_name, seed=args.seed,
+    )
+    started = datetime.now()
+    counts = WRITERS[args.format](account, output)
+    elapsed = (datetime.now() - started).total_seconds()
+    if os.path.isdir(output):
+        size = sum(os.path.getsize(os.path.join(output, name)) for name in os.listdir(output) if name.startswith("ingested_"))
+    else:
+        size = os.path.getsize(output)
+    logging.info(f"Dataset sintético escrito en {output}: {counts['posts']} publicaciones, "
+                 f"{counts['comments']} comentarios ({elapsed:.1f}s, {size / 1e6:.1f} MB).")
+
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,8 @@ def load_config(config_path):
     with open(config_path, 'r') as f:
         return json.load(f)
 
-def run_ingestion_pipeline(module_to_run="all"): # Add module_to_run parameter
+def run_ingestion_pipeline(module_to_run="all", use_llm_cache=True, full_refresh=False, batch=False, openai_base_url=None,
+                           profile=False, cprofile=False): # Add module_to_run parameter
     """
     Main entry point: loads config, fetches data from Google Sheets, and saves it locally.
     """
@@ -30,6 +31,18 @@ def run_ingestion_pipeline(module_to_run="all"): # Add module_to_run parameter
 
     try:
         config = load_config(config_path)
+        if not use_llm_cache:
+            config.setdefault("llm_cache", {})["enabled"] = False
+        if full_refresh:
+            config["incremental_analysis"] = False
+        if batch:
+            config["llm_execution_mode"] = "batch"
+        if openai_base_url:
+            config["openai_base_url"] = openai_base_url
+        if profile or cprofile:
+            profiling = config.setdefault("profiling", {})
+            profiling["enabled"] = True
+            profiling["cprofile"] = bool(cprofile or profiling.get("cprofile"))
         
         # Add the social media pipeline directory to the Python path
         pipeline_dir = os.path.join(base_dir, 'pipelines', 'social_media')
@@ -37,6 +50,7 @@ def run_ingestion_pipeline(module_to_run="all"): # Add module_to_run parameter
             sys.path.append(pipeline_dir)
         
         from ingest_utils import get_data_from_sheet, get_client_data
+        from analysis_modules.ndjson import HEADER_FILENAME, write_ingested_ndjson
 
         # Check if social_media pipeline is active
         if "social_media" in config.get("active_pipelines", []):
@@ -46,10 +60,17 @@ def run_ingestion_pipeline(module_to_run="all"): # Add module_to_run parameter
             if not google_sheet_url:
                 raise ValueError("google_sheet_url not found in config.json")
 
-            output_file_path = os.path.join(outputs_dir, 'ingested_data.json')
+            ingest_config = config.get("ingest", {}) or {}
+            ingest_format = ingest_config.get("format", "ndjson")
+            if ingest_format == "ndjson":
+                output_file_path = os.path.join(outputs_dir, HEADER_FILENAME)
+            else:
+                output_file_path = os.path.join(outputs_dir, 'ingested_data.json')
+            existing = [p for p in (os.path.join(outputs_dir, HEADER_FILENAME), os.path.join(outputs_dir, 'ingested_data.json'))
+                        if os.path.exists(p)]
 
-            if os.path.exists(output_file_path):
-                logging.info(f"'{output_file_path}' already exists. Skipping data ingestion and using existing file.")
+            if existing:
+                logging.info(f"'{existing[0]}' already exists. Skipping data ingestion and using existing file.")
             else:
                 # Fetch all required data from Google Sheets
                 fichas_df = get_data_from_sheet(google_sheet_url, config["tabs"]["social_media_fichas_cliente"])
@@ -66,16 +87,29 @@ def run_ingestion_pipeline(module_to_run="all"): # Add module_to_run parameter
                 if not client_ficha:
                     raise Exception(f"No data found for client_id {client_id} in 'Ficha Cliente' tab.")
 
-                # --- Verification Step ---
-                # Save the ingested data to a local JSON file for verification
-                output_payload = {
-                    "client_ficha": client_ficha,
-                    "posts": posts_df[posts_df['client_id'] == client_id].to_dict('records'),
-                    "comments": comments_df.to_dict('records') # Assuming comments are linked by post_url
-                }
-                
-                with open(output_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(output_payload, f, ensure_ascii=False, indent=4)
+                client_posts_df = posts_df[posts_df['client_id'] == client_id]
+                if ingest_format == "ndjson":
+                    # Posts and comments as newline-delimited JSON (optionally gzip) plus a small
+                    # header with client_ficha; analyzers can stream them record by record.
+                    # With pyarrow installed, a typed Parquet copy is written in the same pass
+                    write_ingested_ndjson(
+                        outputs_dir, client_ficha,
+                        posts=(dict(zip(client_posts_df.columns, row)) for row in client_posts_df.itertuples(index=False, name=None)),
+                        comments=(dict(zip(comments_df.columns, row)) for row in comments_df.itertuples(index=False, name=None)), # Assuming comments are linked by post_url
+                        compress=bool(ingest_config.get("compress", True)),
+                        columnar=bool(ingest_config.get("columnar", True)),
+                    )
+                else:
+                    # --- Verification Step ---
+                    # Save the ingested data to a local JSON file for verification
+                    output_payload = {
+                        "client_ficha": client_ficha,
+                        "posts": client_posts_df.to_dict('records'),
+                        "comments": comments_df.to_dict('records') # Assuming comments are linked by post_url
+                    }
+
+                    with open(output_file_path, 'w', encoding='utf-8') as f:
+                        json.dump(output_payload, f, ensure_ascii=False, indent=4)
 
                 logging.info(f"Ingestion successful. Data saved to {output_file_path}")
             
@@ -100,5 +134,20 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Run the Pixely Orchestrator pipelines.")
     parser.add_argument("--module", "-m", type=str, default="all",
                         help="Specify which Qx module to run (e.g., Q1, Q2). Use 'all' to run all active modules.")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Disable the persistent LLM response cache for this run.")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Re-analyze every post instead of only the posts whose comments changed.")
+    parser.add_argument("--batch", action="store_true",
+                        help="Submit the per-post LLM requests (Q1/Q2/Q3/Q7) as an offline batch and wait for the results.")
+    parser.add_argument("--openai-base-url", type=str, default=None,
+                        help="Send LLM requests to an OpenAI-compatible endpoint (e.g. the local stand-in server).")
+    parser.add_argument("--profile", action="store_true",
+                        help="Record per-module CPU time and peak allocations in outputs/run_manifest.json (runs modules one at a time).")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="Like --profile, and also dump a cProfile file per module to outputs/profiles/<run_id>/.")
     args = parser.parse_args()
-    run_ingestion_pipeline(module_to_run=args.module)
+    run_ingestion_pipeline(module_to_run=args.module, use_llm_cache=not args.no_cache,
+                           full_refresh=args.full_refresh, batch=args.batch,
+                           openai_base_url=args.openai_base_url,
+                           profile=args.profile, cprofile=args.cprofile)
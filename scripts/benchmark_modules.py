@@ -0,0 +1,362 @@
+"""
+Benchmark de los módulos Q (ANALYSIS_MODULES) sobre datasets sintéticos de varios tamaños.
+
+Cada módulo se ejecuta en un proceso hijo nuevo (spawn: un intérprete limpio, sin la memoria
+que el proceso padre acumuló generando datasets o midiendo otros módulos) contra un cliente
+LLM en proceso (stand_in_server.StandInOpenAIClient), sin red. Por módulo se registra:
+  - wall_seconds: mínimo de `--repeat` ejecuciones de analyze() (más estable que la media
+    frente al ruido de la máquina; también se guarda la mediana)
+  - peak_rss_mb / rss_delta_mb: pico de memoria residente del hijo durante el módulo (el
+    delta es sobre el RSS ya con los imports y el dataset cargados)
+  - alloc_peak_mb: pico de memoria asignada por Python (tracemalloc, en una pasada aparte)
+  - gc_gen0_collections: colecciones de generación 0 en esa pasada (proxy del número de
+    asignaciones de objetos contenedor)
+
+Los resultados se escriben en JSON y se comparan con scripts/benchmarks/baseline.json usando
+tolerancias por módulo; el script termina con código 1 si hay regresiones.
+
+    python scripts/benchmark_modules.py --scales small,medium --modules Q11,Q15
+    python scripts/benchmark_modules.py --scales small --update-baseline
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PIPELINE_DIR = os.path.join(ROOT, 'orchestrator', 'pipelines', 'social_media')
+BASELINE_PATH = os.path.join(ROOT, 'scripts', 'benchmarks', 'baseline.json')
+DEFAULT_DATA_DIR = os.path.join(tempfile.gettempdir(), 'pixely_benchmarks')
+
+# (publicaciones, comentarios) por escala
+SCALES = {
+    'small': (1000, 20000),
+    'medium': (10000, 200000),
+    'large': (100000, 2000000),
+    'xlarge': (1000000, 10000000),
+}
+
+METRICS = ['wall_seconds', 'rss_delta_mb', 'alloc_peak_mb']
+# Tolerancia relativa por defecto y diferencia absoluta mínima para considerar una regresión
+# (evita falsos positivos en módulos que tardan milisegundos)
+DEFAULT_TOLERANCES = {'wall_seconds': 0.30, 'rss_delta_mb': 0.25, 'alloc_peak_mb': 0.25}
+MIN_ABSOLUTE_DELTA = {'wall_seconds': 0.05, 'rss_delta_mb': 10.0, 'alloc_peak_mb': 5.0}
+
+
+def _read_proc_status_mb(field):
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return None
+
+
+def _current_rss_mb():
+    return _read_proc_status_mb('VmRSS')
+
+
+def _reset_peak_rss():
+    """Reinicia el pico de RSS del proceso (Linux >= 4.0); False si no es posible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_mb():
+    peak = _read_proc_status_mb('VmHWM')
+    if peak is None and resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta KB, macOS bytes
+        peak = peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+    return peak
+
+
+def _setup_pipeline_path():
+    if PIPELINE_DIR not in sys.path:
+        sys.path.insert(0, PIPELINE_DIR)
+
+
+def ensure_dataset(data_dir, scale, seed):
+    """Genera (una sola vez) el ingested_data.json de la escala y devuelve su outputs_dir."""
+    _setup_pipeline_path()
+    from synthetic_data import SyntheticAccount, write_ingested_json
+
+    posts, comments = SCALES[scale]
+    outputs_dir = os.path.join(data_dir, f'{scale}-seed{seed}', 'outputs')
+    path = os.path.join(outputs_dir, 'ingested_data.json')
+    if not os.path.exists(path):
+        os.makedirs(outputs_dir, exist_ok=True)
+        started = time.perf_counter()
+        counts = write_ingested_json(SyntheticAccount(posts=posts, comments=comments, seed=seed), path)
+        print(f"[{scale}] dataset generado: {counts['posts']} publicaciones, {counts['comments']} comentarios "
+              f"({time.perf_counter() - started:.1f}s)")
+    return outputs_dir
+
+
+def _measure_module(module_name, outputs_dir, repeat, queue):
+    """Proceso hijo: ejecuta el módulo y envía sus métricas por `queue`."""
+    try:
+        logging.basicConfig(level=logging.WARNING)
+        _setup_pipeline_path()
+        import analyze
+        from analysis_modules.dataset import IngestedDataset
+        from stand_in_server import StandInOpenAIClient
+
+        analyzer_class = analyze.ANALYSIS_MODULES[module_name]
+        config = {
+            'outputs_dir': outputs_dir,
+            'openai_model': 'gpt-4o',
+            'incremental_analysis': False,
+            'dataset': IngestedDataset.load(outputs_dir),
+        }
+        client = StandInOpenAIClient()
+
+        gc.collect()
+        rss_before = _current_rss_mb()
+        peak_reset = _reset_peak_rss()
+        times = []
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = asyncio.run(analyzer_class(client, config).analyze())
+            times.append(time.perf_counter() - started)
+        peak_rss = _peak_rss_mb()
+
+        # Pasada aparte con tracemalloc: su sobrecosto no debe contar en el tiempo medido
+        gc.collect()
+        gen0_before = gc.get_stats()[0]['collections']
+        tracemalloc.start()
+        asyncio.run(analyzer_class(client, config).analyze())
+        _, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        gen0_collections = gc.get_stats()[0]['collections'] - gen0_before
+
+        # Los módulos agregadores (Q9/Q10, Q11 <- Q16) leen los outputs de los anteriores
+        with open(os.path.join(outputs_dir, analyze.module_output_filename(module_name)), 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=4, ensure_ascii=False, default=str)
+
+        metrics = {
+            'wall_seconds': round(min(times), 4),
+            'wall_seconds_median': round(statistics.median(times), 4),
+            'peak_rss_mb': round(peak_rss, 1) if peak_rss is not None else None,
+            'rss_delta_mb': round(peak_rss - rss_before, 1) if peak_reset and peak_rss is not None and rss_before is not None else None,
+            'alloc_peak_mb': round(alloc_peak / (1024.0 * 1024.0), 2),
+            'gc_gen0_collections': gen0_collections,
+            'llm_requests': client.state.requests,
+        }
+        if isinstance(result, dict) and result.get('error'):
+            metrics['result_error'] = str(result['error'])[:300]
+        queue.put(metrics)
+    except Exception as e:
+        queue.put({'error': f'{type(e).__name__}: {e}'})
+
+
+def run_module(module_name, outputs_dir, repeat):
+    # spawn y no fork: con fork el hijo hereda (y toca) el heap del padre y el RSS medido
+    # depende de lo que el padre hizo antes, p. ej. generar el dataset en la misma corrida
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=_measure_module, args=(module_name, outputs_dir, repeat, queue))
+    process.start()
+    metrics = None
+    # Si el hijo muere sin responder (p. ej. OOM) no hay que quedarse esperando la cola
+    while metrics is None and (process.is_alive() or not queue.empty()):
+        try:
+            metrics = queue.get(timeout=1)
+        except Exception:
+            continue
+    process.join()
+    if metrics is None:
+        metrics = {'error': f'el proceso terminó con código {process.exitcode} sin reportar métricas'}
+    return metrics
+
+
+def calibrate(repeat=5):
+    """
+    Tiempo (mínimo de `repeat`) de una carga fija de Python puro (JSON, dicts, strings, orden).
+    El cociente entre la calibración actual y la del baseline corrige la velocidad de la máquina
+    al comparar tiempos.
+    """
+    records = [{'post_url': f'https://example.com/p/{i}', 'comment_text': f'comentario {i % 97} #tag{i % 13}',
+                'likes': i % 1000} for i in range(20000)]
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        data = json.loads(json.dumps(records))
+        groups = {}
+        for record in data:
+            groups.setdefault(record['comment_text'].split('#')[-1], []).append(record['likes'])
+        sorted((sum(v), k) for k, v in groups.items())
+        sorted(data, key=lambda r: (r['likes'], r['post_url']))
+        times.append(time.perf_counter() - started)
+    return round(min(times), 4)
+
+
+def _tolerance(baseline, module_name, metric):
+    tolerances = baseline.get('tolerances', {})
+    module_tolerances = tolerances.get(module_name, {})
+    if metric in module_tolerances:
+        return module_tolerances[metric]
+    return tolerances.get('default', {}).get(metric, DEFAULT_TOLERANCES[metric])
+
+
+def compare(results, baseline, calibration_seconds=None):
+    """
+    Lista de regresiones (escala, módulo, métrica, base, actual, límite) frente al baseline.
+    Los tiempos del baseline se escalan por la calibración de la máquina si ambas existen.
+    """
+    speed_factor = 1.0
+    if calibration_seconds and baseline.get('calibration_seconds'):
+        speed_factor = calibration_seconds / baseline['calibration_seconds']
+    regressions = []
+    for scale, modules in results.items():
+        for module_name, current in modules.items():
+            reference = baseline.get('results', {}).get(scale, {}).get(module_name)
+            if not reference or 'error' in current:
+                continue
+            for metric in METRICS:
+                base, now = reference.get(metric), current.get(metric)
+                if base is None or now is None:
+                    continue
+                if metric == 'wall_seconds':
+                    base = round(base * speed_factor, 4)
+                limit = base * (1 + _tolerance(baseline, module_name, metric))
+                if now > limit and now - base > MIN_ABSOLUTE_DELTA[metric]:
+                    regressions.append((scale, module_name, metric, base, now, limit))
+    return regressions
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _environment():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de los módulos Q con datasets sintéticos y LLM simulado.')
+    parser.add_argument('--scales', default='small', help=f'Escalas separadas por coma ({", ".join(SCALES)}).')
+    parser.add_argument('--modules', default='all', help='Módulos separados por coma (ej. Q11,Q15) o "all".')
+    parser.add_argument('--repeat', type=int, default=5, help='Ejecuciones por módulo (se compara el mínimo).')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Directorio de datasets generados y outputs.')
+    parser.add_argument('--output', default=None, help='Archivo JSON de resultados (por defecto <data-dir>/results.json).')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='Guardar estos resultados como nuevo baseline.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    _setup_pipeline_path()
+    from analyze import ANALYSIS_MODULES
+    from scheduler import execution_order
+
+    scales = [s.strip() for s in args.scales.split(',') if s.strip()]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f'Escalas desconocidas: {unknown}')
+    if args.modules.lower() == 'all':
+        modules = list(ANALYSIS_MODULES)
+    else:
+        modules = [m.strip().upper() for m in args.modules.split(',') if m.strip()]
+        unknown = [m for m in modules if m not in ANALYSIS_MODULES]
+        if unknown:
+            parser.error(f'Módulos desconocidos: {unknown}')
+    modules = execution_order(modules)
+
+    calibration_before = calibrate()
+    results = {}
+    for scale in scales:
+        outputs_dir = ensure_dataset(args.data_dir, scale, args.seed)
+        results[scale] = {}
+        for module_name in modules:
+            metrics = run_module(module_name, outputs_dir, args.repeat)
+            results[scale][module_name] = metrics
+            if 'error' in metrics:
+                print(f"[{scale}] {module_name:>4}: ERROR {metrics['error']}")
+            else:
+                print(f"[{scale}] {module_name:>4}: {metrics['wall_seconds']:8.3f}s  rss +{metrics['rss_delta_mb']} MB "
+                      f"(pico {metrics['peak_rss_mb']} MB)  alloc {metrics['alloc_peak_mb']} MB  "
+                      f"gc0 {metrics['gc_gen0_collections']}  llm {metrics['llm_requests']}")
+
+    # Calibración al inicio y al final: la velocidad de la máquina puede variar durante la corrida
+    calibration_seconds = round((calibration_before + calibrate()) / 2, 4)
+    payload = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'environment': _environment(),
+        'calibration_seconds': calibration_seconds,
+        'repeat': args.repeat,
+        'seed': args.seed,
+        'results': results,
+    }
+    output = args.output or os.path.join(args.data_dir, 'results.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
+    print(f'Resultados escritos en {output}')
+
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        merged = baseline.get('results', {})
+        for scale, modules_results in results.items():
+            merged.setdefault(scale, {}).update(
+                {name: metrics for name, metrics in modules_results.items() if 'error' not in metrics})
+        baseline.update({
+            'created_at': payload['created_at'],
+            'environment': payload['environment'],
+            'calibration_seconds': calibration_seconds,
+            'repeat': args.repeat,
+            'seed': args.seed,
+            'results': merged,
+        })
+        baseline.setdefault('tolerances', {'default': DEFAULT_TOLERANCES})
+        os.makedirs(os.path.dirname(os.path.abspath(args.baseline)), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baseline, f, indent=2, ensure_ascii=False)
+        print(f'Baseline actualizado en {args.baseline}')
+        return
+
+    if not baseline:
+        print('No hay baseline para comparar (usa --update-baseline para crearlo).')
+        return
+    regressions = compare(results, baseline, calibration_seconds)
+    if baseline.get('calibration_seconds'):
+        print(f"Calibración: {calibration_seconds}s (baseline {baseline['calibration_seconds']}s)")
+    for scale, module_name, metric, base, now, limit in regressions:
+        print(f'REGRESIÓN [{scale}] {module_name} {metric}: {base} -> {now} (límite {limit:.3f})')
+    if regressions:
+        sys.exit(1)
+    print('Sin regresiones frente al baseline.')
+
+
+if __name__ == '__main__':
+    main()